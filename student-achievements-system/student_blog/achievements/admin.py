@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import StudentProfile, Achievement, ContactMessage
+from django.utils import timezone
+from .models import StudentProfile, Achievement, ChangeEvent, College, Department, ContactMessage, Job
+from .duplicates import index as duplicate_index
+from .image_hash import index as image_hash_index
 
 class StudentProfileInline(admin.StackedInline):
     model = StudentProfile
@@ -16,6 +19,7 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'studentprofile__year', 'studentprofile__department')
     search_fields = ('username', 'first_name', 'last_name', 'email', 'studentprofile__roll_number')
     ordering = ('-date_joined',)
+    list_select_related = ('studentprofile__department',)
     
     def get_roll_number(self, obj):
         return obj.studentprofile.roll_number if hasattr(obj, 'studentprofile') else 'N/A'
@@ -32,13 +36,30 @@ class CustomUserAdmin(UserAdmin):
             return list()
         return super().get_inline_instances(request, obj)
 
+class DepartmentInline(admin.TabularInline):
+    model = Department
+    extra = 1
+
+@admin.register(College)
+class CollegeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'domain', 'portal_name', 'is_default')
+    search_fields = ('name', 'domain')
+    inlines = (DepartmentInline,)
+
+@admin.register(Department)
+class DepartmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'college', 'is_default')
+    list_filter = ('college',)
+    search_fields = ('name',)
+
 @admin.register(Achievement)
 class AchievementAdmin(admin.ModelAdmin):
-    list_display = ('name', 'student_name', 'student_roll_number', 'event', 'prize', 'competition_level', 'is_approved', 'date_achieved', 'created_at')
-    list_filter = ('is_approved', 'competition', 'date_achieved', 'created_at')
+    list_display = ('name', 'student_name', 'student_roll_number', 'event', 'prize', 'competition_level', 'is_approved', 'possible_duplicates', 'similar_image', 'date_achieved', 'created_at')
+    list_filter = ('is_approved', 'college', 'competition', 'image_fetch_status', 'date_achieved', 'created_at')
     search_fields = ('name', 'event', 'student__username', 'student__first_name', 'student__last_name', 'student__studentprofile__roll_number')
     list_editable = ('is_approved',)
-    readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('student__studentprofile',)
+    readonly_fields = ('image_phash', 'image_fetch_status', 'image_fetch_error', 'created_at', 'updated_at')
     date_hierarchy = 'created_at'
     actions = ['approve_achievements', 'disapprove_achievements']
     
@@ -56,13 +77,27 @@ class AchievementAdmin(admin.ModelAdmin):
         return obj.competition_level_display
     competition_level.short_description = 'Competition Level'
     
+    def possible_duplicates(self, obj):
+        matches = duplicate_index.find_for(obj)
+        if not matches:
+            return '-'
+        return ', '.join(f'#{achievement_id} ({score:.0%})' for achievement_id, score in matches[:3])
+    possible_duplicates.short_description = 'Possible Duplicates'
+    
+    def similar_image(self, obj):
+        matches = image_hash_index.similar_for(obj)
+        if not matches:
+            return '-'
+        return 'Similar image exists: ' + ', '.join(f'#{achievement_id}' for achievement_id, bits in matches[:3])
+    similar_image.short_description = 'Image Reuse'
+    
     def approve_achievements(self, request, queryset):
-        updated = queryset.update(is_approved=True)
+        updated = queryset.set_approval(True)
         self.message_user(request, f'{updated} achievements approved successfully.')
     approve_achievements.short_description = "Approve selected achievements"
     
     def disapprove_achievements(self, request, queryset):
-        updated = queryset.update(is_approved=False)
+        updated = queryset.set_approval(False)
         self.message_user(request, f'{updated} achievements disapproved.')
     disapprove_achievements.short_description = "Disapprove selected achievements"
 
@@ -94,6 +129,38 @@ class ContactMessageAdmin(admin.ModelAdmin):
             return True
         return super().has_change_permission(request, obj)
 
+@admin.register(ChangeEvent)
+class ChangeEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'entity', 'entity_id', 'action', 'college', 'created_at')
+    list_filter = ('entity', 'action', 'college')
+    list_select_related = ('college',)
+    readonly_fields = ('entity', 'entity_id', 'action', 'college', 'created_at')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'run_at', 'started_at', 'duration', 'locked_by', 'periodic')
+    list_filter = ('status', 'task', 'periodic')
+    search_fields = ('task', 'last_error')
+    readonly_fields = ('task', 'args', 'kwargs', 'status', 'run_at', 'attempts', 'max_attempts', 'periodic',
+                       'locked_by', 'locked_at', 'started_at', 'finished_at', 'duration', 'last_error', 'created_at')
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status='failed').update(
+            status='queued', run_at=timezone.now(), attempts=0, finished_at=None, last_error=''
+        )
+        self.message_user(request, f'{updated} failed jobs queued again.')
+    retry_jobs.short_description = "Retry selected failed jobs"
+    
+    def has_add_permission(self, request):
+        return False
+
 # Re-register UserAdmin
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
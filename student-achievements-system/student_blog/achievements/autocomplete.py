@@ -0,0 +1,154 @@
+"""
+In-memory prefix index for event and achievement name suggestions.
+
+Each field keeps a sorted list of normalized values with how many approved
+achievements use each one. Suggestions are the most used values starting
+with the typed prefix. Short prefixes match a large share of the values, so
+for every prefix of up to TOP_PREFIX_LENGTH characters the best
+MAX_SUGGESTIONS are kept ready and updated as counts change. A longer prefix
+is a binary search followed by a forward scan of at most MAX_SCAN values.
+Either way a lookup does a bounded amount of work, whatever the number of
+achievements.
+
+There is one index per college, so a host only ever suggests its own
+college's values. The indexes are a SyncedIndex: they are loaded on first
+use and follow approvals and edits made by any process, so serving a
+suggestion runs no query unless something changed since the last one.
+"""
+from bisect import bisect_left, insort
+
+from .synced_index import Partition, SyncedIndex
+
+FIELDS = ('event', 'name')
+MIN_PREFIX_LENGTH = 2
+MAX_SUGGESTIONS = 10
+# Prefixes up to this length keep their best suggestions precomputed
+TOP_PREFIX_LENGTH = 4
+# Values compared at most for a longer prefix
+MAX_SCAN = 200
+
+
+def normalize(value):
+    """Lowercase and collapse whitespace so 'SIH  2024' matches 'sih 2024'"""
+    return ' '.join((value or '').split()).lower()
+
+
+class PrefixIndex:
+    """Sorted-array prefix index for one field with frequency counts"""
+
+    def __init__(self):
+        self.keys = []       # sorted normalized values
+        self.counts = {}     # normalized value -> number of achievements
+        self.labels = {}     # normalized value -> display text
+        self.top = {}        # short prefix -> best [(-count, value)], at most MAX_SUGGESTIONS
+
+    def _short_prefixes(self, key):
+        return [key[:n] for n in range(MIN_PREFIX_LENGTH, min(len(key), TOP_PREFIX_LENGTH) + 1)]
+
+    def _scan(self, prefix, limit=None):
+        matches = []
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            if limit is not None and len(matches) >= limit:
+                break
+            key = self.keys[position]
+            matches.append((-self.counts[key], key))
+            position += 1
+        matches.sort()
+        return matches
+
+    def _count_went_up(self, key):
+        # The value can only enter or climb its prefixes' lists
+        entry = (-self.counts[key], key)
+        for prefix in self._short_prefixes(key):
+            top = [item for item in self.top.get(prefix, ()) if item[1] != key]
+            insort(top, entry)
+            self.top[prefix] = top[:MAX_SUGGESTIONS]
+
+    def _count_went_down(self, key):
+        # A value outside a list it dropped in may now rank above it, so those lists are rebuilt
+        for prefix in self._short_prefixes(key):
+            if any(item[1] == key for item in self.top.get(prefix, ())):
+                top = self._scan(prefix)[:MAX_SUGGESTIONS]
+                if top:
+                    self.top[prefix] = top
+                else:
+                    del self.top[prefix]
+
+    def add(self, value):
+        key = normalize(value)
+        if not key:
+            return
+        if key not in self.counts:
+            insort(self.keys, key)
+            self.counts[key] = 0
+            self.labels[key] = ' '.join(value.split())
+        self.counts[key] += 1
+        self._count_went_up(key)
+
+    def remove(self, value):
+        key = normalize(value)
+        if key not in self.counts:
+            return
+        self.counts[key] -= 1
+        if self.counts[key] <= 0:
+            del self.counts[key]
+            del self.labels[key]
+            position = bisect_left(self.keys, key)
+            if position < len(self.keys) and self.keys[position] == key:
+                del self.keys[position]
+        self._count_went_down(key)
+
+    def search(self, prefix, limit=MAX_SUGGESTIONS):
+        prefix = normalize(prefix)
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return []
+        if len(prefix) <= TOP_PREFIX_LENGTH:
+            matches = self.top.get(prefix, [])
+        else:
+            matches = self._scan(prefix, MAX_SCAN)
+        return [
+            {'value': self.labels[key], 'count': -count}
+            for count, key in matches[:min(limit, MAX_SUGGESTIONS)]
+        ]
+
+
+class AutocompletePartition(Partition):
+    """One college's prefix indexes, keyed by achievement id"""
+
+    def __init__(self):
+        super().__init__()
+        self.indexes = {field: PrefixIndex() for field in FIELDS}
+        self.entries = {}   # achievement id -> values of FIELDS currently indexed
+
+    def add(self, row):
+        achievement_id, is_approved, *values = row
+        if not is_approved:
+            return
+        self.entries[achievement_id] = values
+        for field, value in zip(FIELDS, values):
+            self.indexes[field].add(value)
+
+    def remove(self, achievement_id):
+        values = self.entries.pop(achievement_id, None)
+        if values:
+            for field, value in zip(FIELDS, values):
+                self.indexes[field].remove(value)
+
+
+class AutocompleteIndex(SyncedIndex):
+    """Prefix indexes for every suggested field, one set per college"""
+    name = 'autocomplete'
+    fields = ('is_approved',) + FIELDS
+    partition_class = AutocompletePartition
+    load_filter = {'is_approved': True}
+
+    def suggest(self, field, prefix, college_id=None, limit=MAX_SUGGESTIONS):
+        if field not in FIELDS:
+            return []
+        partition = self.partition(college_id)
+        with self._lock:
+            return partition.indexes[field].search(prefix, limit)
+
+
+index = AutocompleteIndex()
@@ -0,0 +1,87 @@
+"""
+Change feed for downstream consumers (transactional outbox).
+
+Every Achievement create, update, approval change and delete, and every
+StudentProfile change, appends a ChangeEvent row. The event is written in the
+same database transaction as the change itself: Achievement and StudentProfile
+wrap save() in transaction.atomic(), deletes run inside the deletion
+collector's transaction, and queryset.update_and_notify() records its events
+inside its own atomic block. A consumer therefore never sees an event for a
+change that was rolled back, and never misses one that was committed.
+
+Consumers poll /api/changes/?after=<last seen id> and only get new events.
+Staff see every event. Anyone else only sees events of achievements that are
+public right now, plus disapprovals and deletes so they can drop a copy, the
+way delta sync reports them. Profile events are staff only.
+compact() keeps the log bounded: past the retention window only the newest
+event of each entity is kept, so a consumer that falls far behind still learns
+the latest state of everything, including deletes.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+
+
+def retention_days():
+    return getattr(settings, 'CHANGE_EVENT_RETENTION_DAYS', 30)
+
+
+def record(entity, entity_id, action, college_id=None):
+    from .models import ChangeEvent
+
+    ChangeEvent.objects.create(entity=entity, entity_id=entity_id, action=action, college_id=college_id)
+
+
+def record_many(entity, rows, action):
+    """Record one event per (entity_id, college_id) pair with a single INSERT"""
+    from .models import ChangeEvent
+
+    now = timezone.now()
+    ChangeEvent.objects.bulk_create([
+        ChangeEvent(entity=entity, entity_id=entity_id, action=action, college_id=college_id, created_at=now)
+        for entity_id, college_id in rows
+    ])
+
+
+def public_events(events):
+    """The events anyone may read (see module docstring)"""
+    from .models import AchievementCard
+
+    return events.filter(entity='achievement').filter(
+        Q(action__in=('disapproved', 'deleted'))
+        | Exists(AchievementCard.objects.filter(achievement_id=OuterRef('entity_id')))
+    )
+
+
+def achievement_action(created, was_approved, is_approved):
+    if created:
+        return 'created'
+    if was_approved is not None and was_approved != is_approved:
+        return 'approved' if is_approved else 'disapproved'
+    return 'updated'
+
+
+def compact(retention=None, batch_size=5000, dry_run=False):
+    """
+    Delete events older than the retention window that have a newer event for
+    the same entity. Returns the number of events deleted (or that would be).
+    """
+    from .models import ChangeEvent
+
+    cutoff = timezone.now() - datetime.timedelta(days=retention if retention is not None else retention_days())
+    newest = ChangeEvent.objects.filter(
+        entity=OuterRef('entity'), entity_id=OuterRef('entity_id')
+    ).order_by('-id').values('id')[:1]
+    superseded = ChangeEvent.objects.filter(created_at__lt=cutoff).exclude(id=Subquery(newest))
+
+    if dry_run:
+        return superseded.count()
+
+    deleted = 0
+    while True:
+        ids = list(superseded.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += ChangeEvent.objects.filter(id__in=ids).delete()[0]
@@ -1,8 +1,18 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import tenancy
+from .user_summary import get_summary
+
 def global_context(request):
-    """Global context available to all templates"""
+    """Global context available to all templates, for the college serving this request"""
+    college = request.college if hasattr(request, 'college') else tenancy.default_college()
+    department = tenancy.default_department(college) if college else None
     return {
-        'app_name': 'CSE Achievers Portal',
-        'app_description': 'Celebrating Student Excellence in Computer Science & Engineering',
-        'college_name': 'Mailam Engineering College',
-        'department_name': 'Computer Science & Engineering',
+        'app_name': college.portal_name if college else 'CSE Achievers Portal',
+        'app_description': (college.tagline if college else '') or 'Celebrating Student Excellence in Computer Science & Engineering',
+        'college': college,
+        'college_name': college.name if college else 'Mailam Engineering College',
+        'department_name': department.name if department else 'Computer Science & Engineering',
+        # Signed-in user's profile and achievement counters; nothing is loaded unless a template reads it
+        'user_summary': SimpleLazyObject(lambda: get_summary(request)),
     }
\ No newline at end of file
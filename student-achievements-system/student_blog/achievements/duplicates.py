@@ -0,0 +1,187 @@
+"""
+Near-duplicate detection for achievements using MinHash and LSH.
+
+Every achievement is reduced to a MinHash signature over word shingles of its
+normalized name, event and description. Signatures are split into bands and
+each band is hashed into a bucket, so finding likely duplicates only looks at
+achievements sharing at least one bucket instead of comparing against every
+row. Like the autocomplete index, there is one index per college, held in
+memory as a SyncedIndex that follows the saves and deletes of every process.
+Web workers build it at startup (achievements.startup), before any submission
+needs it; other processes build it on first use.
+"""
+import hashlib
+import re
+from collections import defaultdict
+
+from .synced_index import Partition, SyncedIndex
+
+NUM_PERMUTATIONS = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 2
+DEFAULT_THRESHOLD = 0.6
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def _permutations():
+    # Fixed seeds so signatures are stable across processes and restarts
+    params = []
+    for i in range(NUM_PERMUTATIONS):
+        digest = hashlib.blake2b(f'minhash-{i}'.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'big') % (_MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], 'big') % _MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations()
+
+
+def shingles(name, event, description):
+    """Word n-grams of the normalized achievement text"""
+    words = _WORD_RE.findall(' '.join(filter(None, (name, event, description))).lower())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def signature(name, event, description):
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), 'big')
+        for s in shingles(name, event, description)
+    ]
+    if not hashes:
+        return None
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERMUTATIONS
+
+
+def _bands(sig):
+    for band in range(BANDS):
+        yield band, sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+
+
+class DuplicatePartition(Partition):
+    """LSH buckets over one college's achievement signatures"""
+
+    def __init__(self):
+        super().__init__()
+        self.buckets = defaultdict(set)   # (band, band values) -> achievement ids
+        self.signatures = {}               # achievement id -> signature
+        self.students = {}                 # achievement id -> student id
+
+    def add(self, row):
+        achievement_id, student_id, name, event, description = row
+        sig = signature(name, event, description)
+        if sig is None:
+            return
+        self.signatures[achievement_id] = sig
+        self.students[achievement_id] = student_id
+        for key in _bands(sig):
+            self.buckets[key].add(achievement_id)
+
+    def remove(self, achievement_id):
+        sig = self.signatures.pop(achievement_id, None)
+        self.students.pop(achievement_id, None)
+        if sig is None:
+            return
+        for key in _bands(sig):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(achievement_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def candidates(self, sig):
+        found = set()
+        for key in _bands(sig):
+            found.update(self.buckets.get(key, ()))
+        return found
+
+
+class DuplicateIndex(SyncedIndex):
+    """LSH buckets over achievement signatures, one set per college"""
+    name = 'duplicates'
+    fields = ('student_id', 'name', 'event', 'description')
+    partition_class = DuplicatePartition
+
+    def find(self, name, event, description, college_id=None, student_id=None, exclude_id=None,
+             threshold=DEFAULT_THRESHOLD):
+        """
+        Return [(achievement_id, similarity)] for likely duplicates of the given
+        text among the college's achievements, best match first. Restrict to
+        one student's achievements by passing student_id.
+        """
+        sig = signature(name, event, description)
+        if sig is None:
+            return []
+        partition = self.partition(college_id)
+        with self._lock:
+            matches = []
+            for candidate in partition.candidates(sig):
+                if candidate == exclude_id:
+                    continue
+                if student_id is not None and partition.students.get(candidate) != student_id:
+                    continue
+                score = similarity(sig, partition.signatures[candidate])
+                if score >= threshold:
+                    matches.append((candidate, score))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
+
+    def find_for(self, achievement, threshold=DEFAULT_THRESHOLD):
+        return self.find(
+            achievement.name, achievement.event, achievement.description,
+            college_id=achievement.college_id, exclude_id=achievement.pk, threshold=threshold,
+        )
+
+
+def duplicate_groups(rows, threshold=DEFAULT_THRESHOLD):
+    """
+    Group (id, name, event, description) rows into clusters of likely
+    duplicates in a single pass, using a throwaway LSH index and union-find.
+    """
+    buckets = defaultdict(list)
+    signatures = {}
+    parent = {}
+
+    def root(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for achievement_id, name, event, description in rows:
+        sig = signature(name, event, description)
+        if sig is None:
+            continue
+        signatures[achievement_id] = sig
+        parent[achievement_id] = achievement_id
+        seen = set()
+        for key in _bands(sig):
+            for other in buckets[key]:
+                if other in seen:
+                    continue
+                seen.add(other)
+                if similarity(sig, signatures[other]) >= threshold:
+                    parent[root(achievement_id)] = root(other)
+            buckets[key].append(achievement_id)
+
+    groups = defaultdict(list)
+    for achievement_id in parent:
+        groups[root(achievement_id)].append(achievement_id)
+    return sorted((sorted(ids) for ids in groups.values() if len(ids) > 1), key=lambda ids: ids[0])
+
+
+index = DuplicateIndex()
@@ -0,0 +1,170 @@
+"""
+Faceted filtering of the public achievements listing.
+
+The listing can be narrowed by competition level, department, student year
+and a date_achieved range, and every facet value shows how many results it
+would give. Instead of one COUNT per facet value, all counts come from a
+single grouped query over AchievementCard:
+
+    SELECT competition, competition_label, department, year, COUNT(*)
+    ... WHERE <college, search, date range> GROUP BY ...
+
+The grouped rows are small (one per distinct combination) and each facet's
+counts are summed from them in Python, applying the selections of the *other*
+facets, so picking a department still shows the counts of the other
+departments. The rows are cached per college, search text and date range
+under a version number that projections bump whenever cards change, which
+covers approvals, edits and profile changes. The version lives in the shared
+cache, so a bump in any process invalidates the counts of every process.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_date
+
+from .tenancy import scope
+
+VERSION_KEY = 'achievement_facets:version'
+
+FACETS = (
+    ('competition', 'Competition Level'),
+    ('department', 'Department'),
+    ('year', 'Year'),
+)
+
+
+def parse_filters(params):
+    """Read the search text, facet selections and date range from request.GET"""
+    filters = {
+        'search': params.get('search', '').strip(),
+        'competition': params.get('competition', ''),
+        'department': params.get('department', ''),
+        'year': None,
+        'date_from': None,
+        'date_to': None,
+        'errors': [],
+    }
+    if params.get('year', '').isdigit():
+        filters['year'] = int(params['year'])
+    for name in ('date_from', 'date_to'):
+        value = params.get(name, '').strip()
+        if not value:
+            continue
+        try:
+            filters[name] = parse_date(value)
+        except ValueError:
+            # Well formed but not a real day, e.g. 2024-02-30
+            pass
+        if filters[name] is None:
+            filters['errors'].append(f'"{value}" is not a valid date and was ignored.')
+    return filters
+
+
+def _base(college, filters):
+    """Cards matching the filters that are not facets"""
+    from .models import AchievementCard
+
+    queryset = scope(AchievementCard.objects.all(), college)
+    search = filters['search']
+    if search:
+        queryset = queryset.filter(
+            Q(name__icontains=search) |
+            Q(event__icontains=search) |
+            Q(competition__icontains=search) |
+            Q(description__icontains=search)
+        )
+    if filters['date_from']:
+        queryset = queryset.filter(date_achieved__gte=filters['date_from'])
+    if filters['date_to']:
+        queryset = queryset.filter(date_achieved__lte=filters['date_to'])
+    return queryset
+
+
+def _selected(filters, facet):
+    value = filters[facet]
+    return value if value not in ('', None) else None
+
+
+def filter_cards(college, filters):
+    """The listing queryset for the given filters, newest first"""
+    queryset = _base(college, filters)
+    for facet, _ in FACETS:
+        value = _selected(filters, facet)
+        if value is not None:
+            queryset = queryset.filter(**{facet: value})
+    return queryset.order_by('-created_at', '-achievement')
+
+
+def version():
+    # Seeded with the clock, so an evicted version never matches rows cached under the old one
+    return cache.get_or_set(VERSION_KEY, time.time_ns, None)
+
+
+def bump_version():
+    """Invalidate every cached facet count"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def _rows(college, filters):
+    key_parts = [
+        str(college.pk if college else ''),
+        filters['search'].lower(),
+        str(filters['date_from'] or ''),
+        str(filters['date_to'] or ''),
+    ]
+    digest = hashlib.md5('\x1f'.join(key_parts).encode()).hexdigest()
+    key = f'achievement_facets:{version()}:{digest}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            _base(college, filters)
+            .order_by()
+            .values_list('competition', 'competition_label', 'department', 'year')
+            .annotate(count=Count('pk'))
+        )
+        cache.set(key, rows, getattr(settings, 'FACET_CACHE_SECONDS', 300))
+    return rows
+
+
+def facet_counts(college, filters):
+    """
+    Return (facets, total) where facets is a list of
+    {'name', 'label', 'options': [{'value', 'label', 'count', 'selected'}]}
+    and total is the number of cards matching every filter.
+    """
+    from .models import Achievement
+
+    counts = {facet: {} for facet, _ in FACETS}
+    labels = {facet: {} for facet, _ in FACETS}
+    total = 0
+    for competition, competition_label, department, year, count in _rows(college, filters):
+        values = {'competition': competition, 'department': department, 'year': year}
+        misses = [facet for facet, _ in FACETS if _selected(filters, facet) not in (None, values[facet])]
+        if not misses:
+            total += count
+        for facet, _ in FACETS:
+            # A row counts towards a facet when it matches every other facet's selection
+            if values[facet] in ('', None) or misses not in ([], [facet]):
+                continue
+            counts[facet][values[facet]] = counts[facet].get(values[facet], 0) + count
+            labels[facet][values[facet]] = competition_label if facet == 'competition' else str(values[facet])
+
+    level_labels = dict(Achievement.COMPETITION_LEVELS)
+    facets = []
+    for facet, label in FACETS:
+        selected = _selected(filters, facet)
+        if selected is not None and selected not in counts[facet]:
+            counts[facet][selected] = 0
+            labels[facet][selected] = level_labels.get(selected, str(selected))
+        options = [
+            {'value': value, 'label': labels[facet][value], 'count': count, 'selected': value == selected}
+            for value, count in sorted(counts[facet].items(), key=lambda item: str(item[0]))
+        ]
+        facets.append({'name': facet, 'label': label, 'options': options})
+    return facets, total
@@ -0,0 +1,149 @@
+"""
+Featured achievements on the home page.
+
+The featured cards are ranked by competition level and recency rather than
+newest first. A card's score is its level weight, halved every
+FEATURED_HALF_LIFE_DAYS since the achievement date:
+
+    score = LEVEL_WEIGHTS[competition] * 0.5 ** (age_days / half_life)
+
+generate() scores every card of a college in one pass over AchievementCard,
+keeping only the best FEATURED_SET_COUNT * FEATURED_SET_SIZE. It deals them
+round-robin into up to FEATURED_SET_COUNT full sets, so every set gets one
+card from each tier of the ranking. The sets and the home page totals are cached under
+one key per college as plain dicts, ready to render. The home page then does
+one cache read and shows a different set every FEATURED_ROTATION_SECONDS.
+
+refresh() regenerates the entries. It runs from JOB_SCHEDULE and is queued
+whenever an approved achievement changes, unless a refresh of the college is
+already waiting. That change also drops the cached
+entry once it commits, so a removed card is not served while the refresh
+waits for a worker. The entries live in the shared cache configured in
+settings, so what a worker generates or drops is what every web process
+reads. A cache miss regenerates the entry during the request.
+"""
+import heapq
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .jobs import enqueue_once
+from .tenancy import scope
+
+LEVEL_WEIGHTS = {
+    'international': 5,
+    'national': 4,
+    'state': 3,
+    'university': 2,
+    'college': 1,
+}
+
+CARD_FIELDS = (
+    'achievement_id', 'student_id', 'name', 'event', 'prize', 'competition', 'competition_label',
+    'description', 'image_url', 'student_name', 'date_achieved',
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def cache_key(college_id):
+    return f'featured_achievements:{college_id or "all"}'
+
+
+def score(card, today, half_life):
+    age_days = max((today - card['date_achieved']).days, 0)
+    return LEVEL_WEIGHTS.get(card['competition'], 1) * 0.5 ** (age_days / half_life)
+
+
+def _render_data(card):
+    return {
+        'id': card['achievement_id'],
+        'student_id': card['student_id'],
+        'name': card['name'],
+        'event': card['event'],
+        'prize': card['prize'],
+        'competition_label': card['competition_label'],
+        'description': Truncator(card['description']).words(20),
+        'image_url': card['image_url'],
+        'student_name': card['student_name'],
+        'date_achieved': card['date_achieved'],
+    }
+
+
+def generate(college):
+    """Rank the college's cards, split the best into sets and cache them with the totals"""
+    from .models import AchievementCard
+
+    set_count = _setting('FEATURED_SET_COUNT', 4)
+    set_size = _setting('FEATURED_SET_SIZE', 6)
+    today = timezone.localdate()
+    half_life = _setting('FEATURED_HALF_LIFE_DAYS', 90)
+
+    total_achievements = 0
+
+    def cards():
+        nonlocal total_achievements
+        for card in scope(AchievementCard.objects.all(), college).values(*CARD_FIELDS).iterator(chunk_size=2000):
+            total_achievements += 1
+            yield card
+
+    best = heapq.nlargest(set_count * set_size, cards(), key=lambda card: score(card, today, half_life))
+    # Only as many sets as can be filled, then round-robin: set i gets ranks i, i + n, i + 2n, ...
+    set_count = max(1, min(set_count, len(best) // set_size))
+    sets = [[_render_data(card) for card in best[i::set_count][:set_size]] for i in range(set_count)]
+    entry = {
+        'sets': [chosen for chosen in sets if chosen],
+        'total_achievements': total_achievements,
+        'total_students': scope(
+            User.objects.filter(is_staff=False), college, 'studentprofile__department__college'
+        ).count(),
+        'generated_at': timezone.now(),
+    }
+    cache.set(cache_key(college.pk if college else None), entry, _setting('FEATURED_CACHE_SECONDS', 15 * 60))
+    return entry
+
+
+def get(college):
+    """The college's featured entry: one cache read, generated on a miss"""
+    entry = cache.get(cache_key(college.pk if college else None))
+    if entry is None:
+        entry = generate(college)
+    return entry
+
+
+def current_set(entry, now=None):
+    """The set on show right now; the sets take turns every FEATURED_ROTATION_SECONDS"""
+    if not entry['sets']:
+        return []
+    slot = int((now if now is not None else time.time()) // _setting('FEATURED_ROTATION_SECONDS', 60))
+    return entry['sets'][slot % len(entry['sets'])]
+
+
+def refresh(college_id=None):
+    """Regenerate one college's entry, or every college's when college_id is None"""
+    from .models import College
+
+    if college_id is not None:
+        colleges = list(College.objects.filter(pk=college_id))
+    else:
+        colleges = list(College.objects.all())
+    for college in colleges or [None]:
+        generate(college)
+
+
+def invalidate(college_id):
+    cache.delete(cache_key(college_id))
+
+
+def changed(college_id):
+    """An approved achievement of the college changed: drop the entry and queue a refresh"""
+    transaction.on_commit(lambda: invalidate(college_id))
+    # One queued refresh covers any number of changes made before it starts
+    enqueue_once(refresh, college_id)
@@ -1,7 +1,52 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
-from .models import Achievement, StudentProfile
+from .models import Achievement, Department, StudentProfile, UploadSession
+from . import tenancy
+from .duplicates import index as duplicate_index
+from .uploads import max_upload_size, probe_image
+
+class HeaderValidatedImageField(forms.FileField):
+    """
+    Image upload field that enforces MAX_IMAGE_UPLOAD_SIZE and checks the
+    format and dimensions from the image header without decoding the pixels.
+    """
+    def to_python(self, data):
+        f = super().to_python(data)
+        if f is None:
+            return None
+        if f.size > max_upload_size():
+            raise forms.ValidationError(
+                f"Image is too large. The maximum size is {max_upload_size() // (1024 * 1024)}MB."
+            )
+        probe_image(f)
+        return f
+
+class ChunkedUploadMixin:
+    """
+    Accept a completed resumable upload session in place of a multipart file.
+    Only sessions of `upload_owner` can be attached; without an owner, every
+    upload_id is rejected.
+    """
+    upload_kind = None
+    
+    def __init__(self, *args, upload_owner=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_owner = upload_owner
+        self.upload = None
+    
+    def clean_upload_id(self):
+        upload_id = self.cleaned_data.get('upload_id')
+        self.upload = None
+        if not upload_id:
+            return upload_id
+        owner = self.upload_owner
+        self.upload = UploadSession.objects.filter(
+            id=upload_id, user=owner, kind=self.upload_kind, status='complete'
+        ).first() if owner else None
+        if self.upload is None:
+            raise forms.ValidationError("The uploaded file could not be found. Please upload it again.")
+        return upload_id
 
 class UserRegistrationForm(UserCreationForm):
     email = forms.EmailField(required=True, widget=forms.EmailInput(attrs={
@@ -20,9 +65,8 @@ class UserRegistrationForm(UserCreationForm):
         'class': 'form-control',
         'placeholder': 'Enter your roll number'
     }))
-    department = forms.CharField(max_length=100, required=True, initial="Computer Science & Engineering", widget=forms.TextInput(attrs={
-        'class': 'form-control',
-        'placeholder': 'Enter your department'
+    department = forms.ModelChoiceField(queryset=Department.objects.none(), required=True, empty_label=None, widget=forms.Select(attrs={
+        'class': 'form-control'
     }))
     year = forms.IntegerField(min_value=2000, max_value=2030, required=True, initial=2025, widget=forms.NumberInput(attrs={
         'class': 'form-control',
@@ -51,6 +95,11 @@ class UserRegistrationForm(UserCreationForm):
             }),
         }
     
+    def __init__(self, *args, college=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['department'].queryset = tenancy.scope(Department.objects.all(), college)
+        self.fields['department'].initial = tenancy.default_department(college)
+    
     def clean_roll_number(self):
         roll_number = self.cleaned_data['roll_number']
         if StudentProfile.objects.filter(roll_number=roll_number).exists():
@@ -70,43 +119,59 @@ class UserRegistrationForm(UserCreationForm):
         user.last_name = self.cleaned_data['last_name']
     
         if commit:
-            user.save()
+            self.save_student(user)
+        return user
+
+    def save_student(self, user):
+        """Write a user from save(commit=False) and their profile"""
+        # The password was hashed by save(), so this part is only quick writes
+        user.save()
         
         # Use get_or_create to handle existing profiles
-            profile, created = StudentProfile.objects.get_or_create(
-                user=user,
-                defaults={
-                    'roll_number': self.cleaned_data['roll_number'],
-                    'department': self.cleaned_data['department'],
-                    'year': self.cleaned_data['year'],
-                    'phone': self.cleaned_data['phone'] or None,
-                    'is_student': True
-                }
-            )
+        profile, created = StudentProfile.objects.get_or_create(
+            user=user,
+            defaults={
+                'roll_number': self.cleaned_data['roll_number'],
+                'department': self.cleaned_data['department'],
+                'year': self.cleaned_data['year'],
+                'phone': self.cleaned_data['phone'] or None,
+                'is_student': True
+            }
+        )
         
         # If profile already existed, update it
-            if not created:
-                profile.roll_number = self.cleaned_data['roll_number']
-                profile.department = self.cleaned_data['department']
-                profile.year = self.cleaned_data['year']
-                profile.phone = self.cleaned_data['phone'] or None
-                profile.is_student = True
-                profile.save()
+        if not created:
+            profile.roll_number = self.cleaned_data['roll_number']
+            profile.department = self.cleaned_data['department']
+            profile.year = self.cleaned_data['year']
+            profile.phone = self.cleaned_data['phone'] or None
+            profile.is_student = True
+            profile.save()
     
         return user
 
-class AchievementForm(forms.ModelForm):
+class AchievementForm(ChunkedUploadMixin, forms.ModelForm):
+    upload_kind = 'achievement'
+    upload_id = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    # Shown once a submission looks like a duplicate; moderators still see the match in the admin
+    confirm_duplicate = forms.BooleanField(required=False, label='Submit anyway')
+    
     class Meta:
         model = Achievement
         fields = ['name', 'event', 'prize', 'competition', 'image', 'image_url', 'description']
+        field_classes = {'image': HeaderValidatedImageField}
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
-                'placeholder': 'e.g., First Prize in Hackathon'
+                'placeholder': 'e.g., First Prize in Hackathon',
+                'autocomplete': 'off',
+                'data-autocomplete': 'name'
             }),
             'event': forms.TextInput(attrs={
                 'class': 'form-control', 
-                'placeholder': 'e.g., Smart India Hackathon 2024'
+                'placeholder': 'e.g., Smart India Hackathon 2024',
+                'autocomplete': 'off',
+                'data-autocomplete': 'event'
             }),
             'prize': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -117,7 +182,8 @@ class AchievementForm(forms.ModelForm):
             }),
             'image': forms.FileInput(attrs={
                 'class': 'form-control',
-                'accept': 'image/*'
+                'accept': 'image/*',
+                'data-chunked-upload': 'achievement'
             }),
             'image_url': forms.URLInput(attrs={
                 'class': 'form-control',
@@ -130,6 +196,11 @@ class AchievementForm(forms.ModelForm):
             }),
         }
     
+    def __init__(self, *args, student=None, college=None, **kwargs):
+        super().__init__(*args, upload_owner=student, **kwargs)
+        self.student = student
+        self.college = college
+    
     def clean_name(self):
         name = self.cleaned_data['name']
         if len(name) < 5:
@@ -141,19 +212,47 @@ class AchievementForm(forms.ModelForm):
         if len(prize) < 3:
             raise forms.ValidationError("Please provide a valid prize description.")
         return prize
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.student is None or not cleaned_data.get('name') or not cleaned_data.get('event'):
+            return cleaned_data
+        
+        # Warn about resubmissions of something this student already submitted
+        if cleaned_data.get('confirm_duplicate'):
+            return cleaned_data
+        duplicates = duplicate_index.find(
+            cleaned_data['name'],
+            cleaned_data['event'],
+            cleaned_data.get('description'),
+            college_id=self.instance.college_id or (self.college.pk if self.college else None),
+            student_id=self.student.id,
+            exclude_id=self.instance.pk,
+        )
+        if duplicates:
+            original = Achievement.objects.filter(id=duplicates[0][0]).first()
+            if original:
+                self.add_error('confirm_duplicate', (
+                    f'This looks like a duplicate of "{original.name}" ({original.event}) '
+                    f'which you already submitted. Tick "Submit anyway" if it is a different achievement.'
+                ))
+        return cleaned_data
 
-class ProfileForm(forms.ModelForm):
+class ProfileForm(ChunkedUploadMixin, forms.ModelForm):
+    upload_kind = 'avatar'
+    upload_id = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    
     class Meta:
         model = StudentProfile
         fields = ['roll_number', 'department', 'year', 'phone', 'avatar', 'bio']
+        field_classes = {'avatar': HeaderValidatedImageField}
         widgets = {
             'roll_number': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Enter your roll number'
             }),
-            'department': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Enter your department'
+            'department': forms.Select(attrs={
+                'class': 'form-control'
             }),
             'year': forms.NumberInput(attrs={
                 'class': 'form-control',
@@ -165,6 +264,10 @@ class ProfileForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'Enter your phone number'
             }),
+            'avatar': forms.ClearableFileInput(attrs={
+                'accept': 'image/*',
+                'data-chunked-upload': 'avatar'
+            }),
             'bio': forms.Textarea(attrs={
                 'class': 'form-control', 
                 'rows': 4,
@@ -172,6 +275,13 @@ class ProfileForm(forms.ModelForm):
             }),
         }
     
+    def __init__(self, *args, college=None, **kwargs):
+        instance = kwargs.get('instance')
+        super().__init__(*args, upload_owner=instance.user if instance and instance.pk else None, **kwargs)
+        if self.instance.department_id:
+            college = self.instance.department.college
+        self.fields['department'].queryset = tenancy.scope(Department.objects.all(), college)
+    
     def clean_roll_number(self):
         roll_number = self.cleaned_data['roll_number']
         if StudentProfile.objects.filter(roll_number=roll_number).exclude(user=self.instance.user).exists():
@@ -0,0 +1,231 @@
+"""
+Download external Achievement.image_url images into our own media storage.
+
+Students can point an achievement at an image on any host. Instead of hotlinking
+it, the image is fetched once after submission and stored through the same
+upload path as a normal upload (achievement_image_path), so pages only ever
+serve local files and the perceptual hash is computed for it as well.
+
+Fetching runs on an asyncio event loop with a semaphore capping concurrent
+downloads. Each download has a deadline, a hard size cap and a few retries
+with exponential backoff. The outcome is recorded in image_fetch_status and
+image_fetch_error.
+
+Connections are opened to the address that passed the private-network
+check, not to whatever the host name resolves to by the time the request is
+sent, so a host cannot switch its DNS answer to an internal address between
+the check and the connection.
+"""
+import asyncio
+import http.client
+import ipaddress
+import logging
+import socket
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+
+class FetchError(Exception):
+    """A download failed in a way that is worth recording on the achievement"""
+
+    def __init__(self, message, retry=False):
+        super().__init__(message)
+        self.retry = retry
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _check_url(url):
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise FetchError('Only http and https image URLs are supported.')
+
+
+def _resolve(host, port):
+    """The address to connect to for host; refuses hosts that resolve to private or loopback addresses"""
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    except socket.gaierror:
+        raise FetchError(f'Could not resolve host {host}.', retry=True)
+    if not _setting('IMAGE_FETCH_ALLOW_PRIVATE_HOSTS', False):
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split('%')[0])
+            if ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved:
+                raise FetchError('Image URL points to a private network address.')
+    return addresses[0]
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        self.sock = socket.create_connection((_resolve(self.host, self.port), self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    def connect(self):
+        sock = socket.create_connection((_resolve(self.host, self.port), self.port), self.timeout)
+        # The certificate is still checked against the host name
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+class _PinnedHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PinnedHTTPConnection, req)
+
+
+class _PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PinnedHTTPSConnection, req, context=self._context)
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _check_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No proxies: the connection must go to the address _resolve() checked
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _PinnedHTTPHandler, _PinnedHTTPSHandler, _CheckedRedirectHandler
+)
+
+
+def download(url, timeout=None, max_bytes=None):
+    """
+    Blocking download of a single image. Returns (data, content_type) or
+    raises FetchError. Reads at most max_bytes + 1 bytes from the socket and
+    gives up once `timeout` seconds have passed in total, however steadily
+    the host trickles data.
+    """
+    timeout = timeout or _setting('IMAGE_FETCH_TIMEOUT', 10)
+    max_bytes = max_bytes or _setting('IMAGE_FETCH_MAX_BYTES', 5 * 1024 * 1024)
+    deadline = time.monotonic() + timeout
+    _check_url(url)
+
+    request = urllib.request.Request(url, headers={'User-Agent': 'CSE-Achievers-ImageFetcher/1.0'})
+    try:
+        with _opener.open(request, timeout=timeout) as response:
+            content_type = response.headers.get_content_type()
+            if content_type not in CONTENT_TYPE_EXTENSIONS:
+                raise FetchError(f'Unsupported content type {content_type}.')
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > max_bytes:
+                raise FetchError(f'Image is larger than {max_bytes} bytes.')
+            chunks = []
+            received = 0
+            while received <= max_bytes:
+                if time.monotonic() > deadline:
+                    raise FetchError(f'Image download took longer than {timeout} seconds.')
+                # read1() returns after a single socket read, so the deadline is checked between reads
+                chunk = response.read1(min(64 * 1024, max_bytes + 1 - received))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+            data = b''.join(chunks)
+    except FetchError:
+        raise
+    except urllib.error.HTTPError as e:
+        raise FetchError(f'HTTP {e.code} from image host.', retry=e.code >= 500 or e.code == 429)
+    except (urllib.error.URLError, socket.timeout, ConnectionError) as e:
+        raise FetchError(f'Could not download image: {getattr(e, "reason", e)}', retry=True)
+
+    if len(data) > max_bytes:
+        raise FetchError(f'Image is larger than {max_bytes} bytes.')
+    if not data:
+        raise FetchError('Image host returned an empty response.', retry=True)
+    return data, content_type
+
+
+async def _download_with_retries(url, semaphore):
+    retries = _setting('IMAGE_FETCH_RETRIES', 2)
+    backoff = _setting('IMAGE_FETCH_BACKOFF', 1.0)
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        async with semaphore:
+            try:
+                return await loop.run_in_executor(None, download, url)
+            except FetchError as e:
+                if not e.retry or attempt >= retries:
+                    raise
+        await asyncio.sleep(backoff * (2 ** attempt))
+        attempt += 1
+
+
+def _store(achievement, data, content_type):
+    # Saving a new image clears image_phash, so the usual post_save hook hashes it
+    filename = f'external.{CONTENT_TYPE_EXTENSIONS[content_type]}'
+    achievement.image.save(filename, ContentFile(data), save=False)
+    achievement.image_fetch_status = 'fetched'
+    achievement.image_fetch_error = ''
+    achievement.save(update_fields=[
+        'image', 'image_phash', 'image_phash_updated_at', 'image_fetch_status', 'image_fetch_error', 'updated_at',
+    ])
+
+
+def _mark_failed(achievement, message):
+    from .models import Achievement
+
+    # Through update_and_notify, so the card drops the external URL it can no longer show
+    Achievement.objects.filter(pk=achievement.pk).update_and_notify(
+        image_fetch_status='failed', image_fetch_error=message[:255]
+    )
+
+
+async def _fetch_all(achievements, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [_download_with_retries(a.image_url, semaphore) for a in achievements]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def fetch_images(achievement_ids, concurrency=None):
+    """
+    Download the external images of the given achievements. Returns a
+    (fetched, failed) tuple. Achievements that already have an uploaded image
+    or no image_url are skipped.
+    """
+    from .models import Achievement
+
+    concurrency = concurrency or _setting('IMAGE_FETCH_CONCURRENCY', 4)
+    achievements = [
+        a for a in Achievement.objects.filter(id__in=list(achievement_ids)).select_related('student')
+        if a.image_url and not a.image
+    ]
+    if not achievements:
+        return 0, 0
+
+    results = asyncio.run(_fetch_all(achievements, concurrency))
+
+    fetched = failed = 0
+    for achievement, result in zip(achievements, results):
+        if isinstance(result, FetchError):
+            _mark_failed(achievement, str(result))
+            failed += 1
+        elif isinstance(result, BaseException):
+            logger.error('Unexpected error fetching %s', achievement.image_url, exc_info=result)
+            _mark_failed(achievement, 'Unexpected error while downloading the image.')
+            failed += 1
+        else:
+            _store(achievement, *result)
+            fetched += 1
+    return fetched, failed
+
+
+def fetch_achievement_image(achievement_id):
+    fetch_images([achievement_id])
@@ -0,0 +1,153 @@
+"""
+Perceptual hashes for achievement certificates.
+
+Each uploaded image gets a 64-bit difference hash (dHash): the image is shrunk
+to 9x8 greyscale and every bit records whether a pixel is brighter than its
+right-hand neighbour. Re-encoded, resized or lightly edited copies of the same
+certificate land within a few bits of each other.
+
+Lookups use multi-index hashing: the hash is cut into CHUNKS pieces and each
+piece is an exact-match dictionary key. Two hashes within MAX_DISTANCE bits must
+agree exactly on at least one piece (pigeonhole), so a query only compares
+against the few hashes sharing a piece instead of the whole table.
+
+Hashes are computed by a background job, usually in a worker process. The
+index is a SyncedIndex spanning every college, so the web processes pick up
+a new hash on their next lookup. It syncs on image_phash_updated_at rather
+than updated_at: a new hash is not a change API clients need to re-download.
+"""
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .synced_index import Partition, SyncedIndex
+
+HASH_BITS = 64
+MAX_DISTANCE = 4
+CHUNKS = MAX_DISTANCE + 1
+
+_CHUNK_WIDTHS = [HASH_BITS // CHUNKS + (1 if i < HASH_BITS % CHUNKS else 0) for i in range(CHUNKS)]
+
+
+def dhash(fileobj):
+    """Return the 64-bit difference hash of an image as a 16 character hex string"""
+    from PIL import Image
+
+    with Image.open(fileobj) as image:
+        image.draft('L', (64, 64))  # let JPEG decode at reduced size
+        pixels = list(image.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return f'{value:016x}'
+
+
+def hash_stored_image(name):
+    """Hash a file in the default storage; returns '' if it cannot be read"""
+    from django.core.files.storage import default_storage
+
+    try:
+        with default_storage.open(name, 'rb') as fileobj:
+            return dhash(fileobj)
+    except Exception:
+        return ''
+
+
+def distance(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+def _chunks(value):
+    shift = HASH_BITS
+    for position, width in enumerate(_CHUNK_WIDTHS):
+        shift -= width
+        yield position, (value >> shift) & ((1 << width) - 1)
+
+
+class ImageHashPartition(Partition):
+    """Multi-index hash table of achievement image hashes"""
+
+    def __init__(self):
+        super().__init__()
+        self.tables = defaultdict(set)   # (chunk position, chunk value) -> achievement ids
+        self.hashes = {}                  # achievement id -> (int hash, student id)
+
+    def add(self, row):
+        achievement_id, student_id, image_hash = row
+        if not image_hash:
+            return
+        value = int(image_hash, 16)
+        self.hashes[achievement_id] = (value, student_id)
+        for key in _chunks(value):
+            self.tables[key].add(achievement_id)
+
+    def remove(self, achievement_id):
+        entry = self.hashes.pop(achievement_id, None)
+        if entry is None:
+            return
+        for key in _chunks(entry[0]):
+            table = self.tables.get(key)
+            if table is not None:
+                table.discard(achievement_id)
+                if not table:
+                    del self.tables[key]
+
+
+class ImageHashIndex(SyncedIndex):
+    """Image hashes of every college's achievements, for spotting reused certificates"""
+    name = 'image_hashes'
+    fields = ('student_id', 'image_phash')
+    partition_class = ImageHashPartition
+    per_college = False
+    load_filter = {'image_phash__gt': ''}
+    sync_field = 'image_phash_updated_at'
+
+    def similar(self, image_hash, exclude_student_id=None, exclude_id=None, max_distance=MAX_DISTANCE):
+        """Return [(achievement_id, distance)] for images within max_distance bits"""
+        if not image_hash:
+            return []
+        partition = self.partition(None)
+        value = int(image_hash, 16)
+        with self._lock:
+            candidates = set()
+            for key in _chunks(value):
+                candidates.update(partition.tables.get(key, ()))
+            matches = []
+            for candidate in candidates:
+                other, student_id = partition.hashes[candidate]
+                if candidate == exclude_id or (exclude_student_id is not None and student_id == exclude_student_id):
+                    continue
+                bits = bin(value ^ other).count('1')
+                if bits <= max_distance:
+                    matches.append((candidate, bits))
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+    def similar_for(self, achievement):
+        """Images by other students that look like this achievement's image"""
+        return self.similar(
+            achievement.image_phash,
+            exclude_student_id=achievement.student_id,
+            exclude_id=achievement.pk,
+        )
+
+
+def compute_achievement_hash(achievement_id):
+    """Hash an achievement's stored image and record it on the row"""
+    from .models import Achievement
+
+    row = Achievement.objects.filter(id=achievement_id).values_list('college_id', 'image').first()
+    if not row or not row[1]:
+        return
+    image_hash = hash_stored_image(row[1])
+    Achievement.objects.filter(id=achievement_id, image=row[1]).update(
+        image_phash=image_hash, image_phash_updated_at=timezone.now()
+    )
+    index.changed([row[0]])
+
+
+index = ImageHashIndex()
@@ -0,0 +1,41 @@
+"""
+Jinja2 environment for the optional Jinja2 template backend.
+
+Provides the same helpers the Django templates use: url() and static() in
+place of the {% url %} and {% static %} tags, plus the truncatewords and
+date filters with Django's semantics.
+"""
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import dateformat
+from django.utils.text import Truncator
+from jinja2 import Environment
+
+
+def url(viewname, *args, **kwargs):
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def truncatewords(value, length):
+    if value is None:
+        return ''
+    return Truncator(value).words(int(length), truncate=' …')
+
+
+def date(value, format_string):
+    if not value:
+        return ''
+    return dateformat.format(value, format_string)
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+    })
+    env.filters.update({
+        'truncatewords': truncatewords,
+        'date': date,
+    })
+    return env
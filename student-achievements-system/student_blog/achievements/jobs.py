@@ -0,0 +1,343 @@
+"""
+Background job queue stored in the project database.
+
+Jobs are rows in the Job table, so enqueueing one is part of the surrounding
+transaction: a rolled back save never leaves a job behind, and a worker never
+sees a job before the data it refers to has committed. No broker is needed.
+
+    jobs.enqueue(compute_achievement_hash, achievement.pk)
+    jobs.schedule(send_digest, run_at=tomorrow_morning)
+
+`manage.py run_worker --processes N` runs the workers. Each worker claims due
+jobs with SELECT ... FOR UPDATE SKIP LOCKED where the database supports it
+(PostgreSQL, MySQL 8, Oracle). On SQLite, which has neither row locks nor
+SKIP LOCKED, a job is claimed with a conditional UPDATE ... WHERE status =
+'queued'. Only one worker's update can match, so each job still runs once.
+
+A failed job is retried with exponential backoff until max_attempts, then
+left as failed with its traceback for the admin. A job whose worker died is
+requeued after JOB_TIMEOUT seconds, which counts as an attempt, so a job that
+keeps killing its worker ends up failed too. A worker only records an outcome
+while it still holds the claim, so a slow worker whose job was requeued and
+claimed elsewhere never overwrites the new run's state.
+
+enqueue_once() skips a call that is already queued and not yet started, for
+refreshes that would otherwise pile up behind a burst of changes.
+
+Periodic jobs come from the JOB_SCHEDULE setting. Each entry has at most one
+queued or running job, guaranteed by a partial unique index, and finishing a
+run queues the next one. metrics() reports queue depth and latency for the
+job_stats command.
+
+Without a running worker, queued jobs never run: image hashes, external
+image downloads, emails and featured refreshes just wait. Set JOBS_EAGER =
+True to run jobs in-process right after commit instead (development without
+a worker, tests).
+"""
+import datetime
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Avg, Count, F, Max, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task_name(func):
+    """The importable dotted path a job stores for `func`"""
+    if isinstance(func, str):
+        return func
+    if '.' in func.__qualname__:
+        raise ValueError(f'{func.__qualname__} is not a module-level function and cannot be queued.')
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def schedule(func, args=(), kwargs=None, run_at=None, max_attempts=None, periodic=''):
+    """Queue func(*args, **kwargs) to run at `run_at` (default: now). Arguments must be JSON serialisable."""
+    from .models import Job
+
+    name = task_name(func)
+    if _setting('JOBS_EAGER', False) and not periodic:
+        transaction.on_commit(lambda: import_string(name)(*args, **(kwargs or {})))
+        return None
+    return Job.objects.create(
+        task=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or _setting('JOB_MAX_ATTEMPTS', 5),
+        periodic=periodic,
+    )
+
+
+def enqueue(func, *args, **kwargs):
+    """Queue func(*args, **kwargs) to run as soon as a worker is free"""
+    return schedule(func, args, kwargs)
+
+
+def enqueue_once(func, *args, **kwargs):
+    """
+    enqueue() unless the same call is already queued and not yet started.
+    For idempotent refreshes: the queued run will see every change committed
+    before it starts, so a second one adds nothing.
+    """
+    from .models import Job
+
+    if not _setting('JOBS_EAGER', False) and Job.objects.filter(
+        task=task_name(func), status='queued', args=list(args), kwargs=kwargs
+    ).exists():
+        return None
+    return enqueue(func, *args, **kwargs)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _claim_skip_locked(name, limit, now):
+    from .models import Job
+
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            Job.objects.filter(id__in=ids).update(
+                status='running', locked_by=name, locked_at=now, started_at=now, attempts=F('attempts') + 1
+            )
+    return ids
+
+
+def _claim_conditional_update(name, limit, now):
+    from .models import Job
+
+    candidates = list(
+        Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id').values_list('id', flat=True)[
+            :limit * 4
+        ]
+    )
+    ids = []
+    for job_id in candidates:
+        claimed = Job.objects.filter(id=job_id, status='queued').update(
+            status='running', locked_by=name, locked_at=now, started_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            ids.append(job_id)
+            if len(ids) >= limit:
+                break
+    return ids
+
+
+def claim(name, limit=1):
+    """Mark up to `limit` due jobs as running for worker `name` and return them"""
+    from .models import Job
+
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        ids = _claim_skip_locked(name, limit, now)
+    else:
+        ids = _claim_conditional_update(name, limit, now)
+    return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def _backoff(attempt):
+    base = _setting('JOB_RETRY_BACKOFF', 30)
+    delay = min(base * (2 ** (attempt - 1)), _setting('JOB_RETRY_BACKOFF_MAX', 3600))
+    return datetime.timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _schedule_next(job, now):
+    entry = _setting('JOB_SCHEDULE', {}).get(job.periodic)
+    if not entry:
+        return
+    interval = datetime.timedelta(seconds=entry['every'])
+    run_at = job.run_at + interval
+    if run_at <= now:
+        # The worker was down for a while; do not replay every missed run
+        run_at = now + interval
+    schedule(entry['task'], entry.get('args', ()), entry.get('kwargs'), run_at=run_at, periodic=job.periodic)
+
+
+def execute(job):
+    """Run one claimed job and record the outcome"""
+    from .models import Job
+
+    close_old_connections()
+    started = time.monotonic()
+    error = None
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+    duration = time.monotonic() - started
+    close_old_connections()
+
+    now = timezone.now()
+    with transaction.atomic():
+        if error is None:
+            status, run_at = 'done', job.run_at
+            logger.info('Job %s %s done in %.2fs', job.id, job.task, duration)
+        elif job.attempts < job.max_attempts:
+            status, run_at = 'queued', now + _backoff(job.attempts)
+            logger.warning('Job %s %s failed (attempt %s), retrying at %s', job.id, job.task, job.attempts, run_at)
+        else:
+            status, run_at = 'failed', job.run_at
+            logger.error('Job %s %s failed permanently:\n%s', job.id, job.task, error)
+        # Only while this worker still holds the claim: requeue_stale() may have handed the job to another
+        updated = Job.objects.filter(id=job.id, status='running', locked_by=job.locked_by, locked_at=job.locked_at).update(
+            status=status,
+            run_at=run_at,
+            finished_at=now if status != 'queued' else None,
+            duration=duration,
+            last_error=error or '',
+            locked_by='',
+            locked_at=None,
+        )
+        if not updated:
+            logger.warning('Job %s %s was requeued while %s ran it; its outcome was discarded',
+                           job.id, job.task, job.locked_by)
+            return 'lost'
+        if job.periodic and status != 'queued':
+            _schedule_next(job, now)
+    return status
+
+
+def requeue_stale():
+    """
+    Put running jobs whose worker stopped responding back in the queue, or
+    fail them when that was their last attempt. Returns (requeued, failed).
+    """
+    from .models import Job
+
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - datetime.timedelta(
+        seconds=_setting('JOB_TIMEOUT', 600)
+    ))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, locked_by='', locked_at=None,
+        last_error='Worker timed out on the last attempt.',
+    )
+    requeued = stale.update(status='queued', locked_by='', locked_at=None, last_error='Worker timed out.')
+    return requeued, failed
+
+
+def ensure_periodic():
+    """Queue the first run of every JOB_SCHEDULE entry that has no active job"""
+    from .models import Job
+
+    active = set(
+        Job.objects.filter(status__in=('queued', 'running')).exclude(periodic='').values_list('periodic', flat=True)
+    )
+    for name, entry in _setting('JOB_SCHEDULE', {}).items():
+        if name in active:
+            continue
+        try:
+            with transaction.atomic():
+                schedule(entry['task'], entry.get('args', ()), entry.get('kwargs'), periodic=name)
+        except IntegrityError:
+            # Another worker queued it first
+            pass
+
+
+def purge_finished(days=None):
+    """Delete done jobs older than JOB_RETENTION_DAYS; failed jobs are kept for inspection"""
+    from .models import Job
+
+    days = days if days is not None else _setting('JOB_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    return Job.objects.filter(status='done', finished_at__lt=cutoff).delete()[0]
+
+
+def metrics(window_minutes=60):
+    """Queue depth per status, age of the oldest due job and latency of recent jobs"""
+    from .models import Job
+
+    now = timezone.now()
+    depth = dict(Job.objects.order_by().values_list('status').annotate(count=Count('id')))
+    due = Job.objects.filter(status='queued', run_at__lte=now).aggregate(count=Count('id'), oldest=Min('run_at'))
+    recent = Job.objects.filter(status='done', finished_at__gte=now - datetime.timedelta(minutes=window_minutes))
+    stats = recent.aggregate(
+        count=Count('id'),
+        avg_wait=Avg(F('started_at') - F('run_at')),
+        max_wait=Max(F('started_at') - F('run_at')),
+        avg_duration=Avg('duration'),
+        max_duration=Max('duration'),
+    )
+    failed_recently = Job.objects.filter(
+        status='failed', finished_at__gte=now - datetime.timedelta(minutes=window_minutes)
+    ).count()
+    retrying = Job.objects.filter(status='queued', attempts__gt=0).count()
+
+    def seconds(value):
+        return value.total_seconds() if isinstance(value, datetime.timedelta) else value
+
+    return {
+        'depth': {status: depth.get(status, 0) for status in ('queued', 'running', 'done', 'failed')},
+        'due': due['count'],
+        'oldest_due_seconds': (now - due['oldest']).total_seconds() if due['oldest'] else 0,
+        'window_minutes': window_minutes,
+        'completed': stats['count'],
+        'failed': failed_recently,
+        'retrying': retrying,
+        'avg_wait_seconds': seconds(stats['avg_wait']),
+        'max_wait_seconds': seconds(stats['max_wait']),
+        'avg_duration_seconds': stats['avg_duration'],
+        'max_duration_seconds': stats['max_duration'],
+    }
+
+
+class Worker:
+    """Claim and run jobs until stop() is called"""
+
+    def __init__(self, batch_size=1, poll_interval=1.0, name=None):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.name = name or worker_name()
+        self.stopping = False
+        self._last_maintenance = 0.0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def _maintenance(self):
+        if time.monotonic() - self._last_maintenance < 60:
+            return
+        self._last_maintenance = time.monotonic()
+        requeued, failed = requeue_stale()
+        if requeued:
+            logger.warning('Requeued %s job(s) from unresponsive workers', requeued)
+        if failed:
+            logger.error('%s job(s) failed: their worker stopped responding on the last attempt', failed)
+        ensure_periodic()
+
+    def run(self, once=False):
+        """Process jobs; with once=True return as soon as nothing is due. Returns the number run."""
+        processed = 0
+        while not self.stopping:
+            self._maintenance()
+            jobs = claim(self.name, self.batch_size)
+            if not jobs:
+                if once:
+                    break
+                close_old_connections()
+                time.sleep(self.poll_interval)
+                continue
+            for job in jobs:
+                execute(job)
+                processed += 1
+        return processed
@@ -0,0 +1,369 @@
+import datetime
+import json
+import re
+from collections import defaultdict
+
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from achievements import urls as achievement_urls
+from achievements.models import (
+    Achievement, ChangeEvent, College, ContactMessage, Department, Job, UploadSession,
+)
+from achievements.projections import rebuild_cards
+
+# Extra query strings so the routes run their filtered code paths too
+ROUTE_VARIANTS = {
+    'achievements': ['?search=hackathon', '?competition=national&year=2025', '?date_from=2024-01-01&date_to=2024-06-30'],
+    'achievements_api': ['?since=2024-01-01T00:00:00Z'],
+    'changes_api': ['?after=0'],
+    'autocomplete_api': ['?field=event&q=sm'],
+}
+
+# Routes that would end the session for the clients that follow
+SKIPPED_ROUTES = {'logout'}
+
+STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+# A private in-memory cache, so requests run their cache-miss queries as on a cold server
+ISOLATED_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'analyze_queries'}}
+
+
+def normalize(sql):
+    """Collapse literals so the same statement with other parameters is analysed once"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'\(\?(?:, \?)*\)', '(?)', sql)
+
+
+def explain(sql):
+    """Return (plan lines, findings) where findings are (kind, table) tuples"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+            return details, _sqlite_findings(details)
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            lines, findings = [], []
+            _walk_postgresql(plan[0]['Plan'], lines, findings)
+            return lines, findings
+        cursor.execute(f'EXPLAIN {sql}')
+        return [' '.join(str(col) for col in row) for row in cursor.fetchall()], []
+
+
+def _sqlite_findings(details):
+    findings = []
+    for detail in details:
+        match = re.match(r'SCAN (\w+)', detail)
+        if match and 'USING' not in detail and match.group(1) != 'CONSTANT':
+            findings.append(('full scan', match.group(1)))
+        elif detail.startswith('USE TEMP B-TREE'):
+            findings.append((detail[len('USE TEMP B-TREE '):].lower().replace('for ', 'temp b-tree for '), None))
+    return findings
+
+
+def _walk_postgresql(node, lines, findings, depth=0):
+    relation = node.get('Relation Name')
+    lines.append('  ' * depth + node['Node Type'] + (f' on {relation}' if relation else ''))
+    if node['Node Type'] == 'Seq Scan':
+        findings.append(('full scan', relation))
+    elif node['Node Type'] in ('Sort', 'Incremental Sort'):
+        findings.append(('temp b-tree for order by', None))
+    for child in node.get('Plans', []):
+        _walk_postgresql(child, lines, findings, depth + 1)
+
+
+def _clauses(sql):
+    """Split the outermost WHERE and ORDER BY clauses out of a statement"""
+    where = order = ''
+    upper = sql.upper()
+    where_at = upper.rfind(' WHERE ')
+    order_at = upper.rfind(' ORDER BY ')
+    if where_at != -1:
+        end = min([i for i in (upper.find(' GROUP BY ', where_at), order_at, upper.find(' LIMIT ', where_at))
+                   if i > where_at] or [len(sql)])
+        where = sql[where_at + 7:end]
+    if order_at != -1:
+        end = upper.find(' LIMIT ', order_at)
+        order = sql[order_at + 10:end if end != -1 else len(sql)]
+    return where, order
+
+
+def propose_index(sql, table):
+    """
+    Guess the composite index that lets `table` be read in order without a scan:
+    equality columns first, then one range column, then the ORDER BY columns.
+    Returns (model, [field names]) or None.
+    """
+    model = next((m for m in apps.get_models() if m._meta.db_table == table), None)
+    if model is None:
+        return None
+    columns = {f.column: f.name for f in model._meta.concrete_fields}
+    where, order = _clauses(sql)
+    quoted = re.escape(f'"{table}"')
+
+    equality, ranges = [], []
+    for column, operator in re.findall(quoted + r'\."(\w+)"\s*(=|IN\b|IS\b|>=|<=|>|<|LIKE\b)', where, re.I):
+        operator = operator.upper()
+        if column not in columns or operator == 'LIKE':
+            continue
+        target = equality if operator in ('=', 'IN', 'IS') else ranges
+        if columns[column] not in equality + ranges:
+            target.append(columns[column])
+    ordering = []
+    for column, direction in re.findall(quoted + r'\."(\w+)"\s*(ASC|DESC)?', order, re.I):
+        name = columns.get(column)
+        if name and name not in equality and name not in (o.lstrip('-') for o in ordering):
+            ordering.append(f'-{name}' if direction.upper() == 'DESC' else name)
+
+    fields = equality + ranges[:1] + ([] if ranges else ordering)
+    if not fields or _covered(model, fields):
+        return None
+    return model, fields
+
+
+def _covered(model, fields):
+    """True when an existing index (declared, unique or FK) starts with these fields"""
+    existing = [list(index.fields) for index in model._meta.indexes]
+    existing += [list(fields_) for fields_ in model._meta.unique_together]
+    existing += [[f.name] for f in model._meta.concrete_fields if f.db_index or f.unique or f.primary_key]
+    bare = [f.lstrip('-') for f in fields]
+    for index in existing:
+        index = [f.lstrip('-') for f in index]
+        if index[:len(bare)] == bare:
+            return True
+    return False
+
+
+def _filter_value(model, path):
+    """A query string value that makes the admin apply the list_filter on `path`"""
+    field = get_fields_from_path(model, path)[-1]
+    if isinstance(field, (models.ForeignKey, models.OneToOneField)):
+        related = field.related_model.objects.order_by('pk').values_list('pk', flat=True).first()
+        return f'{path}__id__exact', related or 1
+    if isinstance(field, models.BooleanField):
+        return f'{path}__exact', 1
+    if isinstance(field, models.DateTimeField) or isinstance(field, models.DateField):
+        return f'{path}__gte', '2024-01-01'
+    if field.choices:
+        return f'{path}__exact', field.choices[0][0]
+    value = model.objects.order_by().values_list(path, flat=True).exclude(**{f'{path}__isnull': True}).first()
+    return f'{path}__exact', value if value is not None else ''
+
+
+class Command(BaseCommand):
+    help = (
+        'Run every achievements route and admin changelist against seeded data in a throwaway test '
+        'database, EXPLAIN each SQL statement and propose indexes for full scans and temp-B-tree sorts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--achievements-per-student', type=int, default=10)
+        parser.add_argument('--min-rows', type=int, default=100,
+                            help='Ignore full scans of tables smaller than this')
+        parser.add_argument('--show-plans', action='store_true', help='Print the plan of every flagged statement')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # The configured cache is shared with the running site; never clear it or fill it with seeded data
+            with override_settings(CACHES=ISOLATED_CACHES):
+                self.seed(options['students'], options['achievements_per_student'])
+                statements = self.capture()
+            self.report(statements, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, students, per_student):
+        self.stdout.write(f'Seeding {students} students with {per_student} achievements each...')
+        college = College.objects.filter(is_default=True).first()
+        departments = [
+            Department.objects.get_or_create(college=college, name=name)[0]
+            for name in ('Computer Science & Engineering', 'Electronics & Communication', 'Mechanical Engineering')
+        ]
+        levels = [level for level, _ in Achievement.COMPETITION_LEVELS]
+        now = timezone.now()
+
+        self.student = User.objects.create(username='analyze-student', first_name='Query', last_name='Student')
+        self.staff = User.objects.create(username='analyze-staff', is_staff=True)
+        self.superuser = User.objects.create(username='analyze-admin', is_staff=True, is_superuser=True)
+        users = [self.student]
+        for i in range(students - 1):
+            users.append(User.objects.create(username=f'student{i}', first_name=f'First{i}', last_name=f'Last{i}'))
+        for i, user in enumerate(users):
+            profile = user.studentprofile
+            profile.department = departments[i % len(departments)]
+            profile.year = 2023 + i % 4
+            profile.roll_number = f'R{i:05d}'
+            profile.save()
+
+        Achievement.objects.bulk_create([
+            Achievement(
+                student=user, college=college, name=f'Prize {n} of {user.username}',
+                event=['Smart India Hackathon', 'Code Sprint', 'Robotics Expo'][n % 3],
+                prize='1st', competition=levels[(i + n) % len(levels)], description='Seeded achievement',
+                date_achieved=datetime.date(2024, 1 + n % 12, 1 + i % 28),
+                created_at=now - datetime.timedelta(hours=i * per_student + n),
+                is_approved=(i + n) % 4 != 0,
+            )
+            for i, user in enumerate(users) for n in range(per_student)
+        ], batch_size=500)
+        rebuild_cards()
+        ContactMessage.objects.bulk_create([
+            ContactMessage(name=f'Visitor {i}', email=f'v{i}@example.com', subject='Question', message='Hello',
+                           is_read=i % 2 == 0)
+            for i in range(students)
+        ])
+        ChangeEvent.objects.bulk_create([
+            ChangeEvent(entity='achievement', entity_id=i, action='updated', college=college)
+            for i in range(1, students * 2)
+        ])
+        Job.objects.bulk_create([
+            Job(task='achievements.jobs.purge_finished', status=['done', 'queued', 'failed'][i % 3])
+            for i in range(students)
+        ])
+        self.upload = UploadSession.objects.create(
+            user=self.student, kind='achievement', filename='scan.png', total_size=1024
+        )
+
+    def _route_urls(self):
+        for pattern in achievement_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or pattern.name in SKIPPED_ROUTES:
+                continue
+            kwargs = {}
+            for name, converter in pattern.pattern.converters.items():
+                if type(converter).__name__ == 'UUIDConverter':
+                    kwargs[name] = self.upload.pk
+                else:
+                    kwargs[name] = Achievement.objects.filter(student=self.student).values_list('pk', flat=True).first()
+            url = reverse(pattern.name, kwargs=kwargs)
+            yield pattern.name, url
+            for variant in ROUTE_VARIANTS.get(pattern.name, []):
+                yield pattern.name, url + variant
+
+    def _changelist_urls(self):
+        for model, model_admin in admin.site._registry.items():
+            opts = model._meta
+            url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+            name = f'admin:{opts.model_name}'
+            yield name, url
+            if model_admin.search_fields:
+                yield name, url + '?q=test'
+            for list_filter in model_admin.list_filter:
+                if isinstance(list_filter, str):
+                    param, value = _filter_value(model, list_filter)
+                    yield name, f'{url}?{param}={value}'
+
+    def capture(self):
+        """Run every URL as each kind of user; returns {normalized sql: (sql, set of sources)}"""
+        clients = {'anonymous': Client(), 'student': Client(), 'staff': Client()}
+        clients['student'].force_login(self.student)
+        clients['staff'].force_login(self.staff)
+        admin_client = Client()
+        admin_client.force_login(self.superuser)
+
+        runs = [(role, name, url) for role in clients for name, url in self._route_urls()]
+        runs += [('admin', name, url) for name, url in self._changelist_urls()]
+        statements = {}
+        for role, name, url in runs:
+            client = admin_client if role == 'admin' else clients[role]
+            # Only the private cache of ISOLATED_CACHES, so every request starts cold
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                client.get(url, HTTP_HOST='localhost')
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith(STATEMENTS):
+                    continue
+                key = normalize(sql)
+                statements.setdefault(key, (sql, set()))[1].add(f'{url} ({role})')
+        self.stdout.write(f'Captured {len(statements)} distinct statements from {len(runs)} requests.')
+        return statements
+
+    def report(self, statements, options):
+        table_rows = {}
+
+        def rows(table):
+            if table not in table_rows:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                    table_rows[table] = cursor.fetchone()[0]
+            return table_rows[table]
+
+        proposals = defaultdict(set)
+        flagged = 0
+        for sql, sources in statements.values():
+            try:
+                plan, findings = explain(sql)
+            except Exception as e:
+                self.stderr.write(f'Could not EXPLAIN: {sql[:120]}... ({e})')
+                continue
+            where, _ = _clauses(sql)
+            # A scan without a WHERE clause (admin COUNT(*) and the like) is not something an index can narrow
+            findings = [
+                (kind, table) for kind, table in findings
+                if table is None or (where and rows(table) >= options['min_rows'])
+            ]
+            if not findings:
+                continue
+            flagged += 1
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING(', '.join(
+                f'{kind} of {table} ({rows(table)} rows)' if table else kind for kind, table in findings
+            )))
+            self.stdout.write(f'  {sql[:300]}{"..." if len(sql) > 300 else ""}')
+            self.stdout.write(f'  from: {", ".join(sorted(sources)[:3])}{" ..." if len(sources) > 3 else ""}')
+            if options['show_plans']:
+                for line in plan:
+                    self.stdout.write(f'    | {line}')
+
+            tables = {table for _, table in findings if table}
+            if any(table is None for _, table in findings):
+                tables |= set(re.findall(r'ORDER BY\s+"(\w+)"\.', sql, re.I))
+            for table in sorted(tables):
+                if rows(table) < options['min_rows']:
+                    continue
+                proposal = propose_index(sql, table)
+                if proposal:
+                    model, fields = proposal
+                    proposals[(model, tuple(fields))].update(sources)
+                    self.stdout.write(f'  proposed: {model.__name__} models.Index(fields={list(fields)})')
+
+        # An index on (a) is redundant next to a proposed (a, b)
+        for model, fields in sorted(proposals, key=lambda key: len(key[1])):
+            longer = [
+                key for key in proposals
+                if key[0] is model and len(key[1]) > len(fields) and key[1][:len(fields)] == fields
+            ]
+            if longer:
+                proposals[longer[0]].update(proposals.pop((model, fields)))
+
+        self.stdout.write('')
+        self.stdout.write(f'{flagged} of {len(statements)} statements need a full scan or a temporary sort.')
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS('No new indexes to propose.'))
+            return
+        self.stdout.write(self.style.SUCCESS('Proposed indexes (add to Meta.indexes, then makemigrations):'))
+        for (model, fields), sources in sorted(proposals.items(), key=lambda item: -len(item[1])):
+            self.stdout.write(
+                f'  {model._meta.label}: models.Index(fields={list(fields)})  '
+                f'# {len(sources)} route(s)'
+            )
@@ -0,0 +1,62 @@
+import os
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from achievements.image_hash import hash_stored_image, index
+from achievements.models import Achievement
+
+
+def _hash_row(row):
+    achievement_id, name = row
+    return achievement_id, name, hash_stored_image(name)
+
+
+class Command(BaseCommand):
+    help = 'Compute perceptual hashes for existing achievement images, in parallel across CPU cores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: CPU count)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows written per UPDATE batch')
+        parser.add_argument('--force', action='store_true',
+                            help='Recompute hashes that are already stored')
+
+    def handle(self, *args, **options):
+        queryset = Achievement.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['force']:
+            queryset = queryset.filter(image_phash='')
+        rows = list(queryset.order_by('id').values_list('id', 'image'))
+
+        if not rows:
+            self.stdout.write(self.style.SUCCESS('All images are already hashed.'))
+            return
+
+        self.stdout.write(f'Hashing {len(rows)} image(s) with {options["processes"]} process(es)...')
+        hashed = failed = 0
+        pending = []
+
+        # Workers only read files; every database write stays in this process
+        with Pool(processes=options['processes']) as pool:
+            for achievement_id, name, image_hash in pool.imap_unordered(_hash_row, rows, chunksize=32):
+                if not image_hash:
+                    failed += 1
+                    continue
+                pending.append(
+                    Achievement(id=achievement_id, image_phash=image_hash, image_phash_updated_at=timezone.now())
+                )
+                if len(pending) >= options['batch_size']:
+                    hashed += self._flush(pending)
+                    pending = []
+        hashed += self._flush(pending)
+        # The index spans every college, so any college id bumps it
+        index.changed([None])
+
+        self.stdout.write(self.style.SUCCESS(f'{hashed} image(s) hashed, {failed} could not be read.'))
+
+    def _flush(self, achievements):
+        if achievements:
+            Achievement.objects.bulk_update(achievements, ['image_phash', 'image_phash_updated_at'])
+        return len(achievements)
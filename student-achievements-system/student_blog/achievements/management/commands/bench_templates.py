@@ -0,0 +1,102 @@
+import datetime
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.template import engines
+from django.test import RequestFactory
+from django.utils import timezone
+
+from achievements import facets
+from achievements.models import Achievement, AchievementCard
+
+
+def sample_cards(count):
+    """Unsaved cards with realistic field lengths; nothing touches the database"""
+    labels = dict(Achievement.COMPETITION_LEVELS)
+    levels = list(labels)
+    now = timezone.now()
+    cards = []
+    for i in range(count):
+        level = levels[i % len(levels)]
+        cards.append(AchievementCard(
+            achievement_id=i + 1,
+            student_id=i % 50 + 1,
+            name=f'First Prize in Hackathon Round {i}',
+            event=f'Smart India Hackathon {2020 + i % 5}',
+            prize='1st Prize',
+            competition=level,
+            competition_label=labels[level],
+            description='Built an end-to-end platform for tracking water quality in rural areas. ' * 3,
+            image_url=f'/media/achievements/user_{i % 50 + 1}/achievement_{i + 1}.jpg' if i % 3 else '',
+            student_name=f'Student Number{i % 50}',
+            student_initials='SN',
+            roll_number=f'STU{i % 50:04d}',
+            department='Computer Science & Engineering',
+            date_achieved=datetime.date(2024, 1 + i % 12, 1 + i % 28),
+            created_at=now - datetime.timedelta(hours=i),
+        ))
+    return cards
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rendering achievements.html with Django templates (cached loader) and Jinja2'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--template', default='achievements/achievements.html')
+
+    def handle(self, *args, **options):
+        try:
+            from django.template.backends.jinja2 import Jinja2
+        except ImportError:
+            raise CommandError('Jinja2 is not installed (pip install Jinja2).')
+
+        jinja_params = dict(settings.JINJA2_TEMPLATES, NAME='bench-jinja2')
+        jinja_params.pop('BACKEND')
+        backends = {
+            'django': engines['django'],
+            'jinja2': Jinja2(jinja_params),
+        }
+
+        request = RequestFactory().get('/achievements/')
+        request.user = AnonymousUser()
+        request.college = None
+        cards = sample_cards(options['cards'])
+        context = {
+            'achievements': cards,
+            'page_obj': Paginator(cards, max(len(cards), 1)).page(1),
+            'previous_page_url': None,
+            'next_page_url': None,
+            'search_query': '',
+            'filters': facets.parse_filters({}),
+            'facets': [],
+            'result_count': options['cards'],
+        }
+
+        self.stdout.write(
+            f'Rendering {options["template"]} with {options["cards"]} cards, '
+            f'{options["iterations"]} iterations per backend'
+        )
+        results = {}
+        for name, backend in backends.items():
+            # First render compiles and caches the template; not timed
+            backend.get_template(options['template']).render(context, request)
+            timings = []
+            for _ in range(options['iterations']):
+                start = time.perf_counter()
+                template = backend.get_template(options['template'])
+                template.render(context, request)
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = timings
+            self.stdout.write(
+                f'  {name:<7} median {statistics.median(timings):8.2f} ms   '
+                f'min {min(timings):8.2f} ms   max {max(timings):8.2f} ms'
+            )
+
+        speedup = statistics.median(results['django']) / statistics.median(results['jinja2'])
+        self.stdout.write(self.style.SUCCESS(f'Jinja2 renders {speedup:.1f}x as fast as Django templates'))
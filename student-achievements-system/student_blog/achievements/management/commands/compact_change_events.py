@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from achievements.changes import compact, retention_days
+
+
+class Command(BaseCommand):
+    help = 'Compact the change feed: past the retention window keep only the newest event per entity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Defaults to CHANGE_EVENT_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        retention = options['retention_days'] if options['retention_days'] is not None else retention_days()
+        deleted = compact(retention=retention, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} superseded change event(s) older than {retention} day(s) {verb}.'
+        ))
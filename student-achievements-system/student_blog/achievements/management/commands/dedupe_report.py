@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from achievements.duplicates import DEFAULT_THRESHOLD, duplicate_groups
+from achievements.models import Achievement
+
+
+class Command(BaseCommand):
+    help = 'Report groups of likely duplicate achievements in a single pass over the table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help='Minimum estimated similarity (0-1) for two achievements to be grouped',
+        )
+        parser.add_argument(
+            '--pending-only', action='store_true',
+            help='Only consider achievements that are still waiting for approval',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Achievement.objects.all()
+        if options['pending_only']:
+            queryset = queryset.filter(is_approved=False)
+
+        rows = queryset.order_by('id').values_list('id', 'name', 'event', 'description')
+        groups = duplicate_groups(rows.iterator(), threshold=options['threshold'])
+
+        if not groups:
+            self.stdout.write(self.style.SUCCESS('No likely duplicates found.'))
+            return
+
+        details = Achievement.objects.in_bulk(
+            [achievement_id for group in groups for achievement_id in group]
+        )
+        for number, group in enumerate(groups, start=1):
+            self.stdout.write(self.style.WARNING(f'Group {number} ({len(group)} achievements)'))
+            for achievement_id in group:
+                achievement = details[achievement_id]
+                status = 'approved' if achievement.is_approved else 'pending'
+                self.stdout.write(
+                    f'  #{achievement.id} [{status}] {achievement.name} - {achievement.event} '
+                    f'(student {achievement.student_id})'
+                )
+        self.stdout.write(self.style.SUCCESS(f'{len(groups)} duplicate group(s) found.'))
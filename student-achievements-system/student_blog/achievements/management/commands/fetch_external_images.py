@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from achievements.image_fetcher import fetch_images
+from achievements.models import Achievement
+
+
+class Command(BaseCommand):
+    help = 'Download external image_url images into media storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Also retry achievements whose previous download failed')
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Maximum simultaneous downloads (default: IMAGE_FETCH_CONCURRENCY)')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        statuses = ['', 'pending'] + (['failed'] if options['retry_failed'] else [])
+        ids = list(
+            Achievement.objects.filter(Q(image='') | Q(image__isnull=True), image_fetch_status__in=statuses)
+            .exclude(image_url__isnull=True).exclude(image_url='')
+            .order_by('id').values_list('id', flat=True)
+        )
+        if not ids:
+            self.stdout.write(self.style.SUCCESS('No external images to fetch.'))
+            return
+
+        fetched = failed = 0
+        for start in range(0, len(ids), options['batch_size']):
+            batch_fetched, batch_failed = fetch_images(
+                ids[start:start + options['batch_size']], concurrency=options['concurrency']
+            )
+            fetched += batch_fetched
+            failed += batch_failed
+
+        self.stdout.write(self.style.SUCCESS(f'{fetched} image(s) fetched, {failed} failed.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from achievements.media_gc import collect, grace_hours
+
+
+class Command(BaseCommand):
+    help = 'Delete media files and upload temp files that no row references (see achievements.media_gc)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=None,
+                            help='Keep files modified more recently than this. Defaults to MEDIA_GC_GRACE_HOURS')
+        parser.add_argument('--batch-size', type=int, default=500, help='Files per delete task')
+        parser.add_argument('--workers', type=int, default=4, help='Threads deleting batches in parallel')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        grace = options['grace_hours'] if options['grace_hours'] is not None else grace_hours()
+        stats = collect(
+            grace=grace,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write,
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'{stats["media"]} orphaned media file(s), {stats["uploads"]} upload temp file(s) and '
+                f'{stats["sessions"]} stale upload session(s) older than {grace:g} hour(s) would be deleted.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{stats["deleted"]} file(s) deleted ({stats["media"]} orphaned media, {stats["uploads"]} upload temp), '
+            f'{stats["sessions"]} stale upload session(s) and {stats["directories"]} empty directory(ies) removed.'
+        ))
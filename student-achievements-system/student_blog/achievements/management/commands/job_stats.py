@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from achievements.jobs import metrics
+
+
+class Command(BaseCommand):
+    help = 'Show background job queue depth and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=60, help='Minutes of finished jobs to include')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def handle(self, *args, **options):
+        stats = metrics(window_minutes=options['window'])
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+            return
+
+        def fmt(seconds):
+            return '-' if seconds is None else f'{seconds:.2f}s'
+
+        depth = stats['depth']
+        self.stdout.write(
+            f'Queue: {depth["queued"]} queued ({stats["due"]} due, {stats["retrying"]} awaiting retry), '
+            f'{depth["running"]} running, {depth["done"]} done, {depth["failed"]} failed'
+        )
+        self.stdout.write(f'Oldest due job waiting: {fmt(stats["oldest_due_seconds"])}')
+        self.stdout.write(
+            f'Last {stats["window_minutes"]} min: {stats["completed"]} completed, {stats["failed"]} failed; '
+            f'wait avg {fmt(stats["avg_wait_seconds"])} max {fmt(stats["max_wait_seconds"])}; '
+            f'run avg {fmt(stats["avg_duration_seconds"])} max {fmt(stats["max_duration_seconds"])}'
+        )
@@ -0,0 +1,32 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from achievements.prerender import output_root, prerender
+
+
+class Command(BaseCommand):
+    help = 'Render the public pages and sitemap to static HTML (see achievements.prerender)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-render every page instead of only what changed')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Rendering processes')
+        parser.add_argument('--batch-size', type=int, default=100, help='Pages per task handed to a process')
+        parser.add_argument('--output', help='Output directory (default: PRERENDER_ROOT)')
+
+    def handle(self, *args, **options):
+        root = options['output'] or output_root()
+        started = time.monotonic()
+        stats = prerender(
+            full=options['full'],
+            processes=options['processes'],
+            batch_size=options['batch_size'],
+            root=root,
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{stats["mode"].capitalize()} render into {root}: {stats["rendered"]} page(s) rendered, '
+            f'{stats["written"]} file(s) written, {stats["removed"]} removed in {time.monotonic() - started:.1f}s '
+            f'(up to change event {stats["last_event_id"]}).'
+        ))
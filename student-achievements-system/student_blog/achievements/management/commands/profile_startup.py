@@ -0,0 +1,165 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is imported yet. Prints one JSON line.
+# -X importtime does not see modules Django loads with importlib.import_module
+# (apps, models, admin modules, the URLconf), so those calls are timed here.
+PROBE = '''
+import importlib, io, json, sys, time
+from wsgiref.util import setup_testing_defaults
+dynamic = []
+_import_module = importlib.import_module
+def import_module(name, package=None):
+    started = time.perf_counter()
+    try:
+        return _import_module(name, package)
+    finally:
+        dynamic.append((name, time.perf_counter() - started))
+importlib.import_module = import_module
+started = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+booted = time.perf_counter()
+from achievements import startup
+result = {
+    'boot': booted - started, 'warm_up': startup.timings, 'modules': sorted(sys.modules), 'dynamic': dynamic,
+    'bytecode_cached': not sys.dont_write_bytecode,
+}
+if len(sys.argv) > 2:
+    status = []
+    for key in ('first_request', 'second_request'):
+        environ = {'PATH_INFO': sys.argv[2], 'wsgi.input': io.BytesIO()}
+        setup_testing_defaults(environ)
+        started = time.perf_counter()
+        b''.join(module.application(environ, lambda s, h, exc_info=None: status.append(s)))
+        result[key] = time.perf_counter() - started
+    result['status'] = status[0]
+print(json.dumps(result))
+'''
+
+WATCHED = ('PIL', 'jinja2', 'urllib.request', 'django.contrib.admin', 'achievements.admin', 'achievements.image_fetcher')
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from python -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Profile the cold start of the WSGI/ASGI application: import time breakdown and warm-up steps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--asgi', action='store_true', help='Profile student_blog.asgi instead of wsgi')
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts to measure; medians are reported')
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest modules to list')
+        parser.add_argument('--path', help='Also time the first request to this path (WSGI only)')
+        parser.add_argument('--no-warm-up', action='store_true', help='Start with STARTUP_WARM_UP=0')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def run_probe(self, entrypoint, path, warm_up):
+        env = dict(os.environ, STARTUP_WARM_UP='1' if warm_up else '0')
+        env.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'student_blog.settings'))
+        args = [sys.executable, '-X', 'importtime', '-c', PROBE, entrypoint] + ([path] if path else [])
+        started = time.perf_counter()
+        proc = subprocess.run(args, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - started
+        if proc.returncode:
+            raise CommandError(f'{entrypoint} failed to start:\n{proc.stderr[-2000:]}')
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['process'] = wall
+        result['imports'] = parse_importtime(proc.stderr)
+        return result
+
+    def handle(self, *args, **options):
+        entrypoint = 'student_blog.asgi' if options['asgi'] else 'student_blog.wsgi'
+        if options['path'] and options['asgi']:
+            raise CommandError('--path is only supported for the WSGI entry point.')
+
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        interpreter = time.perf_counter() - started
+        runs = [self.run_probe(entrypoint, options['path'], not options['no_warm_up']) for _ in range(options['runs'])]
+
+        def median(values):
+            return statistics.median(values) * 1000 if values else None
+
+        # Per module figures come from the last run; totals are medians
+        last = runs[-1]
+        packages = defaultdict(int)
+        for name, self_us, _ in last['imports']:
+            packages[name.split('.')[0]] += self_us
+        steps = sorted({step for run in runs for step in run['warm_up']})
+        report = {
+            'entrypoint': entrypoint,
+            'runs': len(runs),
+            'interpreter_ms': interpreter * 1000,
+            'boot_ms': median([run['boot'] for run in runs]),
+            'process_ms': median([run['process'] for run in runs]),
+            'warm_up_ms': {
+                step: median([run['warm_up'][step] for run in runs if step in run['warm_up']]) for step in steps
+            },
+            'first_request_ms': median([run['first_request'] for run in runs if 'first_request' in run]),
+            'second_request_ms': median([run['second_request'] for run in runs if 'second_request' in run]),
+            'first_request_status': last.get('status'),
+            'packages_ms': {name: us / 1000 for name, us in sorted(packages.items(), key=lambda p: -p[1])},
+            'django_loaded_ms': [
+                {'module': name, 'cumulative': seconds * 1000}
+                for name, seconds in sorted(last['dynamic'], key=lambda m: -m[1])
+                if name != entrypoint and seconds * 1000 >= 1
+            ][:options['top']],
+            'slowest_modules_ms': [
+                {'module': name, 'self': self_us / 1000, 'cumulative': cumulative_us / 1000}
+                for name, self_us, cumulative_us in sorted(last['imports'], key=lambda m: -m[2])[:options['top']]
+            ],
+            'bytecode_cached': last['bytecode_cached'],
+            'loaded': {name: any(m == name or m.startswith(name + '.') for m in last['modules']) for name in WATCHED},
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+
+        self.stdout.write(
+            f'{entrypoint}: median of {len(runs)} cold starts (interpreter alone {report["interpreter_ms"]:.0f} ms)'
+        )
+        self.stdout.write(f'  process start to ready  {report["process_ms"]:8.1f} ms')
+        self.stdout.write(f'  import + warm-up        {report["boot_ms"]:8.1f} ms')
+        for step, ms in report['warm_up_ms'].items():
+            self.stdout.write(f'    warm-up {step:<15} {ms:8.1f} ms')
+        if report['first_request_ms'] is not None:
+            self.stdout.write(
+                f'  first request           {report["first_request_ms"]:8.1f} ms '
+                f'({options["path"]}, {report["first_request_status"]})'
+            )
+            self.stdout.write(f'  second request          {report["second_request_ms"]:8.1f} ms')
+        if not report['bytecode_cached']:
+            self.stdout.write(self.style.WARNING(
+                '  Bytecode caching is off (PYTHONDONTWRITEBYTECODE); project modules are compiled on every '
+                'start. Run python -m compileall when building the image.'
+            ))
+
+        self.stdout.write('\nImport time by package (self time):')
+        for name, ms in list(report['packages_ms'].items())[:10]:
+            self.stdout.write(f'  {name:<30} {ms:8.1f} ms')
+        self.stdout.write('\nLoaded by Django through import_module (cumulative):')
+        for module in report['django_loaded_ms']:
+            self.stdout.write(f'  {module["module"]:<50} {module["cumulative"]:8.1f} ms')
+        self.stdout.write(f'\nSlowest {options["top"]} modules (cumulative, self):')
+        for module in report['slowest_modules_ms']:
+            self.stdout.write(f'  {module["module"]:<50} {module["cumulative"]:8.1f} {module["self"]:8.1f} ms')
+        self.stdout.write('\nLoaded at startup:')
+        for name, loaded in report['loaded'].items():
+            self.stdout.write(f'  {name:<30} {"yes" if loaded else "no"}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from achievements.projections import rebuild_cards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the AchievementCard listing projection from Achievement, User and StudentProfile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        written = rebuild_cards(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{written} achievement card(s) rebuilt.'))
@@ -0,0 +1,63 @@
+import logging
+import multiprocessing
+import signal
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from achievements.jobs import Worker
+
+
+def _run_worker(batch_size, poll_interval, once):
+    # Runs in a child process; with the spawn start method Django is not set up yet
+    django.setup()
+    worker = Worker(batch_size=batch_size, poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=once)
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers (see achievements.jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=1, help='Jobs claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due')
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(levelname)s %(message)s')
+        worker_args = (options['batch_size'], options['poll_interval'], options['once'])
+
+        if options['processes'] <= 1:
+            worker = Worker(batch_size=options['batch_size'], poll_interval=options['poll_interval'])
+            signal.signal(signal.SIGTERM, worker.stop)
+            signal.signal(signal.SIGINT, worker.stop)
+            self.stdout.write(f'Worker {worker.name} started.')
+            processed = worker.run(once=options['once'])
+            self.stdout.write(self.style.SUCCESS(f'Worker stopped after {processed} job(s).'))
+            return
+
+        # Children must not share the parent's database connection
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_run_worker, args=worker_args, name=f'worker-{i + 1}')
+            for i in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {len(processes)} worker processes.')
+
+        def stop(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        # Ctrl+C reaches the children directly; the parent only waits for them
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('All workers stopped.'))
@@ -0,0 +1,220 @@
+"""
+Garbage collection of orphaned media files.
+
+Deleting an achievement removes its row but not its image file. Replacing an
+avatar leaves the old file behind. achievement_image_path() puts a timestamp in
+every file name, so each re-upload adds another file. Chunked uploads that are
+never finished leave their .part file in CHUNKED_UPLOAD_TEMP_DIR.
+
+collect() finds these files and removes them:
+
+- The names still referenced by Achievement.image and StudentProfile.avatar
+  are loaded into one set, read through a values_list() iterator so rows are
+  never built as model instances.
+- MEDIA_ROOT/achievements/ and MEDIA_ROOT/avatars/ are walked with
+  os.scandir(), one directory at a time, so memory use does not grow with the
+  number of files on disk.
+- A file is only an orphan if its name is not in the set and it was last
+  modified before the grace period. The grace period covers files saved
+  after the set was built and uploads whose row is not committed yet.
+- Orphans are deleted in batches of `batch_size` by a small thread pool.
+  Directories left empty are removed afterwards.
+
+Upload sessions idle for longer than the grace period are deleted along with
+their temporary file, and so are .part files that have no session. The
+sessions are read in one query up front, not one per .part file.
+
+The daily 'gc-media' entry in JOB_SCHEDULE runs with dry_run=True and only
+logs what it would delete; change its kwargs to delete for real.
+"""
+import datetime
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+
+from .uploads import upload_temp_dir
+
+logger = logging.getLogger(__name__)
+
+# Top-level MEDIA_ROOT directories written by achievement_image_path() and StudentProfile.avatar
+MEDIA_DIRS = ('achievements', 'avatars')
+
+
+def grace_hours():
+    return getattr(settings, 'MEDIA_GC_GRACE_HOURS', 24)
+
+
+def scan(directory):
+    """
+    Yield (path, mtime) for every file under `directory`. Only the directories
+    still to be visited are kept, never a full listing.
+    """
+    pending = [directory]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    try:
+                        yield entry.path, entry.stat(follow_symlinks=False).st_mtime
+                    except FileNotFoundError:
+                        continue
+
+
+def live_names():
+    """Storage names referenced by an achievement image or a profile avatar"""
+    from .models import Achievement, StudentProfile
+
+    names = set()
+    for queryset, field in ((Achievement.objects, 'image'), (StudentProfile.objects, 'avatar')):
+        names.update(queryset.exclude(**{field: ''}).values_list(field, flat=True).iterator(chunk_size=5000))
+    return names
+
+
+def orphaned_media(root, live, cutoff):
+    """Yield the paths under the managed media directories that nothing references"""
+    for top in MEDIA_DIRS:
+        for path, mtime in scan(os.path.join(root, top)):
+            if mtime >= cutoff:
+                continue
+            if os.path.relpath(path, root).replace(os.sep, '/') not in live:
+                yield path
+
+
+def orphaned_uploads(cutoff):
+    """
+    Yield the .part files in the upload temp directory whose session is gone
+    or has been idle since before `cutoff`.
+    """
+    from .models import UploadSession
+
+    stale_before = datetime.datetime.fromtimestamp(cutoff, tz=datetime.timezone.utc)
+    sessions = {
+        str(session_id): updated_at for session_id, updated_at in UploadSession.objects.values_list('id', 'updated_at')
+    }
+    for path, mtime in scan(upload_temp_dir()):
+        if not path.endswith('.part'):
+            continue
+        updated_at = sessions.get(os.path.basename(path)[:-len('.part')])
+        if updated_at is None and mtime < cutoff:
+            yield path
+        elif updated_at is not None and updated_at < stale_before:
+            yield path
+
+
+def delete_files(paths):
+    """Remove `paths`; returns (deleted, parent directories touched)"""
+    deleted = 0
+    parents = set()
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as exc:
+            logger.warning('Could not delete %s: %s', path, exc)
+            continue
+        deleted += 1
+        parents.add(os.path.dirname(path))
+    return deleted, parents
+
+
+def _batches(paths, batch_size):
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def remove_empty_dirs(directories, stop_at):
+    """Remove each directory that is now empty, and its empty parents up to the `stop_at` roots"""
+    stop_at = {os.path.realpath(path) for path in stop_at}
+    removed = 0
+    for directory in sorted(directories, key=len, reverse=True):
+        while os.path.realpath(directory) not in stop_at:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            removed += 1
+            directory = os.path.dirname(directory)
+    return removed
+
+
+def collect(grace=None, batch_size=500, workers=4, dry_run=False, log=None):
+    """
+    Delete orphaned media and stale upload files. Returns a stats dict; with
+    dry_run=True nothing is deleted or discarded and the counts are of what
+    would be.
+    """
+    from .models import UploadSession
+
+    started = time.monotonic()
+    grace = grace_hours() if grace is None else grace
+    cutoff = time.time() - grace * 60 * 60
+    root = settings.MEDIA_ROOT
+
+    live = live_names()
+    if log:
+        log(f'{len(live)} referenced file(s) loaded in {time.monotonic() - started:.2f}s')
+
+    stats = {'referenced': len(live), 'media': 0, 'uploads': 0, 'sessions': 0, 'deleted': 0, 'directories': 0}
+
+    def candidates():
+        for path in orphaned_media(root, live, cutoff):
+            stats['media'] += 1
+            yield path
+        for path in orphaned_uploads(cutoff):
+            stats['uploads'] += 1
+            yield path
+
+    stale_sessions = UploadSession.objects.filter(
+        updated_at__lt=datetime.datetime.fromtimestamp(cutoff, tz=datetime.timezone.utc)
+    )
+    if dry_run:
+        for _ in candidates():
+            pass
+        stats['sessions'] = stale_sessions.count()
+        logger.info('Media GC dry run: %(media)d orphaned media file(s), %(uploads)d upload temp file(s) and '
+                    '%(sessions)d stale upload session(s) would be deleted', stats)
+        return stats
+
+    # At most two batches per worker are queued, so a large backlog of
+    # orphans never sits in memory at once
+    workers = max(1, workers)
+    parents = set()
+
+    def finish(futures):
+        for future in futures:
+            deleted, touched = future.result()
+            stats['deleted'] += deleted
+            parents.update(touched)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for batch in _batches(candidates(), batch_size):
+            pending.add(pool.submit(delete_files, batch))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                finish(done)
+        finish(pending)
+
+    # Attached sessions have no file left, and the files of stale ones were just deleted
+    stats['sessions'] = stale_sessions.delete()[0]
+    stats['directories'] = remove_empty_dirs(
+        parents, [os.path.join(root, top) for top in MEDIA_DIRS] + [upload_temp_dir()]
+    )
+    logger.info('Media GC deleted %(deleted)d file(s) and %(sessions)d stale upload session(s)', stats)
+    return stats
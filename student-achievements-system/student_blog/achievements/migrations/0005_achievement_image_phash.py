@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0004_studentprofile_is_student'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievement',
+            name='image_phash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Perceptual hash of the uploaded image', max_length=16),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0005_achievement_image_phash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievement',
+            name='image_fetch_error',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='achievement',
+            name='image_fetch_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('fetched', 'Fetched'), ('failed', 'Failed')], default='', editable=False, help_text='Download state of the external image_url', max_length=10),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+COMPETITION_LABELS = {
+    'college': 'College Level',
+    'university': 'University Level',
+    'state': 'State Level',
+    'national': 'National Level',
+    'international': 'International Level',
+}
+
+
+def build_cards(apps, schema_editor):
+    from django.core.files.storage import default_storage
+
+    Achievement = apps.get_model('achievements', 'Achievement')
+    AchievementCard = apps.get_model('achievements', 'AchievementCard')
+    StudentProfile = apps.get_model('achievements', 'StudentProfile')
+
+    profiles = {p.user_id: p for p in StudentProfile.objects.all()}
+    cards = []
+    for achievement in Achievement.objects.filter(is_approved=True).select_related('student'):
+        student = achievement.student
+        profile = profiles.get(student.id)
+        if achievement.image:
+            image_url = default_storage.url(achievement.image.name)
+        elif achievement.image_url and achievement.image_fetch_status != 'failed':
+            image_url = achievement.image_url
+        else:
+            image_url = ''
+        full_name = f'{student.first_name} {student.last_name}'.strip()
+        cards.append(AchievementCard(
+            achievement_id=achievement.id,
+            student_id=student.id,
+            name=achievement.name,
+            event=achievement.event,
+            prize=achievement.prize,
+            competition=achievement.competition,
+            competition_label=COMPETITION_LABELS.get(achievement.competition, achievement.competition),
+            description=achievement.description or '',
+            image_url=image_url,
+            student_name=full_name or student.username,
+            student_initials=f'{student.first_name[:1]}{student.last_name[:1]}'.upper(),
+            roll_number=profile.roll_number if profile else '',
+            department=profile.department if profile else '',
+            date_achieved=achievement.date_achieved,
+            created_at=achievement.created_at,
+        ))
+    AchievementCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('achievements', '0007_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AchievementCard',
+            fields=[
+                ('achievement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='achievements.achievement')),
+                ('name', models.CharField(max_length=200)),
+                ('event', models.CharField(max_length=200)),
+                ('prize', models.CharField(max_length=100)),
+                ('competition', models.CharField(max_length=50)),
+                ('competition_label', models.CharField(max_length=50)),
+                ('description', models.TextField(blank=True, default='')),
+                ('image_url', models.CharField(blank=True, default='', max_length=500)),
+                ('student_name', models.CharField(max_length=300)),
+                ('student_initials', models.CharField(blank=True, default='', max_length=4)),
+                ('roll_number', models.CharField(blank=True, default='', max_length=20)),
+                ('department', models.CharField(blank=True, default='', max_length=100)),
+                ('date_achieved', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievement_cards', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Achievement Card',
+                'verbose_name_plural': 'Achievement Cards',
+                'ordering': ['-created_at', '-achievement'],
+                'indexes': [models.Index(fields=['-created_at', '-achievement'], name='achievement_created_da04d1_idx'), models.Index(fields=['competition', '-created_at'], name='achievement_competi_c0b280_idx')],
+            },
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
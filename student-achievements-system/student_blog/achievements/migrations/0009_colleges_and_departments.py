@@ -0,0 +1,106 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+DEFAULT_COLLEGE = 'Mailam Engineering College'
+DEFAULT_DEPARTMENT = 'Computer Science & Engineering'
+
+
+def backfill_tenants(apps, schema_editor):
+    """
+    Move every existing row into a single default college, turning the
+    distinct free-text department values into Department rows.
+    """
+    College = apps.get_model('achievements', 'College')
+    Department = apps.get_model('achievements', 'Department')
+    StudentProfile = apps.get_model('achievements', 'StudentProfile')
+    Achievement = apps.get_model('achievements', 'Achievement')
+    AchievementCard = apps.get_model('achievements', 'AchievementCard')
+
+    college = College.objects.create(name=DEFAULT_COLLEGE, is_default=True)
+    departments = {}
+
+    def department_for(name):
+        name = ' '.join((name or '').split()) or DEFAULT_DEPARTMENT
+        key = name.lower()
+        if key not in departments:
+            departments[key] = Department.objects.create(
+                college=college, name=name, is_default=(key == DEFAULT_DEPARTMENT.lower())
+            )
+        return departments[key]
+
+    department_for(DEFAULT_DEPARTMENT)
+    for profile in StudentProfile.objects.all():
+        profile.department_ref = department_for(profile.department)
+        profile.save(update_fields=['department_ref'])
+
+    Achievement.objects.update(college=college)
+    AchievementCard.objects.update(college=college)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0008_achievementcard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='College',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('domain', models.CharField(blank=True, help_text="Host name this college's portal is served on", max_length=255, null=True, unique=True)),
+                ('portal_name', models.CharField(default='CSE Achievers Portal', max_length=100)),
+                ('tagline', models.CharField(blank=True, default='', max_length=200)),
+                ('is_default', models.BooleanField(default=False, help_text='Used for hosts that match no college')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'College',
+                'verbose_name_plural': 'Colleges',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Department',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('is_default', models.BooleanField(default=False, help_text='Pre-selected department for new students')),
+            ],
+            options={
+                'verbose_name': 'Department',
+                'verbose_name_plural': 'Departments',
+                'ordering': ['college', 'name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='college',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departments', to='achievements.college'),
+        ),
+        migrations.AddConstraint(
+            model_name='department',
+            constraint=models.UniqueConstraint(fields=('college', 'name'), name='unique_department_per_college'),
+        ),
+        migrations.AddField(
+            model_name='achievement',
+            name='college',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='achievements', to='achievements.college'),
+        ),
+        migrations.AddField(
+            model_name='achievementcard',
+            name='college',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='achievements.college'),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='department_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='students', to='achievements.department'),
+        ),
+        migrations.RunPython(backfill_tenants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0009_colleges_and_departments'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='studentprofile',
+            name='department',
+        ),
+        migrations.RenameField(
+            model_name='studentprofile',
+            old_name='department_ref',
+            new_name='department',
+        ),
+        migrations.AddIndex(
+            model_name='achievement',
+            index=models.Index(fields=['college', 'is_approved', 'created_at'], name='achievement_college_b0d4d5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='achievementcard',
+            index=models.Index(fields=['college', '-created_at', '-achievement'], name='achievement_college_312faf_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+def backfill_year(apps, schema_editor):
+    AchievementCard = apps.get_model('achievements', 'AchievementCard')
+    StudentProfile = apps.get_model('achievements', 'StudentProfile')
+    AchievementCard.objects.update(year=models.Subquery(
+        StudentProfile.objects.filter(user_id=models.OuterRef('student_id')).values('year')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0010_studentprofile_department_fk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievementcard',
+            name='year',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_year, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='achievementcard',
+            index=models.Index(fields=['college', 'competition', '-created_at'], name='achievement_college_4ce180_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='achievementcard',
+            index=models.Index(fields=['college', 'department', '-created_at'], name='achievement_college_23365f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='achievementcard',
+            index=models.Index(fields=['college', 'year', '-created_at'], name='achievement_college_dffe8e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='achievementcard',
+            index=models.Index(fields=['college', 'date_achieved'], name='achievement_college_a578dc_idx'),
+        ),
+    ]
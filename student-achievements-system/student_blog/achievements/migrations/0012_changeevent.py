@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0011_achievementcard_facets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(choices=[('achievement', 'Achievement'), ('profile', 'Student Profile')], max_length=20)),
+                ('entity_id', models.PositiveBigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('approved', 'Approved'), ('disapproved', 'Disapproved'), ('deleted', 'Deleted')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('college', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='achievements.college')),
+            ],
+            options={
+                'verbose_name': 'Change Event',
+                'verbose_name_plural': 'Change Events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['entity', 'entity_id', 'id'], name='achievement_entity_ace015_idx'), models.Index(fields=['college', 'id'], name='achievement_college_be08d4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0012_changeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AchievementTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('achievement_id', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Achievement Tombstone',
+                'verbose_name_plural': 'Achievement Tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='achievement',
+            index=models.Index(fields=['updated_at', 'id'], name='achievement_updated_523ef1_idx'),
+        ),
+        migrations.AddField(
+            model_name='achievementtombstone',
+            name='college',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='achievements.college'),
+        ),
+        migrations.AddIndex(
+            model_name='achievementtombstone',
+            index=models.Index(fields=['deleted_at', 'achievement_id'], name='achievement_deleted_105fe1_idx'),
+        ),
+    ]
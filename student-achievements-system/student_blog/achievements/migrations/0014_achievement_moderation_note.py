@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0013_delta_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievement',
+            name='moderation_note',
+            field=models.TextField(blank=True, default='', help_text='Note from the moderator'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:48
+
+from django.db import migrations, models
+
+
+def backfill_image(apps, schema_editor):
+    AchievementCard = apps.get_model('achievements', 'AchievementCard')
+    Achievement = apps.get_model('achievements', 'Achievement')
+    AchievementCard.objects.update(image=models.functions.Coalesce(models.Subquery(
+        Achievement.objects.filter(pk=models.OuterRef('achievement_id')).values('image')[:1]
+    ), models.Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0016_analyzer_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievementcard',
+            name='image',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(backfill_image, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def queue_gc_media_as_dry_run(apps, schema_editor):
+    # A 'gc-media' run queued before this migration has no arguments and would delete files
+    Job = apps.get_model('achievements', 'Job')
+    Job.objects.filter(periodic='gc-media', status='queued').update(kwargs={'dry_run': True})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achievements', '0018_achievement_image_phash_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_gc_media_as_dry_run, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,20 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 import os
+import uuid
+
+from .autocomplete import index as autocomplete_index
+from .duplicates import index as duplicate_index
+from .image_hash import index as image_hash_index, compute_achievement_hash
+from .tasks import run_in_background
+from .uploads import upload_temp_dir
+from .signals import achievements_bulk_updated
+from . import changes, featured, projections, sqlite, tenancy, user_summary
 
 def achievement_image_path(instance, filename):
     """
@@ -16,10 +27,44 @@ def achievement_image_path(instance, filename):
     filename = f'achievement_{instance.id}_{int(timezone.now().timestamp())}.{ext}'
     return os.path.join('achievements', f'user_{instance.student.id}', filename)
 
+class College(models.Model):
+    """A tenant: one college hosted on this deployment, selected by host name"""
+    name = models.CharField(max_length=200)
+    domain = models.CharField(max_length=255, unique=True, blank=True, null=True,
+                              help_text="Host name this college's portal is served on")
+    portal_name = models.CharField(max_length=100, default='CSE Achievers Portal')
+    tagline = models.CharField(max_length=200, blank=True, default='')
+    is_default = models.BooleanField(default=False, help_text="Used for hosts that match no college")
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "College"
+        verbose_name_plural = "Colleges"
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+class Department(models.Model):
+    college = models.ForeignKey(College, on_delete=models.CASCADE, related_name='departments')
+    name = models.CharField(max_length=100)
+    is_default = models.BooleanField(default=False, help_text="Pre-selected department for new students")
+    
+    class Meta:
+        verbose_name = "Department"
+        verbose_name_plural = "Departments"
+        ordering = ['college', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['college', 'name'], name='unique_department_per_college'),
+        ]
+    
+    def __str__(self):
+        return self.name
+
 class StudentProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='studentprofile')
     roll_number = models.CharField(max_length=20, unique=True)
-    department = models.CharField(max_length=100, default="Computer Science & Engineering")
+    department = models.ForeignKey(Department, on_delete=models.PROTECT, related_name='students', null=True, blank=True)
     year = models.IntegerField(default=2025)
     phone = models.CharField(max_length=15, blank=True, null=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
@@ -32,6 +77,9 @@ class StudentProfile(models.Model):
         verbose_name = "Student Profile"
         verbose_name_plural = "Student Profiles"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['year']),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.roll_number}"
@@ -43,6 +91,39 @@ class StudentProfile(models.Model):
     @property
     def email(self):
         return self.user.email
+    
+    def save(self, *args, **kwargs):
+        # The change event recorded in post_save commits or rolls back with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class AchievementQuerySet(models.QuerySet):
+    def update_and_notify(self, **fields):
+        """
+        queryset.update() that keeps the derived data in sync: updated_at is
+        bumped, a change event is recorded per row and achievements_bulk_updated
+        is sent with the affected ids, all in one transaction.
+        """
+        rows = list(self.values_list('id', 'college_id'))
+        if not rows:
+            return 0
+        ids = [achievement_id for achievement_id, _ in rows]
+        fields.setdefault('updated_at', timezone.now())
+        if 'is_approved' in fields:
+            action = 'approved' if fields['is_approved'] else 'disapproved'
+        else:
+            action = 'updated'
+        with transaction.atomic():
+            updated = Achievement.objects.filter(id__in=ids).update(**fields)
+            changes.record_many('achievement', rows, action)
+            achievements_bulk_updated.send(
+                sender=Achievement, achievement_ids=ids, college_ids=list({c for _, c in rows}),
+                fields=list(fields),
+            )
+        return updated
+    
+    def set_approval(self, approved):
+        return self.update_and_notify(is_approved=approved)
 
 class Achievement(models.Model):
     COMPETITION_LEVELS = [
@@ -53,7 +134,14 @@ class Achievement(models.Model):
         ('international', 'International Level'),
     ]
     
+    IMAGE_FETCH_STATUSES = [
+        ('pending', 'Pending'),
+        ('fetched', 'Fetched'),
+        ('failed', 'Failed'),
+    ]
+    
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='achievements')
+    college = models.ForeignKey(College, on_delete=models.CASCADE, related_name='achievements', null=True, blank=True)
     name = models.CharField(max_length=200)
     event = models.CharField(max_length=200)
     prize = models.CharField(max_length=100)
@@ -65,11 +153,22 @@ class Achievement(models.Model):
         help_text="Upload achievement image or certificate"
     )
     image_url = models.URLField(blank=True, null=True, help_text="Or provide image URL")    
+    image_phash = models.CharField(max_length=16, blank=True, default='', editable=False,
+                                   help_text="Perceptual hash of the uploaded image")
+    # Sync marker of the image-hash index. Writing a hash leaves updated_at
+    # alone, so API and delta-sync clients do not re-download the row for it.
+    image_phash_updated_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+    image_fetch_status = models.CharField(max_length=10, choices=IMAGE_FETCH_STATUSES, blank=True, default='',
+                                          editable=False, help_text="Download state of the external image_url")
+    image_fetch_error = models.CharField(max_length=255, blank=True, default='', editable=False)
     description = models.TextField(blank=True, null=True)
     date_achieved = models.DateField(default=timezone.now)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     is_approved = models.BooleanField(default=False)
+    moderation_note = models.TextField(blank=True, default='', help_text="Note from the moderator")
+    
+    objects = AchievementQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Achievement"
@@ -78,6 +177,11 @@ class Achievement(models.Model):
         indexes = [
             models.Index(fields=['is_approved', 'created_at']),
             models.Index(fields=['student', 'created_at']),
+            models.Index(fields=['college', 'is_approved', 'created_at']),
+            # Admin changelist default ordering
+            models.Index(fields=['-created_at', '-id']),
+            # Delta sync cursor order
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -98,6 +202,11 @@ class Achievement(models.Model):
     def competition_level_display(self):
         return dict(self.COMPETITION_LEVELS).get(self.competition, self.competition)
     
+    def save(self, *args, **kwargs):
+        # The change event recorded in post_save commits or rolls back with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     def approve(self):
         self.is_approved = True
         self.save()
@@ -115,7 +224,7 @@ class Achievement(models.Model):
                      return self.image.url
                 else:
                     return None
-            elif self.image_url:
+            elif self.image_url and self.image_fetch_status != 'failed':
                 return self.image_url
             return None
         except Exception as e:
@@ -129,15 +238,212 @@ class ContactMessage(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
     is_read = models.BooleanField(default=False)
+    acknowledged_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                           help_text="When the acknowledgement email was sent")
     
     class Meta:
         verbose_name = "Contact Message"
         verbose_name_plural = "Contact Messages"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.subject}"
 
+class UploadSession(models.Model):
+    """A resumable, chunked image upload streamed to a temporary file"""
+    KINDS = [
+        ('achievement', 'Achievement Image'),
+        ('avatar', 'Profile Avatar'),
+    ]
+    STATUSES = [
+        ('open', 'Receiving'),
+        ('complete', 'Complete'),
+        ('attached', 'Attached'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default='open')
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.total_size} bytes)"
+    
+    @property
+    def temp_path(self):
+        return os.path.join(upload_temp_dir(), f'{self.id}.part')
+    
+    def discard(self):
+        """Remove the partial file and the session"""
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+        self.delete()
+
+class AchievementTombstone(models.Model):
+    """
+    Marker left behind by a deleted achievement so delta sync clients
+    (/api/achievements/?since=) learn to drop their copy. See achievements.sync.
+    """
+    achievement_id = models.PositiveBigIntegerField()
+    college = models.ForeignKey(College, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Achievement Tombstone"
+        verbose_name_plural = "Achievement Tombstones"
+        indexes = [
+            models.Index(fields=['deleted_at', 'achievement_id']),
+        ]
+    
+    def __str__(self):
+        return f"Achievement {self.achievement_id} deleted"
+
+class ChangeEvent(models.Model):
+    """
+    Append-only change feed of achievements and student profiles, served by
+    /api/changes/. See achievements.changes.
+    """
+    ENTITIES = [
+        ('achievement', 'Achievement'),
+        ('profile', 'Student Profile'),
+    ]
+    
+    ACTIONS = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('approved', 'Approved'),
+        ('disapproved', 'Disapproved'),
+        ('deleted', 'Deleted'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=20, choices=ENTITIES)
+    entity_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=20, choices=ACTIONS)
+    college = models.ForeignKey(College, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Change Event"
+        verbose_name_plural = "Change Events"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['entity', 'entity_id', 'id']),
+            models.Index(fields=['college', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.entity} {self.entity_id} {self.action}"
+
+class Job(models.Model):
+    """
+    A unit of background work run by manage.py run_worker. See achievements.jobs.
+    """
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    task = models.CharField(max_length=200, help_text="Dotted path of the function to call")
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    periodic = models.CharField(max_length=100, blank=True, default='', help_text="JOB_SCHEDULE entry this run belongs to")
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True, help_text="Seconds spent in the last attempt")
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'id']),
+            models.Index(fields=['status', 'finished_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['periodic'],
+                condition=models.Q(status__in=['queued', 'running']) & ~models.Q(periodic=''),
+                name='one_active_run_per_periodic_job',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.task} ({self.status})"
+
+class AchievementCard(models.Model):
+    """
+    Read model for public listings: one row per approved achievement holding
+    exactly what a card renders, so listings read a single narrow table with
+    no joins. Maintained by achievements.projections.
+    """
+    achievement = models.OneToOneField(Achievement, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='achievement_cards')
+    college = models.ForeignKey(College, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    name = models.CharField(max_length=200)
+    event = models.CharField(max_length=200)
+    prize = models.CharField(max_length=100)
+    competition = models.CharField(max_length=50)
+    competition_label = models.CharField(max_length=50)
+    description = models.TextField(blank=True, default='')
+    image = models.CharField(max_length=100, blank=True, default='')
+    image_url = models.CharField(max_length=500, blank=True, default='')
+    student_name = models.CharField(max_length=300)
+    student_initials = models.CharField(max_length=4, blank=True, default='')
+    roll_number = models.CharField(max_length=20, blank=True, default='')
+    department = models.CharField(max_length=100, blank=True, default='')
+    year = models.IntegerField(null=True, blank=True)
+    date_achieved = models.DateField()
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "Achievement Card"
+        verbose_name_plural = "Achievement Cards"
+        ordering = ['-created_at', '-achievement']
+        indexes = [
+            models.Index(fields=['-created_at', '-achievement']),
+            models.Index(fields=['competition', '-created_at']),
+            models.Index(fields=['college', '-created_at', '-achievement']),
+            # Faceted filters on the achievements page
+            models.Index(fields=['college', 'competition', '-created_at']),
+            models.Index(fields=['college', 'department', '-created_at']),
+            models.Index(fields=['college', 'year', '-created_at']),
+            models.Index(fields=['college', 'date_achieved']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} - {self.student_name}"
+    
+    @property
+    def id(self):
+        return self.achievement_id
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
@@ -146,13 +452,161 @@ def create_user_profile(sender, instance, created, **kwargs):
             StudentProfile.objects.create(
                 user=instance,
                 roll_number=f"STU{instance.id:04d}",
-                department="Computer Science & Engineering",
+                department=tenancy.default_department(),
                 year=2025
             )
         except Exception as e:
             print(f"Error creating profile for user {instance.username}: {e}")
 
+def _is_login_update(kwargs):
+    update_fields = kwargs.get('update_fields')
+    return bool(update_fields) and set(update_fields) <= {'last_login'}
+
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
+    if _is_login_update(kwargs):
+        return
     if hasattr(instance, 'studentprofile'):
-        instance.studentprofile.save()
\ No newline at end of file
+        instance.studentprofile.save()
+
+@receiver(post_save, sender=Achievement)
+def update_search_indexes(sender, instance, **kwargs):
+    # Only approved achievements are suggested, so pending submissions change nothing
+    if instance.is_approved or getattr(instance, '_was_approved', None):
+        autocomplete_index.changed([instance.college_id])
+    duplicate_index.changed([instance.college_id])
+
+@receiver(post_delete, sender=Achievement)
+def remove_from_search_indexes(sender, instance, **kwargs):
+    if instance.is_approved:
+        autocomplete_index.changed([instance.college_id])
+    duplicate_index.changed([instance.college_id])
+
+@receiver(pre_save, sender=Achievement)
+def reset_image_state_on_change(sender, instance, **kwargs):
+    instance._was_approved = None
+    instance._image_replaced = False
+    if not instance.pk:
+        return
+    previous = Achievement.objects.filter(pk=instance.pk).values_list('image', 'image_url', 'is_approved').first()
+    if not previous:
+        return
+    instance._was_approved = previous[2]
+    if (previous[0] or '') != (instance.image.name or ''):
+        instance.image_phash = ''
+        instance.image_phash_updated_at = timezone.now()
+        instance._image_replaced = True
+    if (previous[1] or '') != (instance.image_url or ''):
+        instance.image_fetch_status = ''
+        instance.image_fetch_error = ''
+
+@receiver(post_save, sender=Achievement)
+def schedule_image_hash(sender, instance, **kwargs):
+    if getattr(instance, '_image_replaced', False):
+        # Any hash indexed for the old image is stale
+        image_hash_index.changed([instance.college_id])
+    if instance.image and not instance.image_phash:
+        run_in_background(compute_achievement_hash, instance.pk)
+
+@receiver(post_save, sender=Achievement)
+def schedule_image_fetch(sender, instance, **kwargs):
+    if instance.image_url and not instance.image and not instance.image_fetch_status:
+        Achievement.objects.filter(pk=instance.pk).update(image_fetch_status='pending')
+        instance.image_fetch_status = 'pending'
+        # Queued by name so web workers never import urllib.request/ssl for the downloader
+        run_in_background('achievements.image_fetcher.fetch_achievement_image', instance.pk)
+
+@receiver(post_delete, sender=Achievement)
+def remove_from_image_hash_index(sender, instance, **kwargs):
+    if instance.image_phash:
+        image_hash_index.changed([instance.college_id])
+
+@receiver(achievements_bulk_updated, sender=Achievement)
+def refresh_after_bulk_update(sender, achievement_ids, college_ids, **kwargs):
+    autocomplete_index.changed(college_ids)
+    projections.refresh_cards(achievement_ids)
+
+@receiver(achievements_bulk_updated, sender=Achievement)
+def refresh_user_summaries_after_bulk_update(sender, achievement_ids, fields, **kwargs):
+    if 'is_approved' in fields:
+        student_ids = set(Achievement.objects.filter(id__in=achievement_ids).values_list('student_id', flat=True))
+        transaction.on_commit(lambda: user_summary.bump_versions(student_ids))
+
+@receiver(post_save, sender=Achievement)
+def refresh_featured(sender, instance, **kwargs):
+    # Only approved achievements are featured, so pending submissions change nothing
+    if instance.is_approved or getattr(instance, '_was_approved', None):
+        featured.changed(instance.college_id)
+
+@receiver(post_delete, sender=Achievement)
+def refresh_featured_after_delete(sender, instance, **kwargs):
+    if instance.is_approved:
+        featured.changed(instance.college_id)
+
+@receiver(achievements_bulk_updated, sender=Achievement)
+def refresh_featured_after_bulk_update(sender, achievement_ids, **kwargs):
+    for college_id in set(Achievement.objects.filter(id__in=achievement_ids).values_list('college_id', flat=True)):
+        featured.changed(college_id)
+
+@receiver(user_logged_in)
+def load_user_summary(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        user_summary.UserSummary(request, user).counters
+
+@receiver([post_save, post_delete], sender=Achievement)
+def refresh_user_summary(sender, instance, **kwargs):
+    # After commit, so a request in between cannot store the old counts under the new version
+    transaction.on_commit(lambda: user_summary.bump_version(instance.student_id))
+
+@receiver(post_save, sender=Achievement)
+def update_achievement_card(sender, instance, **kwargs):
+    projections.refresh_cards([instance.pk])
+
+@receiver(post_save, sender=User)
+def update_cards_for_user(sender, instance, created, **kwargs):
+    # Students with a profile are refreshed through the StudentProfile save below
+    if not created and not _is_login_update(kwargs) and not hasattr(instance, 'studentprofile'):
+        projections.refresh_cards_for_student(instance.pk)
+
+@receiver(post_save, sender=StudentProfile)
+def update_cards_for_profile(sender, instance, created, **kwargs):
+    if not created:
+        projections.refresh_cards_for_student(instance.user_id)
+        # Name and department are part of what delta sync clients hold
+        Achievement.objects.filter(student_id=instance.user_id).update(updated_at=timezone.now())
+
+@receiver(pre_save, sender=Achievement)
+def set_achievement_college(sender, instance, **kwargs):
+    if instance.college_id is None:
+        department = Department.objects.filter(students__user_id=instance.student_id).first()
+        college = department.college if department else tenancy.default_college()
+        instance.college_id = college.id if college else None
+
+@receiver([post_save, post_delete], sender=College)
+@receiver([post_save, post_delete], sender=Department)
+def reload_tenants(sender, **kwargs):
+    tenancy.invalidate()
+
+@receiver(post_save, sender=Achievement)
+def record_achievement_change(sender, instance, created, **kwargs):
+    action = changes.achievement_action(created, getattr(instance, '_was_approved', None), instance.is_approved)
+    changes.record('achievement', instance.pk, action, instance.college_id)
+
+@receiver(post_delete, sender=Achievement)
+def record_achievement_delete(sender, instance, **kwargs):
+    changes.record('achievement', instance.pk, 'deleted', instance.college_id)
+    AchievementTombstone.objects.create(achievement_id=instance.pk, college_id=instance.college_id)
+
+@receiver(post_save, sender=StudentProfile)
+def record_profile_change(sender, instance, created, **kwargs):
+    college_id = instance.department.college_id if instance.department_id else None
+    changes.record('profile', instance.pk, 'created' if created else 'updated', college_id)
+
+@receiver(post_delete, sender=StudentProfile)
+def record_profile_delete(sender, instance, **kwargs):
+    college_id = instance.department.college_id if instance.department_id else None
+    changes.record('profile', instance.pk, 'deleted', college_id)
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    sqlite.apply_pragmas(connection)
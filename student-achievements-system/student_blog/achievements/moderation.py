@@ -0,0 +1,93 @@
+"""
+Batch moderation for staff: approve or reject many achievements at once.
+
+A batch is a list of decision groups:
+
+    {"decisions": [
+        {"decision": "approve", "ids": [1, 2, 3]},
+        {"decision": "reject", "ids": [4], "note": "Certificate is unreadable"}
+    ]}
+
+The whole batch runs in one transaction. The rows are locked first, then each
+group is applied with a single UPDATE through update_and_notify(). That
+method also sends achievements_bulk_updated, so cards, facet counts,
+autocomplete and the change feed are refreshed exactly as for a single
+approval. Every requested id gets its own result.
+"""
+from django.conf import settings
+from django.db import transaction
+
+DECISIONS = {'approve': True, 'reject': False}
+
+
+class ModerationError(ValueError):
+    """The batch is malformed; nothing was applied"""
+
+
+def max_batch_size():
+    return getattr(settings, 'MODERATION_BATCH_LIMIT', 1000)
+
+
+def parse_batch(data):
+    """Validate a decoded request body; returns {(decision, note): [ids]}"""
+    groups = data.get('decisions') if isinstance(data, dict) else None
+    if not isinstance(groups, list) or not groups:
+        raise ModerationError('Send a non-empty "decisions" list.')
+
+    batch = {}
+    count = 0
+    for group in groups:
+        if not isinstance(group, dict) or group.get('decision') not in DECISIONS:
+            raise ModerationError('Each decision must be "approve" or "reject".')
+        ids = group.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ModerationError('Each decision needs a list of integer "ids".')
+        note = group.get('note')
+        if note is not None and not isinstance(note, str):
+            raise ModerationError('"note" must be a string.')
+        batch.setdefault((group['decision'], note), []).extend(ids)
+        count += len(ids)
+
+    if count > max_batch_size():
+        raise ModerationError(f'At most {max_batch_size()} achievements can be moderated per request.')
+    return batch
+
+
+def apply_batch(batch):
+    """
+    Apply parsed decision groups. Returns a list of {'id', 'status'} where
+    status is approved, rejected, not_found or conflict (the id appeared under
+    more than one decision and was left untouched).
+    """
+    from .models import Achievement
+
+    seen = {}
+    for key, ids in batch.items():
+        for achievement_id in ids:
+            seen.setdefault(achievement_id, set()).add(key)
+    conflicts = {achievement_id for achievement_id, keys in seen.items() if len(keys) > 1}
+
+    statuses = {}
+    with transaction.atomic():
+        existing = set(
+            Achievement.objects.select_for_update().filter(id__in=list(seen)).values_list('id', flat=True)
+        )
+        for (decision, note), ids in batch.items():
+            ids = [i for i in dict.fromkeys(ids) if i in existing and i not in conflicts]
+            if not ids:
+                continue
+            fields = {'is_approved': DECISIONS[decision]}
+            if note is not None:
+                fields['moderation_note'] = note
+            Achievement.objects.filter(id__in=ids).update_and_notify(**fields)
+            status = 'approved' if DECISIONS[decision] else 'rejected'
+            statuses.update((i, status) for i in ids)
+
+    results = []
+    for achievement_id in seen:
+        if achievement_id in conflicts:
+            status = 'conflict'
+        else:
+            status = statuses.get(achievement_id, 'not_found')
+        results.append({'id': achievement_id, 'status': status})
+    return results
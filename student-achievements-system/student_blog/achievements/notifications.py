@@ -0,0 +1,24 @@
+"""
+Emails sent to visitors and students. These run as background jobs so a slow
+or unreachable mail server never holds up a request and failed sends are
+retried.
+"""
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+
+def send_contact_acknowledgement(message_id):
+    """Tell the sender of a ContactMessage that it arrived; sent at most once"""
+    from .models import ContactMessage
+
+    message = ContactMessage.objects.filter(pk=message_id, acknowledged_at__isnull=True).first()
+    if message is None:
+        return
+    send_mail(
+        subject=f'We received your message: {message.subject}',
+        message=render_to_string('achievements/emails/contact_acknowledgement.txt', {'message': message}),
+        from_email=None,
+        recipient_list=[message.email],
+    )
+    ContactMessage.objects.filter(pk=message_id).update(acknowledged_at=timezone.now())
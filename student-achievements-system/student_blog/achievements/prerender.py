@@ -0,0 +1,336 @@
+"""
+Static pre-rendering of the public site (manage.py prerender_site).
+
+The public pages only change when an achievement or a student profile
+changes, so they can be written out as plain HTML and served by a web server
+with no Python in the request path:
+
+    <PRERENDER_ROOT>/<host>/index.html                          home
+    <PRERENDER_ROOT>/<host>/achievements/index.html             listing, page 1
+    <PRERENDER_ROOT>/<host>/achievements/page/<n>/index.html    listing, page n
+    <PRERENDER_ROOT>/<host>/achievements/<id>/index.html        achievement detail
+    <PRERENDER_ROOT>/<host>/students/<id>/index.html            student portfolio
+    <PRERENDER_ROOT>/<host>/sitemap.xml
+
+<host> is the college's domain, or "default" for a default college without
+one. Point the web server's document root for the host there and fall back
+to Django for anything else. The static pages are the unfiltered ones, so a
+request with a query string (search, facet filters, ?page=) must always go
+to Django. With nginx:
+
+    location @django { proxy_pass http://django; }
+    location / {
+        error_page 418 = @django;
+        if ($args) { return 418; }
+        try_files $uri $uri/index.html @django;
+    }
+
+The contact form, POSTs and everything behind login still go to Django.
+Pages are rendered by the same views, as an anonymous visitor, so they
+carry no CSRF token; the contact form fetches one from /api/csrf/ before it
+submits.
+
+A full render writes every page. After that, a run is incremental by default.
+It reads the change feed (achievements.changes) from the last event the
+previous run saw. Only the detail and portfolio pages of changed achievements
+and students are re-rendered, and the files of pages that no longer exist are
+removed. The home page, the listing pages and the sitemap are always
+re-rendered, because any approval shifts their counts, facet totals and
+positions. Files whose content is unchanged are not rewritten, so rsync and
+CDN caches only see real changes.
+
+Pages are rendered in batches by a pool of worker processes.
+"""
+import json
+import math
+import multiprocessing
+import os
+import re
+import shutil
+from xml.sax.saxutils import escape
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.db.models import Max
+from django.http import Http404, HttpRequest
+from django.urls import resolve, reverse
+
+from . import tenancy
+from .tenancy import scope
+
+STATE_FILE = '.prerender.json'
+SITEMAP_MAX_URLS = 50000
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+CSRF_INPUT_RE = re.compile(rb'<input type="hidden" name="csrfmiddlewaretoken" value="[^"]*">')
+
+
+def output_root():
+    return str(getattr(settings, 'PRERENDER_ROOT', os.path.join(settings.BASE_DIR, 'prerendered')))
+
+
+def sites():
+    """[(directory, host, base_url)] for every college the public site is served for"""
+    from .models import College
+
+    result = []
+    for domain in College.objects.exclude(domain__isnull=True).exclude(domain='').values_list('domain', flat=True):
+        domain = domain.lower()
+        result.append((domain, domain, f'https://{domain}'))
+    default = tenancy.default_college()
+    if default is None or not default.domain:
+        base_url = getattr(settings, 'PRERENDER_BASE_URL', 'http://localhost:8000')
+        result.append(('default', '', base_url.rstrip('/')))
+    return result
+
+
+def render_path(path, host):
+    """Render a public page as an anonymous visitor; returns the body, or None if the page does not exist"""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META.update(SERVER_NAME=host or 'localhost', SERVER_PORT='80', HTTP_HOST=host or 'localhost')
+    request.user = AnonymousUser()
+    request.college = tenancy.college_for_host(host)
+    match = resolve(path)
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    except Http404:
+        return None
+    if response.status_code != 200:
+        return None
+    # A static copy is shared by every visitor, so it cannot carry a CSRF token
+    return CSRF_INPUT_RE.sub(b'', response.content)
+
+
+def page_file(site_dir, path):
+    return os.path.join(site_dir, *path.strip('/').split('/'), 'index.html')
+
+
+def write_file(filename, content):
+    """Write `content` unless the file already holds exactly that; returns whether it was written"""
+    try:
+        with open(filename, 'rb') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    temporary = f'{filename}.tmp{os.getpid()}'
+    with open(temporary, 'wb') as f:
+        f.write(content)
+    os.replace(temporary, filename)
+    return True
+
+
+def remove_page(site_dir, path):
+    """Delete a page's directory, unless other pages live below it; returns whether anything was removed"""
+    directory = os.path.dirname(page_file(site_dir, path))
+    if not os.path.isdir(directory):
+        return False
+    if any(os.path.isdir(os.path.join(directory, name)) for name in os.listdir(directory)):
+        try:
+            os.remove(page_file(site_dir, path))
+        except FileNotFoundError:
+            return False
+        return True
+    shutil.rmtree(directory)
+    return True
+
+
+def render_batch(batch):
+    """Render and write one batch of pages; runs in a pool worker"""
+    site_dir, host, paths = batch
+    written = 0
+    missing = []
+    for path in paths:
+        content = render_path(path, host)
+        if content is None:
+            missing.append(path)
+        elif write_file(page_file(site_dir, path), content):
+            written += 1
+    return site_dir, len(paths), written, missing
+
+
+def _listing_paths(college):
+    from .models import AchievementCard
+
+    page_size = getattr(settings, 'ACHIEVEMENTS_PAGE_SIZE', 24)
+    pages = max(1, math.ceil(scope(AchievementCard.objects.all(), college).count() / page_size))
+    return [reverse('achievements')] + [reverse('achievements_page', args=[n]) for n in range(2, pages + 1)]
+
+
+def _stale_children(site_dir, prefix, keep):
+    """Paths of the rendered /<prefix>/<number>/ pages whose number is not in `keep`"""
+    directory = os.path.join(site_dir, *prefix.split('/'))
+    if not os.path.isdir(directory):
+        return []
+    return [
+        f'/{prefix}/{name}/' for name in sorted(os.listdir(directory))
+        if name.isdigit() and int(name) not in keep
+    ]
+
+
+def _sitemap(site_dir, base_url, college):
+    """Write sitemap.xml, split into numbered sitemaps plus an index past SITEMAP_MAX_URLS"""
+    from .models import AchievementCard
+
+    cards = scope(AchievementCard.objects.all(), college)
+    entries = [(path, None) for path in [reverse('home')] + _listing_paths(college)]
+    portfolios = {}
+    for achievement_id, student_id, updated_at in cards.order_by('achievement_id').values_list(
+        'achievement_id', 'student_id', 'achievement__updated_at'
+    ).iterator():
+        entries.append((reverse('achievement_detail', args=[achievement_id]), updated_at))
+        portfolios[student_id] = max(updated_at, portfolios.get(student_id, updated_at))
+    entries += [
+        (reverse('portfolio', args=[student_id]), updated_at) for student_id, updated_at in sorted(portfolios.items())
+    ]
+
+    def urlset(chunk):
+        lines = [XML_DECLARATION, f'<urlset xmlns="{SITEMAP_NS}">']
+        for path, lastmod in chunk:
+            lastmod = f'<lastmod>{lastmod.date().isoformat()}</lastmod>' if lastmod else ''
+            lines.append(f'  <url><loc>{escape(base_url + path)}</loc>{lastmod}</url>')
+        lines.append('</urlset>')
+        return '\n'.join(lines).encode() + b'\n'
+
+    if len(entries) <= SITEMAP_MAX_URLS:
+        return write_file(os.path.join(site_dir, 'sitemap.xml'), urlset(entries))
+    lines = [XML_DECLARATION, f'<sitemapindex xmlns="{SITEMAP_NS}">']
+    written = False
+    for number, start in enumerate(range(0, len(entries), SITEMAP_MAX_URLS), 1):
+        chunk = urlset(entries[start:start + SITEMAP_MAX_URLS])
+        written |= write_file(os.path.join(site_dir, f'sitemap-{number}.xml'), chunk)
+        lines.append(f'  <sitemap><loc>{escape(base_url)}/sitemap-{number}.xml</loc></sitemap>')
+    lines.append('</sitemapindex>')
+    return write_file(os.path.join(site_dir, 'sitemap.xml'), '\n'.join(lines).encode() + b'\n') or written
+
+
+def _changed_since(event_id, until):
+    """(achievement ids, student ids) touched by change events in (event_id, until]"""
+    from .models import ChangeEvent, StudentProfile
+
+    achievement_ids, profile_ids = set(), set()
+    events = ChangeEvent.objects.filter(id__gt=event_id, id__lte=until).values_list('entity', 'entity_id')
+    for entity, entity_id in events.iterator():
+        (achievement_ids if entity == 'achievement' else profile_ids).add(entity_id)
+    student_ids = set(StudentProfile.objects.filter(id__in=profile_ids).values_list('user_id', flat=True))
+    return achievement_ids, student_ids
+
+
+def _plan_site(site_dir, college, manifest, changes):
+    """
+    Work out one site's pages. Returns (paths to render, paths to remove, new
+    manifest). `manifest` maps rendered achievement ids to their student;
+    `changes` is None for a full render.
+    """
+    from .models import AchievementCard
+
+    cards = scope(AchievementCard.objects.all(), college)
+    listing = _listing_paths(college)
+    render = [reverse('home')] + listing
+    remove = _stale_children(site_dir, 'achievements/page', set(range(2, len(listing) + 1)))
+
+    if changes is None:
+        current = dict(cards.values_list('achievement_id', 'student_id'))
+        students = set(current.values())
+        render += [reverse('achievement_detail', args=[i]) for i in sorted(current)]
+        render += [reverse('portfolio', args=[i]) for i in sorted(students)]
+        remove += _stale_children(site_dir, 'achievements', current)
+        remove += _stale_children(site_dir, 'students', students)
+        return render, remove, current
+
+    achievement_ids, student_ids = changes
+    manifest = dict(manifest)
+    # Students losing an achievement are only known from the previous run
+    student_ids = set(student_ids) | {manifest[i] for i in achievement_ids if i in manifest}
+    current = dict(
+        cards.filter(achievement_id__in=achievement_ids).values_list('achievement_id', 'student_id')
+    )
+    current.update(cards.filter(student_id__in=student_ids).values_list('achievement_id', 'student_id'))
+    student_ids |= set(current.values())
+
+    for achievement_id in achievement_ids - set(current):
+        manifest.pop(achievement_id, None)
+        remove.append(reverse('achievement_detail', args=[achievement_id]))
+    manifest.update(current)
+    render += [reverse('achievement_detail', args=[i]) for i in sorted(current)]
+    # Portfolios of students left without public achievements 404 and are removed
+    render += [reverse('portfolio', args=[i]) for i in sorted(student_ids)]
+    return render, remove, manifest
+
+
+def _load_state(root):
+    try:
+        with open(os.path.join(root, STATE_FILE)) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    for site in state.get('sites', {}).values():
+        site['achievements'] = {int(k): v for k, v in site.get('achievements', {}).items()}
+    return state
+
+
+def _save_state(root, state):
+    os.makedirs(root, exist_ok=True)
+    write_file(os.path.join(root, STATE_FILE), json.dumps(state, sort_keys=True).encode())
+
+
+def prerender(full=False, processes=1, batch_size=100, root=None, log=None):
+    """
+    Render the public site to static files. Returns a dict of counts:
+    rendered, written, removed, plus the mode and the last change event seen.
+    """
+    from .models import ChangeEvent
+
+    root = root or output_root()
+    log = log or (lambda message: None)
+    state = None if full else _load_state(root)
+    # Events after this id are left for the next run, even if this run already sees their effect
+    last_event_id = ChangeEvent.objects.aggregate(last=Max('id'))['last'] or 0
+    changes = None
+    if state is not None:
+        changes = _changed_since(state['last_event_id'], last_event_id)
+        log(f'{len(changes[0])} achievement(s) and {len(changes[1])} profile(s) changed '
+            f'since event {state["last_event_id"]}')
+
+    batches, removals, new_sites = [], [], {}
+    for directory, host, base_url in sites():
+        site_dir = os.path.join(root, directory)
+        college = tenancy.college_for_host(host)
+        previous = (state or {}).get('sites', {}).get(directory)
+        site_changes = changes if previous is not None else None
+        manifest = (previous or {}).get('achievements', {})
+        render, remove, manifest = _plan_site(site_dir, college, manifest, site_changes)
+        log(f'{directory}: {"incremental" if site_changes is not None else "full"} render of {len(render)} page(s)')
+        new_sites[directory] = {'achievements': manifest, 'base_url': base_url, 'host': host}
+        batches += [(site_dir, host, render[i:i + batch_size]) for i in range(0, len(render), batch_size)]
+        removals += [(site_dir, path) for path in remove]
+
+    if processes > 1 and len(batches) > 1:
+        # Children must not share the parent's database connection
+        connections.close_all()
+        with multiprocessing.Pool(min(processes, len(batches)), initializer=django.setup) as pool:
+            results = list(pool.imap_unordered(render_batch, batches))
+    else:
+        results = [render_batch(batch) for batch in batches]
+
+    rendered = written = 0
+    for site_dir, count, changed, missing in results:
+        rendered += count
+        written += changed
+        # Pages that 404 now (e.g. a portfolio whose last achievement was rejected)
+        removals += [(site_dir, path) for path in missing]
+    removed = sum(remove_page(site_dir, path) for site_dir, path in removals)
+    for directory, site in new_sites.items():
+        written += _sitemap(os.path.join(root, directory), site['base_url'], tenancy.college_for_host(site['host']))
+    _save_state(root, {'last_event_id': last_event_id, 'sites': new_sites})
+    return {
+        'mode': 'incremental' if changes is not None else 'full',
+        'rendered': rendered,
+        'written': written,
+        'removed': removed,
+        'last_event_id': last_event_id,
+    }
@@ -0,0 +1,103 @@
+"""
+Maintenance of the AchievementCard listing projection.
+
+Public pages never join Achievement -> User -> StudentProfile or filter on
+is_approved at read time. Instead, every change to one of those rows
+re-projects the affected achievements: approved ones get an up-to-date card
+and everything else loses its card. The functions here are called from the
+model signals, including achievements_bulk_updated for queryset.update(). They
+are also used by the rebuild_achievement_cards command. Every change bumps the
+facet count cache version.
+"""
+from django.db import transaction
+
+from . import facets
+
+
+def build_card(achievement):
+    """Return an unsaved AchievementCard for an achievement with student and profile loaded"""
+    from .models import AchievementCard, StudentProfile
+
+    student = achievement.student
+    try:
+        profile = student.studentprofile
+    except StudentProfile.DoesNotExist:
+        profile = None
+
+    initials = f'{student.first_name[:1]}{student.last_name[:1]}'
+    return AchievementCard(
+        achievement_id=achievement.pk,
+        student_id=achievement.student_id,
+        college_id=achievement.college_id,
+        name=achievement.name,
+        event=achievement.event,
+        prize=achievement.prize,
+        competition=achievement.competition,
+        competition_label=achievement.get_competition_display(),
+        description=achievement.description or '',
+        image=achievement.image.name or '',
+        image_url=achievement.get_image_url() or '',
+        student_name=student.get_full_name() or student.username,
+        student_initials=initials.upper(),
+        roll_number=profile.roll_number if profile else '',
+        department=str(profile.department) if profile else '',
+        year=profile.year if profile else None,
+        date_achieved=achievement.date_achieved,
+        created_at=achievement.created_at,
+    )
+
+
+def _project(queryset, batch_size=500):
+    # Callers delete the existing cards first, inside the same transaction
+    cards = []
+    written = 0
+    for achievement in queryset.filter(is_approved=True).select_related('student__studentprofile__department').iterator(
+        chunk_size=batch_size
+    ):
+        cards.append(build_card(achievement))
+        if len(cards) >= batch_size:
+            written += _write(cards)
+            cards = []
+    written += _write(cards)
+    return written
+
+
+def _write(cards):
+    from .models import AchievementCard
+
+    if cards:
+        AchievementCard.objects.bulk_create(cards)
+    return len(cards)
+
+
+def refresh_cards(achievement_ids):
+    """Re-project the given achievements"""
+    from .models import Achievement, AchievementCard
+
+    achievement_ids = list(achievement_ids)
+    if not achievement_ids:
+        return
+    with transaction.atomic():
+        transaction.on_commit(facets.bump_version)
+        AchievementCard.objects.filter(achievement_id__in=achievement_ids).delete()
+        _project(Achievement.objects.filter(id__in=achievement_ids))
+
+
+def refresh_cards_for_student(user_id):
+    """Re-project every card of one student after a name or profile change"""
+    from .models import Achievement, AchievementCard
+
+    with transaction.atomic():
+        transaction.on_commit(facets.bump_version)
+        AchievementCard.objects.filter(student_id=user_id).delete()
+        _project(Achievement.objects.filter(student_id=user_id))
+
+
+def rebuild_cards(batch_size=500):
+    """Drop and rebuild the whole projection; returns the number of cards written"""
+    from .models import Achievement, AchievementCard
+
+    with transaction.atomic():
+        transaction.on_commit(facets.bump_version)
+        AchievementCard.objects.all().delete()
+        return _project(Achievement.objects.order_by('id'), batch_size=batch_size)
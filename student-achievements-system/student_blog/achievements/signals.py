@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Sent after a bulk queryset.update() on Achievement rows, which bypasses the
+# per-instance post_save signal. Receivers get `achievement_ids` (a list),
+# `college_ids` (the distinct colleges of those rows) and `fields` (the names
+# of the updated columns).
+achievements_bulk_updated = Signal()
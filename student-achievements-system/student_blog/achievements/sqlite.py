@@ -0,0 +1,147 @@
+"""
+SQLite production profile.
+
+The site runs on a single SQLite file. Under concurrent signups and
+submissions, writers used to fail with "database is locked". The fix has
+four parts:
+
+- apply_pragmas() runs on every new connection (connection_created). It
+  sets WAL journal mode, so readers never block the writer, plus
+  synchronous=NORMAL, a memory map and a larger page cache from
+  SQLITE_PRAGMAS.
+- settings.DATABASES keeps connections open between requests
+  (CONN_MAX_AGE), so the PRAGMAs and the page cache are not rebuilt on
+  every request.
+- achievements.sqlite_backend opens transactions with BEGIN IMMEDIATE and
+  waits up to OPTIONS['timeout'] seconds for the write lock.
+- run_write() hands short writes to one writer thread per process. The
+  thread commits whatever has queued up as one transaction, with a
+  savepoint per write. Concurrent requests therefore wait in a queue
+  instead of competing for the lock, and a burst of writes costs one commit.
+
+A caller waits up to SQLITE_WRITE_TIMEOUT seconds for its write. If the
+write is still queued by then, it is cancelled and the caller gets a
+TimeoutError, so the write never commits behind the caller's back. If the
+writer thread has already picked it up, the caller waits for the outcome.
+
+run_write() runs the function in the calling thread when the queue is
+disabled (SQLITE_WRITE_QUEUE = False), when the database is not SQLite, or
+when the caller is already inside a transaction. The last case covers tests
+and nested calls. Either way the function is atomic: it runs in its own
+transaction or savepoint.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def apply_pragmas(connection):
+    """Set SQLITE_PRAGMAS on a new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    # On the raw connection, so the statements are not counted as queries
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and 'locked' in str(exc)
+
+
+class WriteQueue:
+    """A writer thread that commits queued functions in batches"""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.requests = queue.Queue()
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the writer thread and return its result"""
+        self._ensure_running()
+        future = Future()
+        self.requests.put((func, args, kwargs, future))
+        try:
+            return future.result(timeout=getattr(settings, 'SQLITE_WRITE_TIMEOUT', 30))
+        except FutureTimeoutError:
+            # Still queued: cancel it, so a write reported as failed never commits later
+            if future.cancel():
+                raise
+        # Already picked up by the writer thread, so its outcome is about to be known
+        return future.result()
+
+    def _ensure_running(self):
+        # Also restarts the thread in a forked child, which does not inherit it
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        max_batch = getattr(settings, 'SQLITE_WRITE_BATCH_SIZE', 50)
+        while True:
+            batch = [self.requests.get()]
+            while len(batch) < max_batch:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            # Writes whose caller gave up waiting have been cancelled and are dropped
+            batch = [request for request in batch if request[3].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            connections[self.using].close_if_unusable_or_obsolete()
+            self._write(batch)
+
+    def _write(self, batch, retries=3):
+        outcomes = []
+        committed = []
+        try:
+            with transaction.atomic(using=self.using):
+                transaction.on_commit(lambda: committed.append(True), using=self.using)
+                for func, args, kwargs, future in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((future, func(*args, **kwargs), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            if not committed:
+                # BEGIN IMMEDIATE timed out before anything ran, so the batch can be retried as a whole
+                if is_locked_error(exc) and not outcomes and retries:
+                    return self._write(batch, retries - 1)
+                for _, _, _, future in batch:
+                    future.set_exception(exc)
+                return
+            logger.exception('An on_commit callback failed after a queued write')
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+write_queue = WriteQueue()
+
+
+def run_write(func, *args, **kwargs):
+    """Run a short write through the process's write queue (see module docstring)"""
+    connection = connections[write_queue.using]
+    if (
+        not getattr(settings, 'SQLITE_WRITE_QUEUE', False)
+        or connection.vendor != 'sqlite'
+        or connection.in_atomic_block
+        or threading.current_thread() is write_queue.thread
+    ):
+        with transaction.atomic(using=write_queue.using):
+            return func(*args, **kwargs)
+    return write_queue.submit(func, *args, **kwargs)
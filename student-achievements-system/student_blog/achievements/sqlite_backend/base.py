@@ -0,0 +1,29 @@
+"""
+Django's SQLite backend with the transaction_mode option of Django 5.1.
+
+atomic() opens transactions with a plain BEGIN, which takes no lock until the
+first write. When another connection commits in between, SQLite cannot
+upgrade the transaction's read snapshot to a write and fails at once with
+"database is locked", without waiting for the busy timeout. With
+OPTIONS['transaction_mode'] = 'IMMEDIATE', transactions start with BEGIN
+IMMEDIATE instead. They take the write lock up front, so a writer waits its
+turn (up to OPTIONS['timeout'] seconds) rather than failing.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    @property
+    def transaction_mode(self):
+        return self.settings_dict['OPTIONS'].get('transaction_mode')
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
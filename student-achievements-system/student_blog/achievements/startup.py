@@ -0,0 +1,118 @@
+"""
+Warm-up for a freshly started web worker.
+
+A new worker has work left to do after the application module is imported:
+building the URL resolver (which imports every view module), compiling
+templates, loading the in-process lookup tables that most requests use
+(tenancy and autocomplete), and building the duplicate index that every
+achievement submission checks and the image-hash index the admin's
+reused-image filter reads. Without warm-up, all of that happens
+during the first request the worker receives. student_blog/wsgi.py and
+asgi.py call warm_up() after creating the application, so the work is done
+before the server sends the worker any traffic.
+
+Modules needed by only some requests or by background jobs, such as Pillow
+and the image downloader, are imported where they are used rather than at
+module level.
+
+The lookup tables are read from the database. warm_up() closes its
+connections when it is done, so a server that forks workers after loading the
+application (gunicorn --preload) never shares one open SQLite connection
+between processes; each worker opens its own on its first query.
+
+Set STARTUP_WARM_UP=0 in the environment to skip the warm-up.
+`manage.py profile_startup` reports the import-time breakdown and how long
+each warm-up step takes.
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds spent in each step of the last warm_up() in this process
+timings = {}
+
+
+def project_template_names(engine):
+    """Names of the templates under this project's template directories"""
+    base = os.path.realpath(settings.BASE_DIR)
+    names = set()
+    for directory in engine.template_dirs:
+        directory = os.path.realpath(directory)
+        if not directory.startswith(base + os.sep):
+            continue
+        for root, _, files in os.walk(directory):
+            for name in files:
+                names.add(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def load_urls():
+    from django.urls import get_resolver
+
+    # Building the reverse lookup imports every view module
+    get_resolver().reverse_dict
+
+
+def compile_templates():
+    from django.template import engines
+
+    for engine in engines.all():
+        for name in project_template_names(engine):
+            engine.get_template(name)
+
+
+def load_lookup_tables():
+    from . import tenancy
+    from .autocomplete import index as autocomplete_index
+
+    college = tenancy.default_college()
+    autocomplete_index.ensure_loaded(college.pk if college else None)
+
+
+def load_duplicate_index():
+    # AchievementForm.clean() reads the submitting college's partition, and its
+    # MinHash signatures cost about a third of a millisecond per achievement to
+    # build, so every college is loaded here rather than in a student's POST
+    from .duplicates import index as duplicate_index
+    from .models import College
+
+    for college_id in College.objects.values_list('id', flat=True):
+        duplicate_index.ensure_loaded(college_id)
+
+
+def load_image_hash_index():
+    from .image_hash import index as image_hash_index
+
+    image_hash_index.ensure_loaded()
+
+
+STEPS = (
+    ('urls', load_urls),
+    ('templates', compile_templates),
+    ('lookup_tables', load_lookup_tables),
+    ('duplicate_index', load_duplicate_index),
+    ('image_hash_index', load_image_hash_index),
+)
+
+
+def warm_up():
+    """Do the first-request work now. Failures are logged; the worker still starts."""
+    if not getattr(settings, 'STARTUP_WARM_UP', True):
+        return timings
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except DatabaseError as exc:
+            # e.g. migrations not applied yet; the tables load on first use instead
+            logger.warning('Startup warm-up step %s skipped: %s', name, exc)
+        except Exception:
+            logger.exception('Startup warm-up step %s failed', name)
+        timings[name] = time.perf_counter() - started
+    connections.close_all()
+    return timings
@@ -157,6 +157,27 @@ document.addEventListener('DOMContentLoaded', function() {
                 submitBtn.innerHTML = '<div class="loading"></div> Sending...';
                 submitBtn.disabled = true;
             }
+
+            // Pre-rendered pages carry no CSRF token; fetch one for this visitor first
+            if (!this.querySelector('input[name="csrfmiddlewaretoken"]')) {
+                e.preventDefault();
+                fetch(this.dataset.csrfUrl, { credentials: 'same-origin' })
+                    .then(response => response.json())
+                    .then(data => {
+                        const input = document.createElement('input');
+                        input.type = 'hidden';
+                        input.name = 'csrfmiddlewaretoken';
+                        input.value = data.token;
+                        this.appendChild(input);
+                        this.submit();
+                    })
+                    .catch(() => {
+                        if (submitBtn) {
+                            submitBtn.innerHTML = '<i class="fas fa-paper-plane"></i> Send Message';
+                            submitBtn.disabled = false;
+                        }
+                    });
+            }
         });
     }
 
@@ -177,6 +198,71 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Event / achievement name suggestions
+    const autocompleteUrl = document.body.dataset.autocompleteUrl;
+    document.querySelectorAll('input[data-autocomplete]').forEach(input => {
+        if (!autocompleteUrl) return;
+
+        const datalist = document.createElement('datalist');
+        datalist.id = `${input.name}-suggestions`;
+        input.setAttribute('list', datalist.id);
+        input.parentNode.appendChild(datalist);
+
+        let timer = null;
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = this.value.trim();
+            if (query.length < 2) return;
+
+            timer = setTimeout(() => {
+                const params = new URLSearchParams({ field: input.dataset.autocomplete, q: query });
+                fetch(`${autocompleteUrl}?${params}`)
+                    .then(response => response.json())
+                    .then(data => {
+                        datalist.innerHTML = '';
+                        data.suggestions.forEach(suggestion => {
+                            const option = document.createElement('option');
+                            option.value = suggestion.value;
+                            datalist.appendChild(option);
+                        });
+                    })
+                    .catch(() => {});
+            }, 150);
+        });
+    });
+
+    // Chunked, resumable image uploads
+    const uploadUrl = document.body.dataset.uploadUrl;
+    document.querySelectorAll('input[type="file"][data-chunked-upload]').forEach(input => {
+        const form = input.closest('form');
+        const uploadIdInput = form && form.querySelector('input[name="upload_id"]');
+        if (!uploadUrl || !uploadIdInput) return;
+
+        const status = document.createElement('small');
+        status.style.cssText = 'display: block; margin-top: 0.5rem; color: var(--text-light);';
+        input.parentNode.appendChild(status);
+
+        input.addEventListener('change', function() {
+            const file = this.files[0];
+            if (!file) return;
+            uploadIdInput.value = '';
+            const submitBtn = form.querySelector('button[type="submit"]');
+            if (submitBtn) submitBtn.disabled = true;
+
+            chunkedUpload(file, input.dataset.chunkedUpload, form, percent => {
+                status.textContent = `Uploading... ${percent}%`;
+            }).then(upload => {
+                uploadIdInput.value = upload.id;
+                input.value = '';  // the file is already on the server
+                status.textContent = `✅ ${file.name} uploaded`;
+            }).catch(error => {
+                status.textContent = `❌ ${error.message}`;
+            }).finally(() => {
+                if (submitBtn) submitBtn.disabled = false;
+            });
+        });
+    });
+
     // Password strength indicator for signup form
     const passwordInput = document.getElementById('id_password1');
     const strengthBar = document.getElementById('passwordStrength');
@@ -206,6 +292,49 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 // Utility functions
+async function chunkedUpload(file, kind, form, onProgress) {
+    const uploadUrl = document.body.dataset.uploadUrl;
+    const csrfToken = form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+    const headers = { 'X-CSRFToken': csrfToken };
+
+    const request = async (url, options) => {
+        const response = await fetch(url, { ...options, headers: { ...headers, ...options.headers } });
+        const data = await response.json();
+        if (!response.ok && response.status !== 409) throw new Error(data.error || 'Upload failed');
+        return data;
+    };
+
+    let upload = await request(uploadUrl, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size, kind: kind })
+    });
+    const detailUrl = `${uploadUrl}${upload.id}/`;
+
+    let retries = 0;
+    while (upload.offset < upload.size) {
+        const chunk = file.slice(upload.offset, upload.offset + upload.chunk_size);
+        try {
+            upload = await request(detailUrl, {
+                method: 'PUT',
+                headers: { 'Upload-Offset': String(upload.offset) },
+                body: chunk
+            });
+            retries = 0;
+        } catch (error) {
+            // Resume from whatever the server actually received
+            if (++retries > 5) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            upload = await request(detailUrl, { method: 'GET' });
+        }
+        onProgress(Math.round(100 * upload.offset / upload.size));
+    }
+
+    const completed = await request(`${detailUrl}complete/`, { method: 'POST' });
+    if (completed.status !== 'complete') throw new Error(completed.error || 'Upload failed');
+    return completed;
+}
+
 function showNotification(message, type = 'success') {
     const notification = document.createElement('div');
     notification.className = `alert alert-${type}`;
@@ -0,0 +1,119 @@
+"""
+Delta sync for mobile and kiosk clients: /api/achievements/?since=<timestamp>.
+
+A client that already holds a copy of the public achievements asks only for
+what changed after its last sync. Changes are read in (updated_at, id) order
+from two sources:
+
+- Achievement rows whose updated_at moved past the cursor. Approved ones are
+  returned with their card fields. Unapproved ones are returned as tombstones,
+  because the client may hold them from when they were approved.
+- AchievementTombstone rows, written in the delete's transaction, for
+  achievements that no longer exist.
+
+Both sources are indexed on (timestamp, achievement id) and the cursor uses
+that pair for both. One page is assembled by merging the two ordered streams,
+so at most two indexed range scans run per request.
+When a page is full, the response carries a continuation token that encodes
+the (timestamp, id) of its last entry. The client passes it back as ?cursor=
+to continue, and keeps the final token for the next sync.
+"""
+import base64
+import binascii
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .tenancy import scope
+
+CARD_FIELDS = (
+    'name', 'event', 'prize', 'competition', 'image', 'image_url', 'description',
+    'student_name', 'roll_number', 'department', 'date_achieved',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_size():
+    return getattr(settings, 'DELTA_SYNC_PAGE_SIZE', 500)
+
+
+def encode_cursor(changed_at, pk):
+    raw = f'{changed_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        changed_at, pk = raw.rsplit('|', 1)
+        position = _aware(parse_datetime(changed_at)), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor.')
+    if position[0] is None:
+        raise InvalidCursor('Invalid cursor.')
+    return position
+
+
+def parse_since(value):
+    """Start position for a ?since=<ISO 8601 timestamp> request"""
+    try:
+        # parse_datetime raises ValueError for a well-formed but impossible date
+        changed_at = _aware(parse_datetime(value.strip().replace(' ', '+')))
+    except ValueError:
+        changed_at = None
+    if changed_at is None:
+        raise InvalidCursor('since must be an ISO 8601 timestamp.')
+    return changed_at, 0
+
+
+def _aware(value):
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+def _after(field, id_field, position):
+    changed_at, pk = position
+    return Q(**{f'{field}__gt': changed_at}) | Q(**{field: changed_at, f'{id_field}__gt': pk})
+
+
+def changes_since(position, college, limit=None):
+    """
+    Return (achievements, deleted, cursor, has_more) for changes after
+    `position`, a (timestamp, id) pair.
+    """
+    from .models import Achievement, AchievementTombstone
+
+    limit = limit or page_size()
+    rows = scope(Achievement.objects.all(), college).filter(_after('updated_at', 'id', position)).order_by(
+        'updated_at', 'id'
+    ).values('id', 'updated_at', 'is_approved', 'card', *(f'card__{f}' for f in CARD_FIELDS))[:limit + 1]
+    tombstones = scope(AchievementTombstone.objects.all(), college).filter(
+        _after('deleted_at', 'achievement_id', position)
+    ).order_by('deleted_at', 'achievement_id').values('achievement_id', 'deleted_at')[:limit + 1]
+
+    entries = [((row['updated_at'], row['id']), row) for row in rows]
+    entries += [((row['deleted_at'], row['achievement_id']), row) for row in tombstones]
+    entries.sort(key=lambda entry: entry[0])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    achievements, deleted = [], []
+    for (changed_at, _), row in entries:
+        if 'achievement_id' in row:
+            deleted.append({'id': row['achievement_id'], 'deleted_at': changed_at})
+        elif row['is_approved'] and row['card'] is not None:
+            achievement = {'id': row['id'], 'updated_at': changed_at}
+            achievement.update((f, row[f'card__{f}']) for f in CARD_FIELDS)
+            achievements.append(achievement)
+        else:
+            deleted.append({'id': row['id'], 'deleted_at': changed_at})
+
+    last = entries[-1][0] if entries else position
+    return achievements, deleted, encode_cursor(*last), has_more
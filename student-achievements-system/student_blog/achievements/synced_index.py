@@ -0,0 +1,130 @@
+"""
+In-memory achievement indexes that stay in step across processes.
+
+The autocomplete, duplicate and image-hash indexes keep a copy of a few
+achievement columns in every web and worker process. Each index is split into
+partitions, one per college (or a single one for an index that spans every
+college), and each partition remembers the version it was last synced at.
+The versions live in the shared cache:
+
+- Code that changes achievements calls changed() with their colleges. Once
+  the transaction commits, that bumps those partitions' versions, whichever
+  process made the change.
+- Every read first compares its partition's version with the shared one.
+  When they differ, the partition re-reads only the achievements whose
+  updated_at (or the index's own sync_field) moved since its last sync, plus the AchievementTombstone rows of
+  the ones deleted since. The first read of a partition loads it in full.
+
+A change is therefore visible to every process on its next read, and costs
+each process one small indexed query rather than a reload.
+"""
+import datetime
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+# Rows are re-read from this long before the last sync, so a transaction that
+# committed after a sync but stamped updated_at before it is not missed
+SYNC_OVERLAP = datetime.timedelta(minutes=5)
+
+ALL_COLLEGES = 'all'
+
+
+class Partition:
+    """
+    One college's share of an index. Subclasses hold the data and implement
+    add(row), with row = (id, *SyncedIndex.fields), and remove(achievement_id).
+    """
+
+    def __init__(self):
+        self.version = None
+        self.synced_at = None
+
+
+class SyncedIndex:
+    """
+    Base class for the indexes. Subclasses set `name` (the cache key prefix),
+    `fields` (the Achievement columns read after 'id') and `partition_class`.
+    """
+    name = None
+    fields = ()
+    partition_class = Partition
+    # False for an index that spans every college
+    per_college = True
+    # Applied to full loads only; a sync reads every changed row so add() can skip it
+    load_filter = {}
+    # The timestamp column a sync re-reads from; it must move whenever `fields` change
+    sync_field = 'updated_at'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._partitions = {}
+
+    def _key(self, college_id):
+        return college_id if self.per_college else ALL_COLLEGES
+
+    def _version_key(self, key):
+        return f'{self.name}:{key or "none"}:version'
+
+    def changed(self, college_ids):
+        """Have every process re-sync these colleges' partitions once the transaction commits"""
+        keys = {self._version_key(self._key(college_id)) for college_id in college_ids}
+
+        def bump():
+            for key in keys:
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    cache.set(key, time.time_ns(), None)
+
+        transaction.on_commit(bump)
+
+    def partition(self, college_id):
+        """The college's partition, synced first when its version has moved"""
+        key = self._key(college_id)
+        # Seeded with the clock, so an evicted version never matches a partition's old one
+        current = cache.get_or_set(self._version_key(key), time.time_ns, None)
+        partition = self._partitions.get(key)
+        if partition is not None and partition.version == current:
+            return partition
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None or partition.version != current:
+                partition = self._sync(key, partition)
+                partition.version = current
+                self._partitions[key] = partition
+        return partition
+
+    def _sync(self, key, partition):
+        from .models import Achievement, AchievementTombstone
+
+        started = timezone.now()
+        rows = Achievement.objects.all()
+        tombstones = AchievementTombstone.objects.all()
+        if key != ALL_COLLEGES:
+            rows = rows.filter(college_id=key)
+            tombstones = tombstones.filter(college_id=key)
+        if partition is None:
+            partition = self.partition_class()
+            rows = rows.filter(**self.load_filter)
+        else:
+            since = partition.synced_at - SYNC_OVERLAP
+            rows = rows.filter(**{f'{self.sync_field}__gte': since})
+            for achievement_id in tombstones.filter(deleted_at__gte=since).values_list('achievement_id', flat=True):
+                partition.remove(achievement_id)
+        for row in rows.order_by().values_list('id', *self.fields).iterator():
+            partition.remove(row[0])
+            partition.add(row)
+        partition.synced_at = started
+        return partition
+
+    def ensure_loaded(self, college_id=None):
+        self.partition(college_id)
+
+    def reset(self):
+        """Drop every partition; each is loaded in full on its next read"""
+        with self._lock:
+            self._partitions = {}
@@ -0,0 +1,13 @@
+"""
+Background execution for work that should not hold up a request.
+
+Work is queued as a Job in the same transaction as the change that needs it,
+so a rolled back save never schedules anything and the worker always sees
+the committed row. Jobs are run by manage.py run_worker; see achievements.jobs.
+"""
+from .jobs import enqueue
+
+
+def run_in_background(func, *args, **kwargs):
+    """Queue func(*args, **kwargs) for a background worker; arguments must be JSON serialisable"""
+    return enqueue(func, *args, **kwargs)
@@ -0,0 +1,82 @@
+"""
+Multi-college tenancy.
+
+Each College is a tenant, identified by the host name it is served on.
+TenantMiddleware resolves the host to a College from a small in-process
+table, so a request pays no database query for it. The table is loaded on
+first use, reloaded when a College or Department is saved in this process,
+and otherwise refreshed every TENANT_CACHE_SECONDS so other workers pick
+up changes.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_state = {'loaded_at': 0.0, 'by_host': {}, 'default': None}
+
+
+def _cache_seconds():
+    return getattr(settings, 'TENANT_CACHE_SECONDS', 300)
+
+
+def _load():
+    from .models import College, Department
+
+    colleges = list(College.objects.order_by('-is_default', 'id'))
+    default_departments = {
+        d.college_id: d for d in Department.objects.filter(is_default=True).order_by('id')
+    }
+    by_host = {}
+    for college in colleges:
+        college.default_department = default_departments.get(college.id)
+        if college.domain:
+            by_host[college.domain.lower()] = college
+    _state.update(loaded_at=time.monotonic(), by_host=by_host, default=colleges[0] if colleges else None)
+
+
+def _ensure_loaded():
+    if time.monotonic() - _state['loaded_at'] > _cache_seconds() or _state['loaded_at'] == 0.0:
+        with _lock:
+            if time.monotonic() - _state['loaded_at'] > _cache_seconds() or _state['loaded_at'] == 0.0:
+                _load()
+
+
+def invalidate():
+    _state['loaded_at'] = 0.0
+
+
+def college_for_host(host):
+    """Return the College served on `host` (port ignored), or the default college"""
+    _ensure_loaded()
+    host = (host or '').split(':')[0].lower()
+    return _state['by_host'].get(host, _state['default'])
+
+
+def default_college():
+    _ensure_loaded()
+    return _state['default']
+
+
+def default_department(college=None):
+    college = college or default_college()
+    return getattr(college, 'default_department', None) if college else None
+
+
+def scope(queryset, college, field='college'):
+    """Restrict a queryset to one tenant; unscoped when no college exists yet"""
+    if college is None:
+        return queryset
+    return queryset.filter(**{field: college})
+
+
+class TenantMiddleware:
+    """Attach the College for the request host as request.college"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.college = college_for_host(request.get_host())
+        return self.get_response(request)
@@ -0,0 +1,42 @@
+"""
+Test runner that keeps the suite away from the running site's files.
+
+The shared file cache, media, upload temp and prerender directories are all
+under BASE_DIR, where live web and worker processes read them. The runner
+points them at a temporary directory for the whole run, and exports CACHE_DIR
+and SQLITE_PATH so the processes the tests start use that directory too.
+"""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directory = tempfile.mkdtemp(prefix='student_blog_tests_')
+        self.environ = {key: os.environ.get(key) for key in ('CACHE_DIR', 'SQLITE_PATH')}
+        cache_dir = os.path.join(self.directory, 'cache')
+        os.environ['CACHE_DIR'] = cache_dir
+        os.environ['SQLITE_PATH'] = os.path.join(self.directory, 'db.sqlite3')
+        self.settings_override = override_settings(
+            CACHES={'default': {**settings.CACHES['default'], 'LOCATION': cache_dir}},
+            MEDIA_ROOT=os.path.join(self.directory, 'media'),
+            CHUNKED_UPLOAD_TEMP_DIR=os.path.join(self.directory, 'upload_tmp'),
+            PRERENDER_ROOT=os.path.join(self.directory, 'prerendered'),
+        )
+        self.settings_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.settings_override.disable()
+        for key, value in self.environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
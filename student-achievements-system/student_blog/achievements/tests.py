@@ -1,3 +1,1494 @@
-from django.test import TestCase
+import base64
+import datetime
+import io
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import engines
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from . import facets, featured, media_gc, prerender, startup, tenancy, urls as achievement_urls
+from .autocomplete import PrefixIndex, index as autocomplete_index
+from .duplicates import duplicate_groups, index as duplicate_index, similarity, signature
+from .forms import AchievementForm
+from .image_fetcher import fetch_images
+from .image_hash import compute_achievement_hash, dhash, index as image_hash_index
+from .jobs import claim, enqueue_once, execute, requeue_stale
+from .management.commands import analyze_queries
+from .models import Achievement, AchievementCard, ChangeEvent, College, ContactMessage, Job, UploadSession
+from .projections import rebuild_cards
+from .sqlite import WriteQueue
+from .uploads import UploadError, upload_temp_dir, write_chunk
+
+
+def _png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), 'orange').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _gradient_png_bytes():
+    buffer = io.BytesIO()
+    Image.linear_gradient('L').rotate(-90).convert('RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def subprocess_env(**overrides):
+    """
+    Environment for a Django process started by a test: the run's own cache
+    directory and database file (see achievements.test_runner), no warm-up
+    """
+    return {
+        **os.environ,
+        'CACHE_DIR': settings.CACHES['default']['LOCATION'],
+        'SQLITE_PATH': os.environ['SQLITE_PATH'],
+        'STARTUP_WARM_UP': '0',
+        **overrides,
+    }
+
+
+def run_in_other_process(code):
+    """Run `code` in a separate Django process, as another web or worker process would"""
+    subprocess.run(
+        [sys.executable, '-c', f'import django\ndjango.setup()\n{code}'], cwd=settings.BASE_DIR,
+        env=subprocess_env(), check=True, capture_output=True,
+    )
+
+
+class _ImageHostHandler(BaseHTTPRequestHandler):
+    """Stand-in for a third-party image host"""
+    flaky_calls = 0
+
+    def do_GET(self):
+        if self.path == '/certificate.png':
+            self._reply(200, 'image/png', _png_bytes())
+        elif self.path == '/huge.png':
+            self._reply(200, 'image/png', b'\0' * 4096)
+        elif self.path == '/slow.png':
+            # Each read is quick, but the whole body takes seconds
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', '40')
+            self.end_headers()
+            try:
+                for _ in range(40):
+                    self.wfile.write(b'\0')
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except OSError:
+                pass
+        elif self.path == '/page.html':
+            self._reply(200, 'text/html', b'<html></html>')
+        elif self.path == '/flaky.png':
+            _ImageHostHandler.flaky_calls += 1
+            if _ImageHostHandler.flaky_calls == 1:
+                self._reply(503, 'text/plain', b'busy')
+            else:
+                self._reply(200, 'image/png', _png_bytes())
+        else:
+            self._reply(404, 'text/plain', b'missing')
+
+    def _reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageFetcherTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHostHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.media_root = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.student = User.objects.create_user('fetcher', password='secret-pass-123')
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_FETCH_ALLOW_PRIVATE_HOSTS=True,
+            IMAGE_FETCH_MAX_BYTES=2048,
+            IMAGE_FETCH_BACKOFF=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _achievement(self, path):
+        return Achievement.objects.create(
+            student=self.student, name='Hackathon Winner', event='Code Fest', prize='1st',
+            image_url=f'{self.base_url}{path}',
+        )
+
+    def test_downloads_into_upload_storage(self):
+        achievement = self._achievement('/certificate.png')
+        self.assertEqual(fetch_images([achievement.id]), (1, 0))
+        achievement.refresh_from_db()
+        self.assertEqual(achievement.image_fetch_status, 'fetched')
+        self.assertTrue(achievement.image.name.startswith(f'achievements/user_{self.student.id}/'))
+        self.assertTrue(achievement.image.storage.exists(achievement.image.name))
+
+    def test_failures_are_recorded(self):
+        too_large = self._achievement('/huge.png')
+        not_image = self._achievement('/page.html')
+        missing = self._achievement('/missing.png')
+        self.assertEqual(fetch_images([too_large.id, not_image.id, missing.id]), (0, 3))
+        for achievement in (too_large, not_image, missing):
+            achievement.refresh_from_db()
+            self.assertEqual(achievement.image_fetch_status, 'failed')
+            self.assertTrue(achievement.image_fetch_error)
+            self.assertFalse(achievement.image)
+
+    def test_a_failed_image_leaves_the_card(self):
+        achievement = self._achievement('/missing.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            Achievement.objects.filter(pk=achievement.pk).set_approval(True)
+        self.assertEqual(AchievementCard.objects.get(pk=achievement.pk).image_url, achievement.image_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            fetch_images([achievement.id])
+        self.assertEqual(AchievementCard.objects.get(pk=achievement.pk).image_url, '')
+
+    def test_server_errors_are_retried(self):
+        achievement = self._achievement('/flaky.png')
+        self.assertEqual(fetch_images([achievement.id]), (1, 0))
+
+    @override_settings(IMAGE_FETCH_ALLOW_PRIVATE_HOSTS=False)
+    def test_private_hosts_are_refused(self):
+        achievement = self._achievement('/certificate.png')
+        self.assertEqual(fetch_images([achievement.id]), (0, 1))
+        achievement.refresh_from_db()
+        self.assertIn('private', achievement.image_fetch_error)
+
+    @override_settings(IMAGE_FETCH_TIMEOUT=0.5)
+    def test_slow_downloads_hit_the_deadline(self):
+        achievement = self._achievement('/slow.png')
+        started = time.monotonic()
+        self.assertEqual(fetch_images([achievement.id]), (0, 1))
+        self.assertLess(time.monotonic() - started, 1.5)
+        achievement.refresh_from_db()
+        self.assertIn('took longer', achievement.image_fetch_error)
+
+    def _resolving_to_localhost(self):
+        real_getaddrinfo = socket.getaddrinfo
+
+        def getaddrinfo(host, *args, **kwargs):
+            if host == 'images.example.test':
+                host = '127.0.0.1'
+            return real_getaddrinfo(host, *args, **kwargs)
+
+        return mock.patch('socket.getaddrinfo', getaddrinfo)
+
+    def test_connects_to_the_checked_address(self):
+        port = self.server.server_address[1]
+        achievement = Achievement.objects.create(
+            student=self.student, name='Hackathon Winner', event='Code Fest', prize='1st',
+            image_url=f'http://images.example.test:{port}/certificate.png',
+        )
+        with self._resolving_to_localhost():
+            self.assertEqual(fetch_images([achievement.id]), (1, 0))
+            with override_settings(IMAGE_FETCH_ALLOW_PRIVATE_HOSTS=False):
+                achievement.image = ''
+                achievement.image_fetch_status = ''
+                achievement.save()
+                self.assertEqual(fetch_images([achievement.id]), (0, 1))
+        achievement.refresh_from_db()
+        self.assertIn('private', achievement.image_fetch_error)
+
+
+class ImageHashTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        image_hash_index.reset()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.student = User.objects.create(username='hashes')
+
+    def _with_image(self, student, content):
+        return Achievement.objects.create(
+            student=student, name='Certificate of merit', event='Expo', prize='1st',
+            image=SimpleUploadedFile('certificate.png', content, content_type='image/png'),
+        )
+
+    def test_hashes_computed_by_a_worker_reach_the_index(self):
+        achievement = self._with_image(self.student, _png_bytes())
+        image_hash = dhash(io.BytesIO(_png_bytes()))
+        self.assertEqual(image_hash_index.similar(image_hash), [])
+        # The hash is only written to the row; the index learns it from the version bump after commit
+        with self.captureOnCommitCallbacks(execute=True):
+            compute_achievement_hash(achievement.pk)
+        self.assertEqual(image_hash_index.similar(image_hash), [(achievement.pk, 0)])
+        # A new hash is not a change delta-sync clients have to download again
+        self.assertEqual(Achievement.objects.get(pk=achievement.pk).updated_at, achievement.updated_at)
+
+    def test_replacing_the_image_drops_the_old_hash_from_the_index(self):
+        achievement = self._with_image(self.student, _png_bytes())
+        image_hash = dhash(io.BytesIO(_png_bytes()))
+        compute_achievement_hash(achievement.pk)
+        # Hashed long enough ago that a sync no longer re-reads the row for it
+        Achievement.objects.filter(pk=achievement.pk).update(
+            image_phash_updated_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        self.assertEqual(image_hash_index.similar(image_hash), [(achievement.pk, 0)])
+        achievement.refresh_from_db()
+        achievement.image = SimpleUploadedFile('other.png', _gradient_png_bytes(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            achievement.save()
+        self.assertEqual(image_hash_index.similar(image_hash), [])
+
+    def test_backfill_hashes_stored_images_and_finds_reuse(self):
+        other = User.objects.create(username='reuser')
+        original = self._with_image(self.student, _png_bytes())
+        reused = self._with_image(other, _png_bytes())
+        distinct = self._with_image(other, _gradient_png_bytes())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_image_hashes', processes=1, stdout=io.StringIO())
+
+        hashes = dict(Achievement.objects.values_list('pk', 'image_phash'))
+        self.assertEqual(hashes[distinct.pk], 'ffffffffffffffff')
+        self.assertEqual(hashes[original.pk], hashes[reused.pk])
+        reused.refresh_from_db()
+        distinct.refresh_from_db()
+        # Only other students' images count as reuse
+        self.assertEqual(image_hash_index.similar_for(reused), [(original.pk, 0)])
+        self.assertEqual(image_hash_index.similar_for(distinct), [])
+
+
+@override_settings(UPLOAD_CHUNK_SIZE=64, MAX_IMAGE_UPLOAD_SIZE=4096)
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(directory, 'media'), CHUNKED_UPLOAD_TEMP_DIR=os.path.join(directory, 'tmp')
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.student = User.objects.create_user('uploader', password='secret-pass-123')
+        self.client.force_login(self.student)
+
+    def create(self, size, kind='achievement'):
+        return self.client.post(reverse('upload_create'), {'filename': 'scan.png', 'size': size, 'kind': kind},
+                                content_type='application/json')
+
+    def put(self, upload_id, offset, data):
+        return self.client.put(reverse('upload_detail', args=[upload_id]), data,
+                               content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def upload(self, content):
+        upload_id = self.create(len(content)).json()['id']
+        for offset in range(0, len(content), 64):
+            self.assertEqual(self.put(upload_id, offset, content[offset:offset + 64]).status_code, 200)
+        return upload_id
+
+    def test_chunks_resume_complete_and_attach(self):
+        content = _png_bytes()
+        upload_id = self.create(len(content)).json()['id']
+        self.assertEqual(self.put(upload_id, 0, content[:64]).json()['offset'], 64)
+        # A retried chunk at a stale offset is refused with the offset to resume from
+        response = self.put(upload_id, 0, content[:64])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 64))
+        for offset in range(64, len(content), 64):
+            self.put(upload_id, offset, content[offset:offset + 64])
+        self.assertEqual(self.client.get(reverse('upload_detail', args=[upload_id])).json()['offset'], len(content))
+        self.assertEqual(self.client.post(reverse('upload_complete', args=[upload_id])).json()['status'], 'complete')
+
+        response = self.client.post(reverse('dashboard'), {
+            'name': 'Robotics champion', 'event': 'Robo Wars', 'prize': '1st', 'competition': 'national',
+            'upload_id': upload_id,
+        })
+        self.assertRedirects(response, reverse('dashboard'))
+        achievement = Achievement.objects.get(student=self.student)
+        with achievement.image.open('rb') as image:
+            self.assertEqual(image.read(), content)
+        self.assertEqual(UploadSession.objects.get(id=upload_id).status, 'attached')
+
+    def test_sizes_are_capped(self):
+        self.assertEqual(self.create(4097).status_code, 413)
+        upload_id = self.create(100).json()['id']
+        self.assertEqual(self.put(upload_id, 0, b'\0' * 65).status_code, 413)
+        self.put(upload_id, 0, b'\0' * 64)
+        self.assertEqual(self.put(upload_id, 64, b'\0' * 40).status_code, 413)
+        self.assertEqual(self.client.post(reverse('upload_complete', args=[upload_id])).status_code, 409)
+
+    def test_two_requests_for_the_same_offset_write_once(self):
+        upload_id = self.create(128).json()['id']
+        first, second = UploadSession.objects.get(id=upload_id), UploadSession.objects.get(id=upload_id)
+        self.assertEqual(write_chunk(first, io.BytesIO(b'a' * 64), 0, 64), 64)
+        # The second request read the session before the first one's chunk landed
+        with self.assertRaises(UploadError) as raised:
+            write_chunk(second, io.BytesIO(b'b' * 64), 0, 64)
+        self.assertEqual((raised.exception.status, second.received), (409, 64))
+        with open(first.temp_path, 'rb') as part:
+            self.assertEqual(part.read(), b'a' * 64)
+
+    def test_a_chunk_waits_for_the_previous_one_to_be_written(self):
+        upload_id = self.create(128).json()['id']
+        # Claimed by a request that has not written its bytes yet
+        UploadSession.objects.filter(id=upload_id).update(received=64)
+        self.assertEqual(self.put(upload_id, 64, b'\0' * 64).status_code, 409)
+        self.assertEqual(UploadSession.objects.get(id=upload_id).received, 64)
+
+    @override_settings(MAX_OPEN_UPLOADS_PER_USER=2, MAX_UPLOAD_TEMP_BYTES_PER_USER=250)
+    def test_unfinished_uploads_are_capped_per_user(self):
+        first = self.create(100).json()['id']
+        self.assertEqual(self.create(200).status_code, 429)
+        self.create(100)
+        self.assertEqual(self.create(10).status_code, 429)
+        self.client.delete(reverse('upload_detail', args=[first]))
+        self.assertEqual(self.create(10).status_code, 201)
+
+    def test_only_valid_image_headers_complete(self):
+        upload_id = self.upload(b'<html>not an image</html>')
+        response = self.client.post(reverse('upload_complete', args=[upload_id]))
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(UploadSession.objects.filter(id=upload_id).exists())
+
+    def test_images_are_stored_before_the_queued_insert(self):
+        upload_id = self.upload(_png_bytes())
+        self.client.post(reverse('upload_complete', args=[upload_id]))
+        stored = []
+
+        def run_write(func, achievement, upload):
+            stored.append(achievement.image.storage.exists(achievement.image.name))
+            return func(achievement, upload)
+
+        data = {'name': 'Robotics champion', 'event': 'Robo Wars', 'prize': '1st', 'competition': 'national'}
+        with mock.patch('achievements.views.run_write', side_effect=run_write):
+            self.client.post(reverse('dashboard'), {**data, 'upload_id': upload_id})
+            self.client.post(reverse('dashboard'), {
+                **data, 'image': SimpleUploadedFile('scan.png', _png_bytes(), content_type='image/png'),
+            })
+        self.assertEqual(stored, [True, True])
+        self.assertEqual(Achievement.objects.filter(student=self.student).exclude(image='').count(), 2)
+
+    def test_only_the_owners_sessions_can_be_attached(self):
+        upload_id = self.upload(_png_bytes())
+        self.client.post(reverse('upload_complete', args=[upload_id]))
+        other = User.objects.create(username='someone-else')
+        data = {'name': 'Robotics champion', 'event': 'Robo Wars', 'prize': '1st', 'competition': 'national',
+                'upload_id': upload_id}
+        self.assertFalse(AchievementForm(data, student=other).is_valid())
+        self.assertFalse(AchievementForm(data).is_valid())
+        self.assertTrue(AchievementForm(data, student=self.student).is_valid())
+
+
+# Exact number of queries per request: (role making the request, queries).
+# The same budget must hold with 10 and with 500 rows, so a per-row query
+# (N+1) fails the test. Adding a route to urls.py requires adding it here.
+# The request body of a POST route is SeededDataMixin.route_data().
+ROUTE_BUDGETS = {
+    'home': ('anonymous', 'get', 200, 0),
+    'achievements': ('anonymous', 'get', 200, 2),
+    'achievements_page': ('anonymous', 'get', 200, 1),
+    'achievement_detail': ('anonymous', 'get', 200, 2),
+    'portfolio': ('anonymous', 'get', 200, 1),
+    'signup': ('anonymous', 'get', 200, 2),
+    'login': ('anonymous', 'get', 200, 0),
+    'logout': ('student', 'get', 302, 4),
+    'dashboard': ('student', 'get', 200, 4),
+    'profile': ('student', 'get', 200, 6),
+    'delete_achievement': ('student', 'get', 302, 9),
+    'contact_submit': ('anonymous', 'post', 302, 4),
+    'csrf_token_api': ('anonymous', 'get', 200, 0),
+    'achievements_api': ('anonymous', 'get', 200, 1),
+    'changes_api': ('anonymous', 'get', 200, 1),
+    'autocomplete_api': ('anonymous', 'get', 200, 0),
+    'upload_create': ('student', 'post', 201, 4),
+    'upload_detail': ('student', 'get', 200, 3),
+    'upload_complete': ('student', 'post', 200, 4),
+    'admin_dashboard': ('staff', 'get', 200, 7),
+    'register_staff': ('superuser', 'get', 200, 4),
+    'moderation_api': ('staff', 'post', 200, 18),
+}
+
+# Exact number of queries per admin changelist page, keyed by model label
+CHANGELIST_BUDGETS = {
+    'auth.Group': 5,
+    'auth.User': 7,
+    'achievements.College': 5,
+    'achievements.Department': 6,
+    'achievements.Achievement': 8,
+    'achievements.ContactMessage': 7,
+    'achievements.ChangeEvent': 6,
+    'achievements.Job': 7,
+}
+
+PERF_BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'perf_baseline.json')
+
+
+@override_settings(SQLITE_WRITE_TIMEOUT=0.2)
+class WriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.queue = WriteQueue()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def block_writer(self):
+        """Occupy the writer thread until self.release is set; returns the blocked caller's thread"""
+        started = threading.Event()
+
+        def blocking_write():
+            started.set()
+            self.release.wait(5)
+            return 'done'
+
+        results = []
+        caller = threading.Thread(target=lambda: results.append(self.queue.submit(blocking_write)))
+        caller.start()
+        started.wait(5)
+        return caller, results
+
+    def message(self, subject):
+        return ContactMessage.objects.create(name='Visitor', email='v@example.com', subject=subject, message='Hi')
+
+    def test_a_write_still_queued_at_the_timeout_is_cancelled(self):
+        caller, _ = self.block_writer()
+        with self.assertRaises(FutureTimeoutError):
+            self.queue.submit(self.message, 'Timed out')
+        self.release.set()
+        caller.join(5)
+        self.queue.submit(self.message, 'Later')
+        self.assertEqual(list(ContactMessage.objects.values_list('subject', flat=True)), ['Later'])
+
+    def test_a_write_already_running_is_waited_for(self):
+        caller, results = self.block_writer()
+        # The blocked write outlives the caller's timeout but is already running, so the caller keeps waiting
+        time.sleep(0.4)
+        self.assertTrue(caller.is_alive())
+        self.release.set()
+        caller.join(5)
+        self.assertEqual(results, ['done'])
+
+
+class StartupTests(SimpleTestCase):
+    @override_settings(STARTUP_WARM_UP=True)
+    def test_warm_up_closes_its_connections(self):
+        with mock.patch.object(startup, 'STEPS', ()), mock.patch.object(startup.connections, 'close_all') as close_all:
+            startup.warm_up()
+        close_all.assert_called_once_with()
+
+    def test_entry_points_import_without_a_settings_module_in_the_environment(self):
+        env = subprocess_env()
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        for module in ('student_blog.wsgi', 'student_blog.asgi'):
+            result = subprocess.run([sys.executable, '-c', f'import {module}'], cwd=settings.BASE_DIR, env=env,
+                                    capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class UserSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user('summary', password='secret-pass-123')
+        Achievement.objects.create(student=self.student, name='First', event='Code Fest', prize='1st', is_approved=True)
+        self.client.force_login(self.student)
+
+    def counters(self):
+        response = self.client.get(reverse('profile'))
+        return response.context['total_achievements'], response.context['approved_achievements']
+
+    def test_counters_refresh_when_the_version_is_bumped(self):
+        self.assertEqual(self.counters(), (1, 1))
+        # Without the after-commit bump the session copy is still current
+        Achievement.objects.create(student=self.student, name='Second', event='Code Fest', prize='2nd')
+        self.assertEqual(self.counters(), (1, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            Achievement.objects.create(student=self.student, name='Third', event='Code Fest', prize='3rd')
+        self.assertEqual(self.counters(), (3, 1))
+        self.assertContains(self.client.get(reverse('profile')), 'title="Awaiting approval">2</span>')
+
+    def test_a_bump_in_another_process_is_seen(self):
+        self.assertEqual(self.counters(), (1, 1))
+        Achievement.objects.create(student=self.student, name='Second', event='Code Fest', prize='2nd')
+        run_in_other_process(f'from achievements.user_summary import bump_version\nbump_version({self.student.pk})')
+        self.assertEqual(self.counters(), (2, 1))
+
+
+class FeaturedAchievementTests(TestCase):
+    @override_settings(FEATURED_SET_COUNT=2, FEATURED_SET_SIZE=2, FEATURED_ROTATION_SECONDS=60)
+    def test_sets_are_ranked_by_level_and_recency_and_rotate(self):
+        student = User.objects.create(username='featured', first_name='Fea', last_name='Tured')
+        today = datetime.date.today()
+        for name, competition, date_achieved in (
+            ('Old national', 'national', today - datetime.timedelta(days=730)),
+            ('Recent college', 'college', today),
+            ('Recent state', 'state', today),
+            ('Recent national', 'national', today),
+        ):
+            Achievement.objects.create(student=student, name=name, event='Expo', prize='1st', competition=competition,
+                                       date_achieved=date_achieved, is_approved=True)
+
+        entry = featured.generate(tenancy.default_college())
+        self.assertEqual(
+            [[card['name'] for card in cards] for cards in entry['sets']],
+            [['Recent national', 'Recent college'], ['Recent state', 'Old national']],
+        )
+        self.assertEqual(entry['total_achievements'], 4)
+        self.assertEqual(featured.current_set(entry, now=0), entry['sets'][0])
+        self.assertEqual(featured.current_set(entry, now=60), entry['sets'][1])
+
+    def test_entries_are_shared_with_other_processes(self):
+        college = tenancy.default_college()
+        key = featured.cache_key(college.pk)
+        featured.generate(college)
+        run_in_other_process(f'from achievements import featured\nfeatured.invalidate({college.pk})')
+        self.assertIsNone(cache.get(key))
+        run_in_other_process(f'from django.core.cache import cache\ncache.set({key!r}, {{"sets": []}})')
+        self.assertEqual(featured.get(college), {'sets': []})
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex()
+        for value, count in (('Smart India Hackathon', 5), ('Smart Bridge', 2), ('Smash Karts', 1), ('Hack Fest', 3)):
+            for _ in range(count):
+                self.index.add(value)
+
+    def values(self, prefix, limit=10):
+        return [(match['value'], match['count']) for match in self.index.search(prefix, limit)]
+
+    def test_suggestions_are_ranked_by_count(self):
+        self.assertEqual(self.values('sm'), [('Smart India Hackathon', 5), ('Smart Bridge', 2), ('Smash Karts', 1)])
+        self.assertEqual(self.values('SMART  '), [('Smart India Hackathon', 5), ('Smart Bridge', 2)])
+        self.assertEqual(self.values('smart b'), [('Smart Bridge', 2)])
+        self.assertEqual(self.values('sm', limit=1), [('Smart India Hackathon', 5)])
+        self.assertEqual(self.values('s'), [])
+
+    def test_precomputed_lists_follow_removals(self):
+        for _ in range(5):
+            self.index.remove('Smart India Hackathon')
+        self.index.add('Smash Karts')
+        self.assertEqual(self.values('sm'), [('Smart Bridge', 2), ('Smash Karts', 2)])
+        self.assertNotIn('smart india hackathon', self.index.keys)
+
+    def test_short_prefixes_only_keep_the_best_values(self):
+        for i in range(50):
+            self.index.add(f'Smart city {i:02d}')
+        self.assertEqual(len(self.index.top['sm']), 10)
+        self.assertEqual(self.values('sm')[:2], [('Smart India Hackathon', 5), ('Smart Bridge', 2)])
+        self.assertEqual(self.values('smart city 4'), [(f'Smart city {i}', 1) for i in range(40, 50)])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete_index.reset()
+        self.college = tenancy.default_college()
+        self.student = User.objects.create(username='suggest')
+
+    def suggest(self, prefix):
+        response = self.client.get(reverse('autocomplete_api'), {'field': 'event', 'q': prefix})
+        return [match['value'] for match in response.json()['suggestions']]
+
+    def test_changes_made_by_other_processes_are_picked_up(self):
+        self.assertEqual(self.suggest('robo'), [])
+        achievement = Achievement.objects.create(student=self.student, name='Line follower', event='Robo Wars',
+                                                 prize='1st', is_approved=True)
+        # Saved without committing, so only a version bump from elsewhere reveals it
+        self.assertEqual(self.suggest('robo'), [])
+        run_in_other_process(f'from achievements.autocomplete import index\nindex.changed([{self.college.pk}])')
+        self.assertEqual(self.suggest('robo'), ['Robo Wars'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            achievement.delete()
+        self.assertEqual(self.suggest('robo'), [])
+
+
+class TenantIsolationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete_index.reset()
+        duplicate_index.reset()
+        self.first = College.objects.create(name='First College', domain='localhost')
+        self.second = College.objects.create(name='Second College', domain='127.0.0.1')
+        self.achievement = Achievement.objects.create(
+            student=User.objects.create(username='tenant'), college=self.first, name='Line follower',
+            event='Robo Wars', prize='1st', description='Built a robot that follows a line', is_approved=True,
+        )
+
+    def test_suggestions_come_from_the_hosts_college_only(self):
+        for host, expected in (('localhost', ['Robo Wars']), ('127.0.0.1', [])):
+            response = self.client.get(reverse('autocomplete_api'), {'field': 'event', 'q': 'robo'}, HTTP_HOST=host)
+            self.assertEqual([match['value'] for match in response.json()['suggestions']], expected)
+
+    def test_startup_builds_every_colleges_duplicate_index(self):
+        startup.load_duplicate_index()
+        text = ('Line follower', 'Robo Wars', 'Built a robot that follows a line')
+        with self.assertNumQueries(0):
+            self.assertEqual([match[0] for match in duplicate_index.find(*text, college_id=self.first.pk)],
+                             [self.achievement.pk])
+            self.assertEqual(duplicate_index.find(*text, college_id=self.second.pk), [])
+
+    def test_duplicates_are_only_found_within_the_college(self):
+        text = ('Line follower', 'Robo Wars', 'Built a robot that follows a line')
+        self.assertEqual([match[0] for match in duplicate_index.find(*text, college_id=self.first.pk)],
+                         [self.achievement.pk])
+        self.assertEqual(duplicate_index.find(*text, college_id=self.second.pk), [])
+
+
+class DuplicateTests(TestCase):
+    text = ('First prize at Smart India Hackathon', 'Smart India Hackathon 2024',
+            'Our team built a crop disease detection app and won the first prize')
+
+    def setUp(self):
+        cache.clear()
+        duplicate_index.reset()
+        self.student = User.objects.create_user('duplicates', password='secret-pass-123')
+        self.original = Achievement.objects.create(student=self.student, name=self.text[0], event=self.text[1],
+                                                   prize='1st', description=self.text[2])
+
+    def test_near_duplicates_share_most_of_their_signature(self):
+        reworded = (self.text[0], self.text[1], self.text[2] + ' in the final round')
+        unrelated = ('Chess champion', 'State chess open', 'Won all seven rounds')
+        self.assertGreater(similarity(signature(*self.text), signature(*reworded)), 0.6)
+        self.assertLess(similarity(signature(*self.text), signature(*unrelated)), 0.2)
+        self.assertEqual(duplicate_groups([(1, *self.text), (2, *unrelated), (3, *reworded)]), [[1, 3]])
+
+    def test_index_finds_the_students_own_submissions(self):
+        college_id = self.original.college_id
+        self.assertEqual([match[0] for match in duplicate_index.find(*self.text, college_id=college_id)],
+                         [self.original.pk])
+        other = User.objects.create(username='someone-else')
+        self.assertEqual(duplicate_index.find(*self.text, college_id=college_id, student_id=other.pk), [])
+        self.assertEqual(duplicate_index.find(*self.text, college_id=college_id, exclude_id=self.original.pk), [])
+
+    def test_resubmission_is_flagged_until_confirmed(self):
+        self.client.force_login(self.student)
+        data = {'name': self.text[0], 'event': self.text[1], 'prize': '1st', 'competition': 'national',
+                'description': self.text[2]}
+        response = self.client.post(reverse('dashboard'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('looks like a duplicate', response.context['form'].errors['confirm_duplicate'][0])
+        self.assertContains(response, 'name="confirm_duplicate"')
+        self.assertEqual(Achievement.objects.filter(student=self.student).count(), 1)
+
+        response = self.client.post(reverse('dashboard'), {**data, 'confirm_duplicate': 'on'})
+        self.assertRedirects(response, reverse('dashboard'))
+        self.assertEqual(Achievement.objects.filter(student=self.student).count(), 2)
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        student = User.objects.create(username='facets', first_name='Fa', last_name='Cets')
+        for name, competition, day in (
+            ('Robotics', 'national', 5), ('Quiz', 'state', 10), ('Debate', 'state', 20), ('Pending', 'national', 25),
+        ):
+            Achievement.objects.create(student=student, name=name, event='Expo', prize='1st', competition=competition,
+                                       date_achieved=datetime.date(2024, 2, day), is_approved=name != 'Pending')
+        self.pending = Achievement.objects.get(name='Pending')
+
+    def counts(self, **params):
+        facet_list, total = facets.facet_counts(tenancy.default_college(), facets.parse_filters(params))
+        competition = next(facet for facet in facet_list if facet['name'] == 'competition')
+        return {option['value']: option['count'] for option in competition['options']}, total
+
+    def test_a_facet_keeps_counting_its_other_values(self):
+        self.assertEqual(self.counts(competition='state'), ({'national': 1, 'state': 2}, 2))
+        self.assertEqual(self.counts(date_from='2024-02-08'), ({'state': 2}, 2))
+
+    def test_counts_follow_approvals(self):
+        self.assertEqual(self.counts(), ({'national': 1, 'state': 2}, 3))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending.is_approved = True
+            self.pending.save()
+        self.assertEqual(self.counts(), ({'national': 2, 'state': 2}, 4))
+
+    def test_invalid_dates_are_ignored_and_reported(self):
+        filters = facets.parse_filters({'date_from': '2024-02-30', 'date_to': 'soon'})
+        self.assertEqual((filters['date_from'], filters['date_to']), (None, None))
+        self.assertEqual(len(filters['errors']), 2)
+        response = self.client.get(reverse('achievements'), {'date_from': '2024-02-30'})
+        self.assertEqual(response.context['result_count'], 3)
+        self.assertContains(response, '&quot;2024-02-30&quot; is not a valid date and was ignored.')
+
+
+class AchievementApiTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.student = User.objects.create(username='api', first_name='Api', last_name='Student')
+        self.achievement = Achievement.objects.create(
+            student=self.student, name='Robotics champion', event='Robo Wars', prize='1st', is_approved=True,
+            image=SimpleUploadedFile('scan.png', b'', content_type='image/png'),
+        )
+
+    def test_image_is_media_relative_with_a_separate_url(self):
+        [entry] = self.client.get(reverse('achievements_api')).json()
+        self.assertEqual(entry['image'], self.achievement.image.name)
+        self.assertEqual(entry['image_url'], self.achievement.image.url)
+        [entry] = self.client.get(reverse('achievements_api'), {'since': '2000-01-01T00:00:00Z'}).json()['achievements']
+        self.assertEqual((entry['image'], entry['image_url']), (self.achievement.image.name, self.achievement.image.url))
+
+    def test_invalid_sync_positions_are_rejected(self):
+        garbage_cursor = base64.urlsafe_b64encode(b'garbage|5').decode()
+        for params in (
+            {'since': '2024-13-01T00:00:00'}, {'since': 'yesterday'},
+            {'cursor': garbage_cursor}, {'cursor': '%%%'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('achievements_api'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class ModerationBatchTests(TestCase):
+    def setUp(self):
+        student = User.objects.create(username='moderated', first_name='Mo', last_name='Derated')
+        self.first, self.second, self.third = (
+            Achievement.objects.create(student=student, name=name, event='Expo', prize='1st',
+                                       is_approved=name == 'Third')
+            for name in ('First', 'Second', 'Third')
+        )
+        self.client.force_login(User.objects.create(username='moderator', is_staff=True))
+
+    def moderate(self, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('moderation_api'), body, content_type='application/json')
+
+    def test_decisions_are_applied_in_one_batch(self):
+        response = self.moderate({'decisions': [
+            {'decision': 'approve', 'ids': [self.first.pk, self.second.pk, 999999]},
+            {'decision': 'reject', 'ids': [self.third.pk], 'note': 'Certificate is unreadable'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'results': [
+                {'id': self.first.pk, 'status': 'approved'},
+                {'id': self.second.pk, 'status': 'approved'},
+                {'id': 999999, 'status': 'not_found'},
+                {'id': self.third.pk, 'status': 'rejected'},
+            ],
+            'approved': 2,
+            'rejected': 1,
+        })
+        self.assertEqual(
+            set(AchievementCard.objects.values_list('achievement_id', flat=True)), {self.first.pk, self.second.pk}
+        )
+        self.third.refresh_from_db()
+        self.assertEqual((self.third.is_approved, self.third.moderation_note), (False, 'Certificate is unreadable'))
+        self.assertEqual(ChangeEvent.objects.filter(action='approved').count(), 2)
+
+    def test_an_id_under_two_decisions_is_left_alone(self):
+        response = self.moderate({'decisions': [
+            {'decision': 'approve', 'ids': [self.first.pk, self.second.pk]},
+            {'decision': 'reject', 'ids': [self.first.pk]},
+        ]})
+        self.assertEqual(response.json()['results'][0], {'id': self.first.pk, 'status': 'conflict'})
+        self.assertEqual(
+            list(Achievement.objects.filter(is_approved=True).order_by('pk').values_list('pk', flat=True)),
+            [self.second.pk, self.third.pk],
+        )
+
+    @override_settings(MODERATION_BATCH_LIMIT=2)
+    def test_malformed_batches_apply_nothing(self):
+        for body in (
+            {}, {'decisions': []}, {'decisions': [{'decision': 'maybe', 'ids': [self.first.pk]}]},
+            {'decisions': [{'decision': 'approve', 'ids': [str(self.first.pk)]}]},
+            {'decisions': [{'decision': 'approve', 'ids': [True]}]},
+            {'decisions': [{'decision': 'reject', 'ids': [self.first.pk], 'note': 5}]},
+            {'decisions': [{'decision': 'approve', 'ids': [self.first.pk, self.second.pk, self.third.pk]}]},
+        ):
+            with self.subTest(body=body):
+                response = self.moderate(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        response = self.client.post(reverse('moderation_api'), 'not json', content_type='application/json')
+        self.assertEqual(response.json(), {'error': 'Invalid JSON.'})
+        self.assertEqual(Achievement.objects.filter(is_approved=True).count(), 1)
+
+    def test_students_cannot_moderate(self):
+        self.client.force_login(User.objects.get(username='moderated'))
+        self.moderate({'decisions': [{'decision': 'approve', 'ids': [self.first.pk]}]})
+        self.assertFalse(Achievement.objects.get(pk=self.first.pk).is_approved)
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='feed', first_name='Fe', last_name='Ed')
+        self.public = Achievement.objects.create(student=self.student, name='Public', event='Expo', prize='1st',
+                                                 is_approved=True)
+        self.pending = Achievement.objects.create(student=self.student, name='Pending', event='Expo', prize='1st')
+        self.withdrawn = Achievement.objects.create(student=self.student, name='Withdrawn', event='Expo', prize='1st',
+                                                    is_approved=True)
+        self.withdrawn.disapprove()
+
+    def events(self):
+        response = self.client.get(reverse('changes_api'))
+        self.assertEqual(response.status_code, 200)
+        return [(e['entity'], e['entity_id'], e['action']) for e in response.json()['events']]
+
+    def test_anonymous_consumers_only_see_public_achievements(self):
+        pending_id = self.pending.pk
+        self.pending.delete()
+        self.assertEqual(self.events(), [
+            ('achievement', self.public.pk, 'created'),
+            ('achievement', self.withdrawn.pk, 'disapproved'),
+            ('achievement', pending_id, 'deleted'),
+        ])
+
+    def test_staff_see_every_event(self):
+        self.client.force_login(User.objects.create(username='feed-staff', is_staff=True))
+        events = self.events()
+        self.assertIn(('achievement', self.pending.pk, 'created'), events)
+        self.assertIn(('achievement', self.withdrawn.pk, 'created'), events)
+        self.assertTrue(any(entity == 'profile' for entity, _, _ in events))
+
+
+@override_settings(TEMPLATES=[settings.JINJA2_TEMPLATES, *settings.TEMPLATES])
+class JinjaTemplateTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user('jinja', password='secret-pass-123', first_name='Jin', last_name='Ja')
+        self.achievement = Achievement.objects.create(
+            student=self.student, name='Robotics champion', event='Robo Wars', prize='1st', is_approved=True,
+            description=' '.join(f'word{i}' for i in range(40)), date_achieved=datetime.date(2024, 3, 9),
+        )
+
+    def test_filters_match_the_django_filters(self):
+        env = engines['jinja2'].env
+        django_engine = engines['django']
+        context = {'text': 'one two three four', 'day': datetime.date(2024, 3, 9), 'missing': None}
+        for jinja_source, django_source in (
+            ('{{ text|truncatewords(2) }}', '{{ text|truncatewords:2 }}'),
+            ('{{ day|date("M d, Y") }}', '{{ day|date:"M d, Y" }}'),
+            ('{{ missing|date("M d, Y") }}', '{{ missing|date:"M d, Y" }}'),
+        ):
+            self.assertEqual(
+                env.from_string(jinja_source).render(context),
+                django_engine.from_string(django_source).render(context),
+            )
+        self.assertEqual(
+            env.from_string('{{ url("achievement_detail", 5) }} {{ static("app.css") }}').render(),
+            f'{reverse("achievement_detail", args=[5])} {settings.STATIC_URL}app.css',
+        )
+
+    def test_pages_render_from_the_jinja_templates(self):
+        self.client.force_login(self.student)
+        for url in (
+            reverse('home'), reverse('achievements'), reverse('achievement_detail', args=[self.achievement.pk]),
+            reverse('portfolio', args=[self.student.pk]), reverse('dashboard'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Robotics champion')
+                # Django templates report each render to the test client; Jinja2 ones do not
+                self.assertFalse([t.name for t in response.templates if t.name.startswith('achievements/')])
+
+    def test_other_pages_fall_back_to_the_django_templates(self):
+        response = self.client.get(reverse('login'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue([t.name for t in response.templates if t.name.startswith('achievements/')])
+
+
+class SeededDataMixin:
+    """A fixed dataset of `size` students, achievements, messages, events and jobs"""
+    size = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        college = tenancy.default_college()
+        cls.student = User.objects.create(username='budget-student', first_name='Budget', last_name='Student')
+        cls.staff = User.objects.create(username='budget-staff', is_staff=True)
+        cls.superuser = User.objects.create(username='budget-admin', is_staff=True, is_superuser=True)
+        students = [
+            User.objects.create(username=f'student{i}', first_name=f'First{i}', last_name=f'Last{i}')
+            for i in range(cls.size)
+        ]
+        levels = [level for level, _ in Achievement.COMPETITION_LEVELS]
+        achievements = [
+            Achievement(student=user, college=college, name=f'Prize {i}', event='Smart India Hackathon',
+                        prize='1st', competition=levels[i % len(levels)], is_approved=True,
+                        date_achieved=datetime.date(2024, 1 + i % 12, 1 + i % 28))
+            for i, user in enumerate(students)
+        ]
+        achievements += [
+            Achievement(student=cls.student, college=college, name=f'My prize {i}', event='Code Sprint',
+                        prize='2nd', is_approved=i % 2 == 0)
+            for i in range(cls.size)
+        ]
+        Achievement.objects.bulk_create(achievements)
+        rebuild_cards()
+        ContactMessage.objects.bulk_create([
+            ContactMessage(name=f'Visitor {i}', email=f'v{i}@example.com', subject='Hello', message='Hi')
+            for i in range(cls.size)
+        ])
+        ChangeEvent.objects.bulk_create([
+            ChangeEvent(entity='achievement', entity_id=i, action='updated', college=college)
+            for i in range(cls.size)
+        ])
+        Job.objects.bulk_create([Job(task='achievements.jobs.purge_finished') for _ in range(cls.size)])
+        cls.upload = UploadSession.objects.create(
+            user=cls.student, kind='achievement', filename='scan.png', total_size=1024
+        )
+        cls.finished_upload = UploadSession.objects.create(
+            user=cls.student, kind='achievement', filename='scan.png', total_size=len(_png_bytes()),
+            received=len(_png_bytes()),
+        )
+
+    def setUp(self):
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir, ignore_errors=True)
+        settings_override = override_settings(CHUNKED_UPLOAD_TEMP_DIR=upload_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        with open(self.finished_upload.temp_path, 'wb') as f:
+            f.write(_png_bytes())
+        # Process-wide caches start warm, as they are on a running server
+        cache.clear()
+        tenancy.invalidate()
+        tenancy.default_college()
+        autocomplete_index.reset()
+        autocomplete_index.ensure_loaded(tenancy.default_college().pk)
+        duplicate_index.reset()
+        duplicate_index.ensure_loaded(tenancy.default_college().pk)
+        image_hash_index.reset()
+        image_hash_index.ensure_loaded()
+        featured.refresh()
+
+    def client_for(self, role):
+        client = Client()
+        user = {'student': self.student, 'staff': self.staff, 'superuser': self.superuser}.get(role)
+        if user:
+            client.force_login(user)
+        return client
+
+    def route_url(self, pattern):
+        kwargs = {}
+        for name, converter in pattern.pattern.converters.items():
+            if type(converter).__name__ == 'UUIDConverter':
+                kwargs[name] = self.finished_upload.pk if pattern.name == 'upload_complete' else self.upload.pk
+            elif name == 'student_id':
+                kwargs[name] = self.student.pk
+            elif name == 'page':
+                kwargs[name] = 1
+            else:
+                kwargs[name] = Achievement.objects.filter(student=self.student, is_approved=True).order_by(
+                    'pk'
+                ).values_list('pk', flat=True).first()
+        return reverse(pattern.name, kwargs=kwargs)
+
+    def route_data(self, name):
+        """Keyword arguments for the client call that exercises a POST route"""
+        if name == 'contact_submit':
+            return {'data': {'name': 'Visitor', 'email': 'visitor@example.com', 'subject': 'Hi', 'message': 'Hello'}}
+        body = {
+            'upload_create': {'filename': 'scan.png', 'size': 1024, 'kind': 'achievement'},
+            'moderation_api': {'decisions': [{'decision': 'approve', 'ids': [
+                Achievement.objects.filter(student=self.student, is_approved=False).values_list('pk', flat=True)[0]
+            ]}]},
+        }.get(name)
+        return {'data': body, 'content_type': 'application/json'} if body is not None else {}
+
+
+class QueryBudgetMixin(SeededDataMixin):
+    def test_every_route_has_a_budget(self):
+        names = {p.name for p in achievement_urls.urlpatterns if isinstance(p, URLPattern)}
+        self.assertEqual(names - set(ROUTE_BUDGETS), set(), 'Add a query budget for the new route(s)')
+
+    def test_route_query_budgets(self):
+        for pattern in achievement_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or pattern.name not in ROUTE_BUDGETS:
+                continue
+            role, method, status, budget = ROUTE_BUDGETS[pattern.name]
+            with self.subTest(route=pattern.name, size=self.size):
+                url = self.route_url(pattern)
+                client = self.client_for(role)
+                data = self.route_data(pattern.name)
+                with self.assertNumQueries(budget):
+                    response = getattr(client, method)(url, **data)
+                self.assertEqual(response.status_code, status)
+
+    def test_admin_changelist_query_budgets(self):
+        client = self.client_for('superuser')
+        for model, model_admin in admin.site._registry.items():
+            label = model._meta.label
+            with self.subTest(changelist=label, size=self.size):
+                self.assertIn(label, CHANGELIST_BUDGETS, 'Add a query budget for the new changelist')
+                url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+                with mock.patch.object(model_admin, 'list_per_page', self.size):
+                    with self.assertNumQueries(CHANGELIST_BUDGETS[label]):
+                        client.get(url)
+
+
+class QueryBudgetSmallPageTests(QueryBudgetMixin, TestCase):
+    size = 10
+
+
+class QueryBudgetLargePageTests(QueryBudgetMixin, TestCase):
+    size = 500
+
+
+@skipUnless(os.environ.get('RUN_RENDER_TIME_TESTS'), 'Wall-clock timings; set RUN_RENDER_TIME_TESTS=1 to run')
+class RenderTimeTests(SeededDataMixin, TestCase):
+    """
+    Median response time of the main pages against perf_baseline.json. Fails
+    when a page is slower than its baseline by more than the file's tolerance.
+    The baselines only hold on the machine that recorded them, so the tests
+    run only with RUN_RENDER_TIME_TESTS=1. Add UPDATE_PERF_BASELINE=1 to
+    record new baselines.
+    """
+    size = 500
+    runs = 5
+    timed_routes = ('home', 'achievements', 'dashboard', 'profile', 'admin_dashboard', 'achievements_api')
+
+    def median_ms(self, client, url):
+        client.get(url)
+        timings = []
+        for _ in range(self.runs):
+            start = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def test_render_times_within_baseline(self):
+        with open(PERF_BASELINE_FILE) as f:
+            baseline = json.load(f)
+        patterns = {p.name: p for p in achievement_urls.urlpatterns if isinstance(p, URLPattern)}
+        measured = {}
+        for name in self.timed_routes:
+            role = ROUTE_BUDGETS[name][0]
+            measured[name] = round(self.median_ms(self.client_for(role), self.route_url(patterns[name])), 2)
+
+        if os.environ.get('UPDATE_PERF_BASELINE'):
+            baseline['routes'] = measured
+            with open(PERF_BASELINE_FILE, 'w') as f:
+                json.dump(baseline, f, indent=2)
+                f.write('\n')
+            return
+
+        for name, elapsed in measured.items():
+            with self.subTest(route=name):
+                self.assertIn(name, baseline['routes'], 'Record a baseline with UPDATE_PERF_BASELINE=1')
+                limit = baseline['routes'][name] * (1 + baseline['tolerance'])
+                self.assertLessEqual(
+                    elapsed, limit,
+                    f'{name} took {elapsed:.1f} ms, baseline {baseline["routes"][name]:.1f} ms '
+                    f'+{baseline["tolerance"]:.0%}'
+                )
+
+
+# Run in each stress-test process: `threads` threads each sign up `rounds`
+# students, submit an achievement as each one and send a contact message
+STRESS_SCRIPT = """
+import json, secrets, sys, threading, time
+import django
+django.setup()
+from django.test import Client, override_settings
+from achievements import tenancy
+
+threads, rounds = int(sys.argv[1]), int(sys.argv[2])
+department = tenancy.default_department().pk
+
+def work():
+    for _ in range(rounds):
+        token = secrets.token_hex(6)
+        student = Client()
+        student.post('/signup/', {
+            'username': f'u{token}', 'email': f'{token}@example.com', 'first_name': 'Load', 'last_name': 'Test',
+            'roll_number': f'R{token}', 'department': department, 'year': 2025,
+            'password1': 'stress-pass-123!', 'password2': 'stress-pass-123!',
+        })
+        student.post('/dashboard/', {
+            'name': f'Award {secrets.token_hex(8)}', 'event': f'Fest {secrets.token_hex(8)}',
+            'prize': 'First', 'competition': 'college',
+        })
+        Client().post('/contact-submit/', {'name': 'Visitor', 'email': 'v@example.com', 'subject': 'Hi', 'message': 'Hello'})
+
+hashers = ['django.contrib.auth.hashers.MD5PasswordHasher']
+with override_settings(PASSWORD_HASHERS=hashers, ALLOWED_HOSTS=['testserver']):
+    started = time.monotonic()
+    pool = [threading.Thread(target=work) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+print(json.dumps({'elapsed': time.monotonic() - started}))
+"""
+
+
+def record_job_run(number):
+    """Task for JobQueueTests: leaves one row per run behind"""
+    ContactMessage.objects.create(name=f'Job {number}', email='jobs@example.com', subject=str(number), message='run')
+
+
+JOBS_SCRIPT = """
+import sys
+import django
+django.setup()
+from django.core.management import call_command
+from django.test import override_settings
+from achievements import jobs
+
+jobs_count, processes = int(sys.argv[1]), int(sys.argv[2])
+for number in range(jobs_count):
+    jobs.enqueue('achievements.tests.record_job_run', number)
+# No periodic jobs: gc-media would sweep the real MEDIA_ROOT against this empty database
+with override_settings(JOB_SCHEDULE={}):
+    call_command('run_worker', processes=processes, once=True, poll_interval=0.1)
+"""
+
+
+@override_settings(ACHIEVEMENTS_PAGE_SIZE=2)
+class PrerenderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.first = User.objects.create(username='first', first_name='First', last_name='Student')
+        self.second = User.objects.create(username='second', first_name='Second', last_name='Student')
+        self.kept, self.deleted, self.rejected, self.pending = (
+            Achievement.objects.create(student=student, name=name, event='Expo', prize='1st',
+                                       is_approved=name != 'Pending')
+            for student, name in (
+                (self.first, 'Kept'), (self.first, 'Deleted'), (self.second, 'Rejected'), (self.second, 'Pending'),
+            )
+        )
+        [(directory, _, _)] = prerender.sites()
+        self.site_dir = os.path.join(self.root, directory)
+
+    def run_prerender(self, **kwargs):
+        cache.clear()
+        return prerender.prerender(root=self.root, **kwargs)
+
+    def exists(self, name, *args):
+        return os.path.exists(prerender.page_file(self.site_dir, reverse(name, args=args)))
+
+    def test_a_full_render_writes_every_public_page(self):
+        result = self.run_prerender()
+        self.assertEqual(result['mode'], 'full')
+        for name, args in (
+            ('home', ()), ('achievements', ()), ('achievements_page', (2,)),
+            ('achievement_detail', (self.kept.pk,)), ('achievement_detail', (self.rejected.pk,)),
+            ('portfolio', (self.first.pk,)), ('portfolio', (self.second.pk,)),
+        ):
+            self.assertTrue(self.exists(name, *args), (name, args))
+        self.assertFalse(self.exists('achievement_detail', self.pending.pk))
+        with open(prerender.page_file(self.site_dir, reverse('home')), 'rb') as f:
+            self.assertNotIn(b'csrfmiddlewaretoken', f.read())
+        with open(os.path.join(self.site_dir, 'sitemap.xml')) as f:
+            self.assertIn(reverse('achievement_detail', args=[self.kept.pk]), f.read())
+
+    def test_an_incremental_render_only_touches_changed_achievements(self):
+        self.run_prerender()
+        self.assertEqual(self.run_prerender()['rendered'], 3)
+
+        self.pending.approve()
+        result = self.run_prerender()
+        self.assertEqual(result['mode'], 'incremental')
+        # home, two listing pages, the new detail page and its student's portfolio
+        self.assertEqual(result['rendered'], 3 + 1 + 1)
+        self.assertTrue(self.exists('achievement_detail', self.pending.pk))
+
+    def test_pages_that_no_longer_exist_are_removed(self):
+        self.run_prerender()
+        deleted_id = self.deleted.pk
+        self.deleted.delete()
+        self.rejected.disapprove()
+        result = self.run_prerender()
+        self.assertEqual(result['mode'], 'incremental')
+        self.assertFalse(self.exists('achievement_detail', deleted_id))
+        self.assertFalse(self.exists('achievement_detail', self.rejected.pk))
+        self.assertFalse(self.exists('portfolio', self.second.pk))
+        self.assertFalse(self.exists('achievements_page', 2))
+        self.assertTrue(self.exists('achievement_detail', self.kept.pk))
+        self.assertTrue(self.exists('portfolio', self.first.pk))
+        self.assertTrue(self.exists('achievements'))
+
+
+class MediaGCTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.media_root = os.path.join(directory, 'media')
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, CHUNKED_UPLOAD_TEMP_DIR=os.path.join(directory, 'tmp'), MEDIA_GC_GRACE_HOURS=24,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.student = User.objects.create(username='gc')
+        Achievement.objects.create(student=self.student, name='Live', event='Expo', prize='1st',
+                                   image='achievements/user_1/live.png')
+        self.live = self.media_file('achievements/user_1/live.png')
+        self.orphan = self.media_file('achievements/user_1/2020/orphan.png')
+        self.old_avatar = self.media_file('avatars/old.png')
+        self.fresh = self.media_file('achievements/user_1/fresh.png', age_hours=1)
+        self.unmanaged = self.media_file('other/unmanaged.png')
+
+        self.idle = UploadSession.objects.create(user=self.student, kind='achievement', filename='a.png', total_size=9)
+        self.active = UploadSession.objects.create(user=self.student, kind='avatar', filename='b.png', total_size=9)
+        UploadSession.objects.filter(pk=self.idle.pk).update(updated_at=timezone.now() - datetime.timedelta(days=2))
+        self.idle_part = self.write(self.idle.temp_path, age_hours=1)
+        self.active_part = self.write(self.active.temp_path, age_hours=48)
+        self.abandoned_part = self.write(os.path.join(upload_temp_dir(), 'abandoned.part'))
+        self.recent_part = self.write(os.path.join(upload_temp_dir(), 'recent.part'), age_hours=1)
+
+    def write(self, path, age_hours=48):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'data')
+        mtime = time.time() - age_hours * 60 * 60
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def media_file(self, name, age_hours=48):
+        return self.write(os.path.join(self.media_root, *name.split('/')), age_hours)
+
+    def test_only_unreferenced_files_past_the_grace_period_are_removed(self):
+        stats = media_gc.collect()
+        self.assertEqual((stats['media'], stats['uploads'], stats['sessions']), (2, 2, 1))
+        for path in (self.orphan, self.old_avatar, self.idle_part, self.abandoned_part):
+            self.assertFalse(os.path.exists(path), path)
+        for path in (self.live, self.fresh, self.unmanaged, self.active_part, self.recent_part):
+            self.assertTrue(os.path.exists(path), path)
+        self.assertFalse(os.path.exists(os.path.dirname(self.orphan)))
+        self.assertTrue(os.path.isdir(os.path.join(self.media_root, 'avatars')))
+        self.assertEqual(list(UploadSession.objects.values_list('pk', flat=True)), [self.active.pk])
+
+    def test_a_dry_run_only_counts(self):
+        stats = media_gc.collect(dry_run=True)
+        self.assertEqual((stats['media'], stats['uploads'], stats['sessions'], stats['deleted']), (2, 2, 1, 0))
+        self.assertTrue(os.path.exists(self.orphan))
+        self.assertEqual(UploadSession.objects.count(), 2)
+
+    def test_upload_sessions_are_read_in_one_query(self):
+        for name in ('one', 'two', 'three'):
+            self.write(os.path.join(upload_temp_dir(), f'{name}.part'))
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(media_gc.orphaned_uploads(time.time() - 24 * 60 * 60))), 5)
+
+    def test_the_scheduled_run_only_counts(self):
+        entry = settings.JOB_SCHEDULE['gc-media']
+        with self.assertLogs('achievements.media_gc', 'INFO'):
+            stats = import_string(entry['task'])(**entry.get('kwargs', {}))
+        self.assertEqual((stats['media'], stats['deleted']), (2, 0))
+        self.assertTrue(os.path.exists(self.orphan))
+
+    def test_a_shorter_grace_period_takes_younger_files(self):
+        media_gc.collect(grace=0)
+        self.assertFalse(os.path.exists(self.fresh))
+        self.assertFalse(os.path.exists(self.recent_part))
+        self.assertTrue(os.path.exists(self.live))
+
+
+class ContactFormTests(TestCase):
+    data = {'name': 'Visitor', 'email': 'visitor@example.com', 'subject': 'Hi', 'message': 'Hello'}
+
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+
+    def test_a_post_without_a_token_is_refused(self):
+        self.assertEqual(self.client.post(reverse('contact_submit'), self.data).status_code, 403)
+        self.assertFalse(ContactMessage.objects.exists())
+
+    def test_a_static_page_can_fetch_a_token(self):
+        token = self.client.get(reverse('csrf_token_api')).json()['token']
+        response = self.client.post(reverse('contact_submit'), {**self.data, 'csrfmiddlewaretoken': token})
+        self.assertRedirects(response, reverse('home'))
+        self.assertTrue(ContactMessage.objects.filter(email='visitor@example.com').exists())
+
+
+class AnalyzeQueriesTests(TestCase):
+    unindexed = (
+        'SELECT "achievements_contactmessage"."id" FROM "achievements_contactmessage" '
+        'WHERE "achievements_contactmessage"."email" = \'a@example.com\' '
+        'ORDER BY "achievements_contactmessage"."subject" ASC LIMIT 21'
+    )
+
+    def test_literals_are_collapsed(self):
+        self.assertEqual(
+            analyze_queries.normalize("SELECT 1 FROM t WHERE a = 'it''s' AND b IN (1, 2, 3) AND c > 2.5"),
+            'SELECT ? FROM t WHERE a = ? AND b IN (?) AND c > ?',
+        )
+
+    def test_scans_and_sorts_are_flagged(self):
+        _, findings = analyze_queries.explain(self.unindexed)
+        self.assertIn(('full scan', 'achievements_contactmessage'), findings)
+        self.assertIn(('temp b-tree for order by', None), findings)
+
+    def test_proposals_put_equality_before_ordering(self):
+        self.assertEqual(
+            analyze_queries.propose_index(self.unindexed, 'achievements_contactmessage'),
+            (ContactMessage, ['email', 'subject']),
+        )
+        ranged = (
+            'SELECT "achievements_contactmessage"."id" FROM "achievements_contactmessage" '
+            'WHERE ("achievements_contactmessage"."is_read" = 0 AND "achievements_contactmessage"."subject" > \'b\') '
+            'ORDER BY "achievements_contactmessage"."email" DESC'
+        )
+        self.assertEqual(
+            analyze_queries.propose_index(ranged, 'achievements_contactmessage'),
+            (ContactMessage, ['is_read', 'subject']),
+        )
+
+    def test_existing_indexes_are_not_proposed_again(self):
+        sql = (
+            'SELECT "achievements_contactmessage"."id" FROM "achievements_contactmessage" '
+            'ORDER BY "achievements_contactmessage"."created_at" DESC, "achievements_contactmessage"."id" DESC'
+        )
+        self.assertIsNone(analyze_queries.propose_index(sql, 'achievements_contactmessage'))
+        self.assertIsNone(analyze_queries.propose_index(sql, 'no_such_table'))
+
+    def test_the_command_runs_every_route(self):
+        cache.clear()
+        cache.set('analyze-queries-sentinel', 'kept')
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'analyze_queries', '--students', '3', '--achievements-per-student', '2'],
+            cwd=settings.BASE_DIR, env=subprocess_env(), capture_output=True, text=True,
+            check=True,
+        )
+        self.assertIn('Captured', result.stdout)
+        self.assertIn('statements need a full scan or a temporary sort.', result.stdout)
+        self.assertNotIn('Could not EXPLAIN', result.stderr)
+        # The command neither clears nor writes the shared cache
+        self.assertEqual(cache.get('analyze-queries-sentinel'), 'kept')
+        self.assertIsNone(cache.get(featured.cache_key(tenancy.default_college().pk)))
+
+
+class JobQueueTests(TestCase):
+    def test_stale_jobs_are_requeued_until_their_last_attempt(self):
+        long_ago = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        retry, last = [
+            Job.objects.create(task='achievements.tests.record_job_run', args=[0], status='running',
+                               locked_by='gone:1', locked_at=long_ago, attempts=attempts, max_attempts=3)
+            for attempts in (2, 3)
+        ]
+        self.assertEqual(requeue_stale(), (1, 1))
+        retry.refresh_from_db()
+        last.refresh_from_db()
+        self.assertEqual((retry.status, retry.locked_by), ('queued', ''))
+        self.assertEqual(last.status, 'failed')
+        self.assertIsNotNone(last.finished_at)
+
+    def test_a_worker_that_lost_its_claim_does_not_record_an_outcome(self):
+        Job.objects.create(task='achievements.jobs.purge_finished')
+        [slow] = claim('slow:1')
+        # The slow worker overran JOB_TIMEOUT; its job was requeued and claimed by another worker
+        Job.objects.filter(pk=slow.pk).update(locked_at=timezone.now() - datetime.timedelta(days=1))
+        requeue_stale()
+        [fresh] = claim('fresh:1')
+        with self.assertLogs('achievements.jobs', 'WARNING'):
+            self.assertEqual(execute(slow), 'lost')
+        job = Job.objects.get(pk=slow.pk)
+        self.assertEqual((job.status, job.locked_by), ('running', 'fresh:1'))
+        self.assertEqual(execute(fresh), 'done')
+        self.assertEqual(Job.objects.get(pk=slow.pk).status, 'done')
+
+    def test_enqueue_once_skips_a_call_that_is_already_waiting(self):
+        first = enqueue_once(featured.refresh, 1)
+        self.assertIsNone(enqueue_once(featured.refresh, 1))
+        self.assertIsNotNone(enqueue_once(featured.refresh, 2))
+        # Once it has started, it may have missed the latest change, so another run is queued
+        Job.objects.filter(pk=first.pk).update(status='running')
+        self.assertIsNotNone(enqueue_once(featured.refresh, 1))
+        self.assertEqual(Job.objects.filter(task='achievements.featured.refresh', status='queued').count(), 2)
+
+
+class JobWorkerTests(SimpleTestCase):
+    """run_worker processes sharing one file database"""
+    jobs = 300
+    processes = 4
+
+    def test_every_job_runs_exactly_once(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'jobs.sqlite3')
+        env = subprocess_env(SQLITE_PATH=path, CACHE_DIR=os.path.join(directory, 'cache'))
+        for command in (
+            ['manage.py', 'migrate', '-v0'],
+            ['-c', JOBS_SCRIPT, str(self.jobs), str(self.processes)],
+        ):
+            subprocess.run([sys.executable, *command], cwd=settings.BASE_DIR, env=env, check=True,
+                           capture_output=True)
+
+        with sqlite3.connect(path) as db:
+            jobs = db.execute(
+                'SELECT status, attempts, COUNT(*) FROM achievements_job GROUP BY 1, 2'
+            ).fetchall()
+            runs = db.execute('SELECT COUNT(*), COUNT(DISTINCT subject) FROM achievements_contactmessage').fetchone()
+        self.assertEqual(jobs, [('done', 1, self.jobs)])
+        self.assertEqual(runs, (self.jobs, self.jobs))
+
+
+class SQLiteConcurrencyTests(SimpleTestCase):
+    """Concurrent writers against a file database with the production SQLite profile"""
+    processes = 2
+    threads = 4
+    rounds = 10
+    # Signups, achievement submissions and contact messages per second, over all processes
+    target_write_rate = 30
+
+    def test_concurrent_writes_are_never_lost_to_locking(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'stress.sqlite3')
+        env = subprocess_env(SQLITE_PATH=path, CACHE_DIR=os.path.join(directory, 'cache'))
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '-v0'], cwd=settings.BASE_DIR, env=env, check=True,
+            stderr=subprocess.DEVNULL,
+        )
+
+        workers = [
+            subprocess.Popen(
+                [sys.executable, '-c', STRESS_SCRIPT, str(self.threads), str(self.rounds)],
+                cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for _ in range(self.processes)
+        ]
+        elapsed = 0
+        for worker in workers:
+            stdout, stderr = worker.communicate()
+            self.assertEqual(worker.returncode, 0, stderr)
+            elapsed = max(elapsed, json.loads(stdout.splitlines()[-1])['elapsed'])
+
+        # The views report a failed write as a message, so lost writes show up as missing rows
+        expected = self.processes * self.threads * self.rounds
+        with sqlite3.connect(path) as db:
+            counts = {
+                table: db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('auth_user', 'achievements_achievement', 'achievements_contactmessage')
+            }
+            journal_mode = db.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(counts, dict.fromkeys(counts, expected))
+        self.assertEqual(journal_mode, 'wal')
+        self.assertGreaterEqual(3 * expected / elapsed, self.target_write_rate)
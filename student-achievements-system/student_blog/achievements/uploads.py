@@ -0,0 +1,219 @@
+"""
+Bounded-memory handling of certificate and avatar uploads.
+
+Large scans are sent in chunks to a resumable upload session instead of one
+multipart request. Each chunk is streamed from the request straight into a
+temporary file, so a worker never holds more than CHUNK_READ_SIZE bytes of an
+upload in memory. Every chunk and the final size are checked against hard
+caps. When the upload is complete, only the image header is parsed to check
+the format and dimensions. The finished file is then moved into its final
+storage location with a rename, never copied.
+
+A user can only hold MAX_OPEN_UPLOADS_PER_USER unattached sessions and
+MAX_UPLOAD_TEMP_BYTES_PER_USER bytes of declared upload size at a time, so
+one account cannot fill the temporary directory.
+
+The regular multipart form path gets the same caps through
+SizeLimitedUploadHandler and the same header-only check through
+probe_image().
+"""
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+CHUNK_READ_SIZE = 64 * 1024
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+
+def max_upload_size():
+    return getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', 5 * 1024 * 1024)
+
+
+def max_image_pixels():
+    return getattr(settings, 'MAX_IMAGE_PIXELS', 40_000_000)
+
+
+def max_open_uploads():
+    return getattr(settings, 'MAX_OPEN_UPLOADS_PER_USER', 5)
+
+
+def max_upload_temp_bytes():
+    return getattr(settings, 'MAX_UPLOAD_TEMP_BYTES_PER_USER', 4 * max_upload_size())
+
+
+def upload_temp_dir():
+    path = getattr(settings, 'CHUNKED_UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'upload_tmp'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def probe_image(fileobj):
+    """
+    Validate an image from its header alone. PIL's Image.open only parses the
+    header until pixel data is requested, so a huge scan is never decoded.
+    Returns (format, width, height) or raises ValidationError.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    position = fileobj.tell() if hasattr(fileobj, 'tell') else None
+    try:
+        with Image.open(fileobj) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('Upload a valid image. The file is either not an image or is corrupted.')
+    finally:
+        if position is not None:
+            fileobj.seek(position)
+
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError(f'{image_format} images are not supported. Use JPG, PNG, GIF or WEBP.')
+    if width * height > max_image_pixels():
+        raise ValidationError(f'Image dimensions {width}x{height} are too large.')
+    return image_format, width, height
+
+
+class SizeLimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream multipart uploads to a temporary file and stop writing once
+    MAX_IMAGE_UPLOAD_SIZE is exceeded. The file still reports its full size,
+    so form validation rejects it with a normal error message.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.too_large:
+            return None
+        if start + len(raw_data) > max_upload_size():
+            self.too_large = True
+            self.file.seek(0)
+            self.file.truncate()
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+
+class UploadError(Exception):
+    """A chunk or completion request was rejected; the message is safe to show"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def check_upload_quota(user, total_size):
+    """Raise UploadError if starting another upload of total_size would exceed the user's caps"""
+    pending = user.upload_sessions.exclude(status='attached').aggregate(
+        count=Count('id'), size=Sum('total_size'),
+    )
+    if pending['count'] >= max_open_uploads():
+        raise UploadError('Too many unfinished uploads. Finish or cancel one first.', status=429)
+    if (pending['size'] or 0) + total_size > max_upload_temp_bytes():
+        raise UploadError('Your unfinished uploads use too much space. Finish or cancel one first.', status=429)
+
+
+def _move_received(session, expected, received):
+    """Set session.received only if it still equals expected; returns whether it did"""
+    return bool(type(session).objects.filter(id=session.id, status='open', received=expected).update(
+        received=received, updated_at=timezone.now(),
+    ))
+
+
+def write_chunk(session, stream, offset, length):
+    """
+    Append `length` bytes from `stream` at `offset`. The offset must match what
+    has already been received, which makes a retried chunk after a dropped
+    connection safe: the client asks for the current offset and resumes there.
+
+    The chunk's range is claimed with a conditional UPDATE before any byte is
+    written, so of two requests sent for the same offset only one writes; the
+    other gets the 409 a stale offset gets.
+    """
+    if session.status != 'open':
+        raise UploadError('This upload is no longer accepting data.', status=409)
+    if offset != session.received:
+        raise UploadError(f'Expected offset {session.received}.', status=409)
+    if length <= 0 or length > getattr(settings, 'UPLOAD_CHUNK_SIZE', 1024 * 1024):
+        raise UploadError('Chunk size is out of range.', status=413)
+    if session.received + length > session.total_size:
+        raise UploadError('Chunk goes past the declared file size.', status=413)
+
+    end = offset + length
+    if not _move_received(session, offset, end):
+        session.refresh_from_db(fields=['status', 'received'])
+        raise UploadError(f'Expected offset {session.received}.', status=409)
+    if os.path.getsize(session.temp_path) != offset:
+        # The previous chunk's request has claimed its range but is still writing it
+        _move_received(session, end, offset)
+        raise UploadError('The previous chunk is still being written.', status=409)
+
+    written = 0
+    with open(session.temp_path, 'ab') as destination:
+        while written < length:
+            data = stream.read(min(CHUNK_READ_SIZE, length - written))
+            if not data:
+                break
+            destination.write(data)
+            written += len(data)
+
+    session.received = offset + written
+    if written != length:
+        # Hand back the part of the range that never arrived, so the client resumes there
+        _move_received(session, end, session.received)
+        raise UploadError('Connection ended before the chunk was complete.', status=400)
+    return session.received
+
+
+def complete_upload(session):
+    """Check the finished file's size and image header, then mark the session complete"""
+    if session.status != 'open':
+        raise UploadError('This upload has already been completed.', status=409)
+    if session.received != session.total_size or os.path.getsize(session.temp_path) != session.total_size:
+        raise UploadError('The upload is not finished yet.', status=409)
+    with open(session.temp_path, 'rb') as fileobj:
+        try:
+            probe_image(fileobj)
+        except ValidationError as e:
+            session.discard()
+            raise UploadError(e.messages[0], status=415)
+    session.status = 'complete'
+    session.save(update_fields=['status', 'updated_at'])
+
+
+class _FinishedUpload(File):
+    # FileSystemStorage moves files that expose a temporary path instead of copying them
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def move_upload(session, instance, field_name):
+    """Move a completed upload into `instance.<field_name>` through its upload_to path"""
+    with open(session.temp_path, 'rb') as fileobj:
+        getattr(instance, field_name).save(session.filename, _FinishedUpload(fileobj), save=False)
+
+
+def mark_attached(session):
+    session.status = 'attached'
+    session.save(update_fields=['status', 'updated_at'])
+
+
+def attach_upload(session, instance, field_name):
+    move_upload(session, instance, field_name)
+    mark_attached(session)
+
+
+def store_files(instance):
+    """
+    Write the instance's newly assigned files to storage now, as save() would.
+    Lets the caller keep file I/O out of a later, shorter database write.
+    """
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            field.pre_save(instance, instance._state.adding)
@@ -4,6 +4,9 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('achievements/', views.achievements, name='achievements'),
+    path('achievements/page/<int:page>/', views.achievements, name='achievements_page'),
+    path('achievements/<int:achievement_id>/', views.achievement_detail, name='achievement_detail'),
+    path('students/<int:student_id>/', views.portfolio, name='portfolio'),
     path('signup/', views.signup, name='signup'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
@@ -11,11 +14,18 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
     path('delete-achievement/<int:achievement_id>/', views.delete_achievement, name='delete_achievement'),
     path('contact-submit/', views.contact_submit, name='contact_submit'),
+    path('api/csrf/', views.csrf_token_api, name='csrf_token_api'),
     path('api/achievements/', views.get_achievements_api, name='achievements_api'),
+    path('api/changes/', views.changes_api, name='changes_api'),
+    path('api/autocomplete/', views.autocomplete_api, name='autocomplete_api'),
+    path('api/uploads/', views.upload_create, name='upload_create'),
+    path('api/uploads/<uuid:upload_id>/', views.upload_detail, name='upload_detail'),
+    path('api/uploads/<uuid:upload_id>/complete/', views.upload_complete, name='upload_complete'),
     
     # Staff routes
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('register-staff/', views.register_staff, name='register_staff'),
+    path('api/moderation/', views.moderation_api, name='moderation_api'),
 ]
 
 # Error handlers
@@ -0,0 +1,114 @@
+"""
+The signed-in student's profile and achievement counters.
+
+The navbar, dashboard and profile page all show the same numbers: how many
+achievements the student has submitted, how many are approved and how many
+are pending. UserSummary loads them once per request, so a page that shows
+them in several places still runs each query at most once:
+
+- `profile` is the StudentProfile with its department, in one query.
+- `achievements` is the student's full list, newest first. Only the dashboard
+  reads it.
+- `total`, `approved` and `pending` are also kept in the session, so most
+  pages do not query for them at all. They are first counted at login, when
+  the session is written anyway.
+
+The session copy is stored with the student's summary version. Saving or
+deleting one of the student's achievements, or approving it in bulk, bumps
+that version in the shared cache, whichever process made the change. The
+next request, in any process, then sees a different version and recounts. When the achievement list is already loaded,
+the counts come from the list with no extra query.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.functional import cached_property
+
+SESSION_KEY = '_user_summary'
+
+
+def _version_key(user_id):
+    return f'user_summary:{user_id}:version'
+
+
+def version(user_id):
+    # Seeded with the clock rather than 1, so a cleared cache never matches an old session copy
+    return cache.get_or_set(_version_key(user_id), time.time_ns, None)
+
+
+def bump_version(user_id):
+    """Make every session holding this student's counters recount them"""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def bump_versions(user_ids):
+    for user_id in set(user_ids):
+        bump_version(user_id)
+
+
+class UserSummary:
+    def __init__(self, request, user=None):
+        self.request = request
+        self.user = user or request.user
+
+    @cached_property
+    def profile(self):
+        from .models import StudentProfile
+
+        profile = StudentProfile.objects.select_related('department').filter(user=self.user).first()
+        if profile is not None:
+            profile.user = self.user
+        return profile
+
+    @cached_property
+    def achievements(self):
+        from .models import Achievement
+
+        return list(Achievement.objects.filter(student=self.user).order_by('-created_at'))
+
+    @cached_property
+    def counters(self):
+        current = version(self.user.pk)
+        stored = self.request.session.get(SESSION_KEY)
+        if stored and stored.get('version') == current and 'achievements' not in self.__dict__:
+            return stored
+
+        if 'achievements' in self.__dict__:
+            total = len(self.achievements)
+            approved = sum(1 for achievement in self.achievements if achievement.is_approved)
+        else:
+            from .models import Achievement
+
+            counts = Achievement.objects.filter(student=self.user).aggregate(
+                total=Count('id'), approved=Count('id', filter=Q(is_approved=True))
+            )
+            total, approved = counts['total'], counts['approved']
+
+        counters = {'version': current, 'total': total, 'approved': approved, 'pending': total - approved}
+        if counters != stored:
+            self.request.session[SESSION_KEY] = counters
+        return counters
+
+    @property
+    def total(self):
+        return self.counters['total']
+
+    @property
+    def approved(self):
+        return self.counters['approved']
+
+    @property
+    def pending(self):
+        return self.counters['pending']
+
+
+def get_summary(request):
+    """The request's UserSummary, created on first use"""
+    summary = getattr(request, '_user_summary', None)
+    if summary is None or summary.user is not request.user:
+        summary = request._user_summary = UserSummary(request)
+    return summary
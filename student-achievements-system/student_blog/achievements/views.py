@@ -1,20 +1,41 @@
+import json
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseForbidden
-from django.db.models import Q
-from .models import Achievement, StudentProfile, ContactMessage
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404, JsonResponse, HttpResponseForbidden
+from django.urls import reverse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import ensure_csrf_cookie
+from .models import Achievement, AchievementCard, ChangeEvent, ContactMessage, UploadSession
 from .forms import AchievementForm, UserRegistrationForm, ProfileForm
 from .admin_auth import staff_required, superuser_required
+from . import changes, facets, featured, moderation, sync
+from .autocomplete import index as autocomplete_index
+from .jobs import enqueue
+from .notifications import send_contact_acknowledgement
+from .sqlite import run_write
+from .tenancy import scope
+from .uploads import (
+    UploadError, attach_upload, check_upload_quota, complete_upload, mark_attached, max_upload_size, move_upload,
+    store_files, write_chunk,
+)
+from .user_summary import get_summary
 
 def home(request):
     """Home page with featured achievements"""
     try:
-        featured_achievements = Achievement.objects.filter(is_approved=True).order_by('-created_at')[:6]
-        total_achievements = Achievement.objects.filter(is_approved=True).count()
-        total_students = User.objects.filter(is_staff=False).count()
+        # Precomputed by achievements.featured: one cache read, no queries
+        entry = featured.get(request.college)
+        featured_achievements = featured.current_set(entry)
+        total_achievements = entry['total_achievements']
+        total_students = entry['total_students']
     except Exception as e:
         featured_achievements = []
         total_achievements = 0
@@ -27,36 +48,79 @@ def home(request):
     }
     return render(request, 'achievements/home.html', context)
 
-def achievements(request):
-    """All achievements page"""
-    search_query = request.GET.get('search', '')
+def _listing_page_url(number, querystring):
+    url = reverse('achievements') if number == 1 else reverse('achievements_page', args=[number])
+    return f'{url}?{querystring}' if querystring else url
+
+def achievements(request, page=None):
+    """All achievements page with faceted filters, paginated"""
+    filters = facets.parse_filters(request.GET)
     
     try:
-        all_achievements = Achievement.objects.filter(is_approved=True).order_by('-created_at')
-        
-        if search_query:
-            all_achievements = all_achievements.filter(
-                Q(name__icontains=search_query) |
-                Q(event__icontains=search_query) |
-                Q(competition__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
+        all_achievements = facets.filter_cards(request.college, filters)
+        facet_list, result_count = facets.facet_counts(request.college, filters)
     except Exception as e:
         all_achievements = []
+        facet_list, result_count = [], 0
     
+    paginator = Paginator(all_achievements, getattr(settings, 'ACHIEVEMENTS_PAGE_SIZE', 24))
+    # facet_counts has already counted the matching cards
+    paginator.count = result_count
+    try:
+        page_obj = paginator.page(page or request.GET.get('page') or 1)
+    except InvalidPage:
+        raise Http404('No such page.')
+    
+    query = request.GET.copy()
+    query.pop('page', None)
+    querystring = query.urlencode()
     context = {
-        'achievements': all_achievements,
-        'search_query': search_query,
+        'achievements': page_obj.object_list,
+        'page_obj': page_obj,
+        'previous_page_url': _listing_page_url(page_obj.number - 1, querystring) if page_obj.has_previous() else None,
+        'next_page_url': _listing_page_url(page_obj.number + 1, querystring) if page_obj.has_next() else None,
+        'search_query': filters['search'],
+        'filters': filters,
+        'facets': facet_list,
+        'result_count': result_count,
     }
     return render(request, 'achievements/achievements.html', context)
 
+def achievement_detail(request, achievement_id):
+    """Public page of one approved achievement"""
+    cards = scope(AchievementCard.objects.all(), request.college)
+    achievement = get_object_or_404(cards, achievement_id=achievement_id)
+    context = {
+        'achievement': achievement,
+        'more_achievements': cards.filter(student_id=achievement.student_id).exclude(
+            achievement_id=achievement_id
+        )[:3],
+    }
+    return render(request, 'achievements/achievement_detail.html', context)
+
+def portfolio(request, student_id):
+    """Public portfolio: every approved achievement of one student"""
+    cards = list(scope(AchievementCard.objects.filter(student_id=student_id), request.college))
+    if not cards:
+        raise Http404('This student has no public achievements.')
+    
+    context = {
+        # Name, department and year are the same on every card of a student
+        'student': cards[0],
+        'achievements': cards,
+        'competitions': sorted({card.competition_label for card in cards if card.competition}),
+    }
+    return render(request, 'achievements/portfolio.html', context)
+
 def signup(request):
     """Student registration - only creates student accounts"""
     if request.method == 'POST':
-        form = UserRegistrationForm(request.POST)
+        form = UserRegistrationForm(request.POST, college=request.college)
         if form.is_valid():
             try:
-                user = form.save()
+                # Hash the password here; only the inserts wait in the write queue
+                user = form.save(commit=False)
+                run_write(form.save_student, user)
                 
                 # Auto login after signup
                 login(request, user)
@@ -68,7 +132,7 @@ def signup(request):
         else:
             messages.error(request, '❌ Please correct the errors below.')
     else:
-        form = UserRegistrationForm()
+        form = UserRegistrationForm(college=request.college)
     
     return render(request, 'achievements/signup.html', {'form': form})
 
@@ -105,24 +169,30 @@ def dashboard(request):
     student_achievements = []
     profile = None
     approved_count = 0
-    form = AchievementForm()
+    form = AchievementForm(student=request.user, college=request.college)
+    summary = get_summary(request)
     
     try:
-        # Get user achievements and profile
-        student_achievements = Achievement.objects.filter(student=request.user).order_by('-created_at')
-        profile = getattr(request.user, 'studentprofile', None)
-        approved_count = Achievement.objects.filter(student=request.user, is_approved=True).count()
+        # One query each for the list and the profile; the counts come from the list
+        student_achievements = summary.achievements
+        profile = summary.profile
+        approved_count = summary.approved
     except Exception as e:
         print(f"Error loading dashboard data: {e}")
     
     # Handle form submission
     if request.method == 'POST':
-        form = AchievementForm(request.POST, request.FILES)
+        form = AchievementForm(request.POST, request.FILES, student=request.user, college=request.college)
         if form.is_valid():
             try:
                 achievement = form.save(commit=False)
                 achievement.student = request.user
-                achievement.save()
+                # The image is written here, so the writer thread only holds the write lock for the INSERT
+                if form.upload:
+                    move_upload(form.upload, achievement, 'image')
+                else:
+                    store_files(achievement)
+                run_write(_save_achievement, achievement, form.upload)
                 messages.success(request, '🎉 Achievement submitted for approval!')
                 return redirect('dashboard')
             except Exception as e:
@@ -138,23 +208,35 @@ def dashboard(request):
     }
     return render(request, 'achievements/dashboard.html', context)
 
+def _save_achievement(achievement, upload):
+    achievement.save()
+    if upload:
+        mark_attached(upload)
+    return achievement
+
 @login_required
 def profile(request):
     """Student profile page - accessible to all authenticated users"""
+    summary = get_summary(request)
     try:
-        profile = get_object_or_404(StudentProfile, user=request.user)
-        total_achievements = Achievement.objects.filter(student=request.user).count()
-        approved_achievements = Achievement.objects.filter(student=request.user, is_approved=True).count()
+        profile = summary.profile
+        total_achievements = summary.total
+        approved_achievements = summary.approved
+        recent_achievements = list(Achievement.objects.filter(student=request.user).order_by('-created_at')[:4])
     except Exception as e:
         profile = None
         total_achievements = 0
         approved_achievements = 0
+        recent_achievements = []
     
     if request.method == 'POST':
-        form = ProfileForm(request.POST, request.FILES, instance=profile)
+        form = ProfileForm(request.POST, request.FILES, instance=profile, college=request.college)
         if form.is_valid():
             try:
-                form.save()
+                profile = form.save(commit=False)
+                if form.upload:
+                    attach_upload(form.upload, profile, 'avatar')
+                profile.save()
                 messages.success(request, '✅ Profile updated successfully!')
                 return redirect('profile')
             except Exception as e:
@@ -162,13 +244,14 @@ def profile(request):
         else:
             messages.error(request, '❌ Please correct the errors below.')
     else:
-        form = ProfileForm(instance=profile)
+        form = ProfileForm(instance=profile, college=request.college)
     
     context = {
         'profile': profile,
         'form': form,
         'total_achievements': total_achievements,
-        'approved_achievements': approved_achievements
+        'approved_achievements': approved_achievements,
+        'recent_achievements': recent_achievements
     }
     return render(request, 'achievements/profile.html', context)
 
@@ -205,11 +288,29 @@ def admin_dashboard(request):
     }
     return render(request, 'achievements/admin_dashboard.html', context)
 
+@staff_required
+def moderation_api(request):
+    """Approve or reject batches of achievements; see achievements.moderation"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required.'}, status=405)
+    try:
+        batch = moderation.parse_batch(json.loads(request.body or b'{}'))
+    except ValueError as e:
+        message = str(e) if isinstance(e, moderation.ModerationError) else 'Invalid JSON.'
+        return JsonResponse({'error': message}, status=400)
+    
+    results = moderation.apply_batch(batch)
+    return JsonResponse({
+        'results': results,
+        'approved': sum(1 for r in results if r['status'] == 'approved'),
+        'rejected': sum(1 for r in results if r['status'] == 'rejected'),
+    })
+
 @superuser_required
 def register_staff(request):
     """Superuser-only staff registration"""
     if request.method == 'POST':
-        form = UserRegistrationForm(request.POST)
+        form = UserRegistrationForm(request.POST, college=request.college)
         if form.is_valid():
             try:
                 user = form.save(commit=False)
@@ -227,7 +328,7 @@ def register_staff(request):
             except Exception as e:
                 messages.error(request, f'❌ Error creating staff member: {str(e)}')
     else:
-        form = UserRegistrationForm()
+        form = UserRegistrationForm(college=request.college)
     
     return render(request, 'achievements/register_staff.html', {'form': form})
 
@@ -255,13 +356,8 @@ def contact_submit(request):
             subject = request.POST.get('subject')
             message = request.POST.get('message')
             
-            # Save to database
-            ContactMessage.objects.create(
-                name=name,
-                email=email,
-                subject=subject,
-                message=message
-            )
+            # Save to database and queue the acknowledgement email
+            run_write(_save_contact_message, name, email, subject, message)
             
             messages.success(request, '📧 Thank you for your message! We will get back to you soon.')
         except Exception as e:
@@ -269,16 +365,153 @@ def contact_submit(request):
     
     return redirect('home')
 
+@never_cache
+@ensure_csrf_cookie
+def csrf_token_api(request):
+    """A CSRF token for forms on pre-rendered pages, which cannot carry one of their own"""
+    return JsonResponse({'token': get_token(request)})
+
+def _save_contact_message(name, email, subject, message):
+    contact = ContactMessage.objects.create(
+        name=name,
+        email=email,
+        subject=subject,
+        message=message
+    )
+    enqueue(send_contact_acknowledgement, contact.pk)
+    return contact
+
 def get_achievements_api(request):
-    """API endpoint for achievements"""
+    """API endpoint for achievements; ?since= or ?cursor= returns only changes"""
+    if 'since' in request.GET or 'cursor' in request.GET:
+        return _achievement_changes(request)
     try:
-        achievements = Achievement.objects.filter(is_approved=True).values(
-            'id', 'name', 'event', 'prize', 'competition', 'image', 'description'
+        achievements = scope(AchievementCard.objects.all(), request.college).order_by('-created_at').values(
+            'achievement_id', 'name', 'event', 'prize', 'competition', 'image', 'image_url', 'description',
+            'student_name', 'roll_number', 'department', 'date_achieved'
         )
-        return JsonResponse(list(achievements), safe=False)
+        return JsonResponse([{'id': a.pop('achievement_id'), **a} for a in achievements], safe=False)
     except Exception as e:
         return JsonResponse([], safe=False)
 
+def _achievement_changes(request):
+    try:
+        if 'cursor' in request.GET:
+            position = sync.decode_cursor(request.GET['cursor'])
+        else:
+            position = sync.parse_since(request.GET['since'])
+    except sync.InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    achievements, deleted, cursor, has_more = sync.changes_since(position, request.college)
+    return JsonResponse({
+        'achievements': achievements,
+        'deleted': deleted,
+        'cursor': cursor,
+        'has_more': has_more,
+    })
+
+def changes_api(request):
+    """Change feed: events after the `after` cursor, oldest first; non-staff only see public ones"""
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 1000)
+    except ValueError:
+        return JsonResponse({'error': 'after and limit must be integers.'}, status=400)
+    
+    events = scope(ChangeEvent.objects.filter(id__gt=after), request.college)
+    if not request.user.is_staff:
+        events = changes.public_events(events)
+    events = list(
+        events.order_by('id')
+        .values('id', 'entity', 'entity_id', 'action', 'created_at')[:limit + 1]
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+    return JsonResponse({
+        'events': events,
+        'next': events[-1]['id'] if events else after,
+        'has_more': has_more,
+    })
+
+@login_required
+def upload_create(request):
+    """Start a resumable chunked upload for an achievement image or avatar"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required.'}, status=405)
+    try:
+        data = json.loads(request.body or b'{}')
+        filename = os.path.basename(str(data.get('filename', '')))[:255]
+        total_size = int(data.get('size', 0))
+        kind = data.get('kind')
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid upload request.'}, status=400)
+    
+    if kind not in dict(UploadSession.KINDS) or not filename:
+        return JsonResponse({'error': 'Invalid upload request.'}, status=400)
+    if total_size <= 0 or total_size > max_upload_size():
+        return JsonResponse({'error': f'Files must be smaller than {max_upload_size()} bytes.'}, status=413)
+    try:
+        check_upload_quota(request.user, total_size)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    
+    upload = UploadSession.objects.create(user=request.user, kind=kind, filename=filename, total_size=total_size)
+    open(upload.temp_path, 'wb').close()
+    return JsonResponse(_upload_state(upload), status=201)
+
+@login_required
+def upload_detail(request, upload_id):
+    """GET the resume offset, PUT the next chunk (Upload-Offset header), DELETE to abort"""
+    upload = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+    try:
+        if request.method == 'PUT':
+            offset = int(request.headers.get('Upload-Offset', '-1'))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            # Read the raw stream; request.body would buffer the whole chunk
+            write_chunk(upload, request, offset, length)
+        elif request.method == 'DELETE':
+            upload.discard()
+            return JsonResponse({'id': str(upload_id), 'status': 'aborted'})
+        elif request.method != 'GET':
+            return JsonResponse({'error': 'Method not allowed.'}, status=405)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid Upload-Offset header.'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e), **_upload_state(upload)}, status=e.status)
+    return JsonResponse(_upload_state(upload))
+
+@login_required
+def upload_complete(request, upload_id):
+    """Validate the finished upload so it can be attached by a form submission"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required.'}, status=405)
+    upload = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+    try:
+        complete_upload(upload)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_state(upload))
+
+def _upload_state(upload):
+    return {
+        'id': str(upload.id),
+        'offset': upload.received,
+        'size': upload.total_size,
+        'status': upload.status,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+    }
+
+def autocomplete_api(request):
+    """Prefix suggestions for event and achievement names, served from memory"""
+    field = request.GET.get('field', 'event')
+    query = request.GET.get('q', '')
+    try:
+        suggestions = autocomplete_index.suggest(field, query, request.college.pk if request.college else None)
+    except Exception as e:
+        suggestions = []
+    return JsonResponse({'field': field, 'query': query, 'suggestions': suggestions})
+
 # Error handlers
 def handler404(request, exception):
     return render(request, '404.html', status=404)
@@ -33,6 +33,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'achievements.tenancy.TenantMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -55,20 +56,67 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'achievements.context_processors.global_context',
             ],
         },
     },
 ]
 
+# Optional Jinja2 backend (requires the Jinja2 package). It provides the public
+# and dashboard pages from achievements/jinja2/ and falls back to the Django
+# templates for every other page. Enable with USE_JINJA2_TEMPLATES=1.
+JINJA2_TEMPLATES = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [],
+    'APP_DIRS': True,
+    'OPTIONS': {
+        'environment': 'achievements.jinja2_env.environment',
+        'context_processors': [
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+            'achievements.context_processors.global_context',
+        ],
+    },
+}
+
+if os.environ.get('USE_JINJA2_TEMPLATES') == '1':
+    TEMPLATES.insert(0, JINJA2_TEMPLATES)
+
 WSGI_APPLICATION = 'student_blog.wsgi.application'
 
-# Database
+# student_blog/wsgi.py and asgi.py warm up URLs, templates, lookup tables and
+# the duplicate and image-hash indexes before serving (see achievements.startup). STARTUP_WARM_UP=0 skips it.
+STARTUP_WARM_UP = os.environ.get('STARTUP_WARM_UP', '1') == '1'
+
+# Database. SQLite with the production profile from achievements.sqlite:
+# transactions take the write lock up front and wait up to `timeout` seconds
+# for it, connections stay open between requests, and SQLITE_PRAGMAS is
+# applied to each new connection. SQLITE_PATH moves the database file.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': 'achievements.sqlite_backend',
+        'NAME': os.environ.get('SQLITE_PATH') or BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,  # KiB, i.e. 32 MB per connection
+    'temp_store': 'memory',
+}
+# Short writes from signup, the dashboard and the contact form go through one
+# writer thread per process (achievements.sqlite.run_write)
+SQLITE_WRITE_QUEUE = True
+SQLITE_WRITE_BATCH_SIZE = 50
+SQLITE_WRITE_TIMEOUT = 30  # seconds a request waits for its queued write
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,6 +153,98 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # Media files (Uploaded by users)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Upload limits. Multipart uploads stream to disk and are capped; large scans
+# can use the resumable chunked upload API under /api/uploads/.
+MAX_IMAGE_UPLOAD_SIZE = 5 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40_000_000
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+CHUNKED_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'upload_tmp')
+# Per user: unattached chunked upload sessions, and the sum of their sizes
+MAX_OPEN_UPLOADS_PER_USER = 5
+MAX_UPLOAD_TEMP_BYTES_PER_USER = 4 * MAX_IMAGE_UPLOAD_SIZE
+# manage.py gc_media leaves files modified within this many hours alone
+MEDIA_GC_GRACE_HOURS = 24
+FILE_UPLOAD_HANDLERS = ['achievements.uploads.SizeLimitedUploadHandler']
+
+# One cache shared by every web and worker process on the host, so a version
+# bump or refresh in one process (facet counts, featured sets, user summary
+# counters, autocomplete indexes) is seen by all of them. Point CACHE_DIR at a
+# directory every process can write.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR') or os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+# The test runner moves the cache, media, upload and prerender directories
+# into a temporary directory, so test runs never touch the live ones
+TEST_RUNNER = 'achievements.test_runner.TestRunner'
+
+# Facet counts of the achievements listing are cached for this many seconds
+FACET_CACHE_SECONDS = 300
+
+# Colleges are resolved from the request host; other workers see College
+# changes after at most this many seconds
+TENANT_CACHE_SECONDS = 300
+
+# Change feed (/api/changes/): compact_change_events keeps only the newest
+# event per achievement/profile once events are older than this
+CHANGE_EVENT_RETENTION_DAYS = 30
+
+# Maximum entries per /api/achievements/?since= delta sync response
+DELTA_SYNC_PAGE_SIZE = 500
+
+# Maximum achievement ids per /api/moderation/ batch
+MODERATION_BATCH_LIMIT = 1000
+
+# Cards per page of the public achievements listing
+ACHIEVEMENTS_PAGE_SIZE = 24
+
+# manage.py prerender_site writes the public pages here as static HTML, one
+# directory per college host. Colleges without a domain get PRERENDER_BASE_URL
+# in their sitemap.
+PRERENDER_ROOT = os.path.join(BASE_DIR, 'prerendered')
+PRERENDER_BASE_URL = 'http://localhost:8000'
+
+# Background jobs, run by manage.py run_worker. JOB_SCHEDULE entries are
+# queued every `every` seconds. With JOBS_EAGER = False, image hashes, image
+# downloads, emails and featured refreshes only happen while a worker runs.
+# JOBS_EAGER = True runs jobs in-process after commit instead, for development
+# without a worker.
+JOBS_EAGER = False
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 30
+JOB_TIMEOUT = 600
+JOB_RETENTION_DAYS = 7
+JOB_SCHEDULE = {
+    'compact-change-events': {'task': 'achievements.changes.compact', 'every': 24 * 60 * 60},
+    'purge-finished-jobs': {'task': 'achievements.jobs.purge_finished', 'every': 24 * 60 * 60},
+    # Only logs what it would delete; set dry_run to False to delete orphaned media
+    'gc-media': {'task': 'achievements.media_gc.collect', 'every': 24 * 60 * 60, 'kwargs': {'dry_run': True}},
+    'refresh-featured': {'task': 'achievements.featured.refresh', 'every': 5 * 60},
+}
+
+# Featured achievements on the home page (see achievements.featured)
+FEATURED_SET_COUNT = 4
+FEATURED_SET_SIZE = 6
+FEATURED_HALF_LIFE_DAYS = 90
+FEATURED_ROTATION_SECONDS = 60
+FEATURED_CACHE_SECONDS = 15 * 60
+
+# Downloading of external achievement image_url images
+IMAGE_FETCH_TIMEOUT = 10  # seconds per download, in total
+IMAGE_FETCH_MAX_BYTES = 5 * 1024 * 1024
+IMAGE_FETCH_CONCURRENCY = 4
+IMAGE_FETCH_RETRIES = 2
+IMAGE_FETCH_ALLOW_PRIVATE_HOSTS = False
+
+# Email (contact acknowledgements). Configure an SMTP backend in production.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'CSE Achievers <noreply@localhost>'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
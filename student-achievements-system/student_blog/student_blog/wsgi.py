@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_blog.settings')
 
 application = get_wsgi_application()
+
+# Imported only once settings are configured and the app registry is ready.
+# Loads URLs, templates, lookup tables and indexes before the server sends traffic.
+from achievements.startup import warm_up  # noqa: E402
+
+warm_up()